@@ -7,13 +7,17 @@ import json
 import time
 import shutil
 import hashlib
+import itertools
+import mmap
 import logging
 import random
 import subprocess
 import tempfile
+import threading
 import weakref
-from dataclasses import dataclass, asdict, field
-from typing import Callable, Dict, List, Optional, Tuple
+from collections import deque
+from dataclasses import dataclass, asdict, field, fields
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
 from PyQt6.QtCore import (
     Qt,
     QSize,
@@ -24,6 +28,7 @@ from PyQt6.QtCore import (
     pyqtSignal,
     QMimeData,
     QTimer,
+    QEventLoop,
     QEasingCurve,
     QPropertyAnimation,
     QRect,
@@ -111,6 +116,7 @@ from cloud_providers import (
     CloudProviderType,
     CloudServiceManager,
     CloudSource,
+    file_checksums,
 )
 from cloud_providers.errors import (
     CloudAuthError,
@@ -118,6 +124,31 @@ from cloud_providers.errors import (
     CloudProviderError,
     CloudUnavailableError,
 )
+from kps_scan import (
+    ScanEntry,
+    ScanStats,
+    is_system_like_path,
+    iter_scan_entries,
+)
+from kps_hashing import (
+    DEFAULT_HASH_KINDS,
+    DEFAULT_HASH_SIZE,
+    FLAT_HASH_KIND,
+    HASH_KINDS,
+    DisjointSet,
+    HammingIndex,
+    cluster_edges,
+    compute_hashes,
+    decode_size,
+    hash_distance,
+    hashes_match,
+    max_distance as hash_max_distance,
+)
+from kps_hash_cache import HASH_CACHE_FILE, HashCache, cloud_key, hash_slot, local_key
+from kps_imagesize import read_header_dimensions
+from kps_parallel import PipelineStats, iter_parallel
+from kps_scan_index import SCAN_INDEX_FILE, ScanIndex
+from kps_watch import FolderWatcher, list_tree_dirs
 from kps_security import (
     normalize_session_roots,
     resolve_non_conflicting_path,
@@ -241,35 +272,11 @@ def _qss_btn(bg: str, fg: str, border: str, hover_bg: str, pressed_bg: str) -> s
     }}
     """
 
-IMAGE_EXTS = {
-    ".jpg",
-    ".jpeg",
-    ".png",
-    ".webp",
-    ".bmp",
-    ".gif",
-    ".heic",
-    ".heif",
-    ".avif",
-    ".tif",
-    ".tiff",
-}
 MAX_THUMB_PIXELS = 40_000_000
 MAX_HASH_PIXELS = 80_000_000
 FORENSIC_CHUNK_SIZE = 256 * 1024
-SYSTEM_PATH_KEYWORDS = [
-    "\\windows\\",
-    "\\program files\\",
-    "\\program files (x86)\\",
-    "\\programdata\\",
-    "\\appdata\\",
-    "\\$recycle.bin\\",
-    "\\system volume information\\",
-    "\\venv\\",
-    "\\.venv\\",
-    "\\site-packages\\",
-    "\\comfyui\\",
-]
+FULL_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+FULL_SIGNATURE_PREFIX = "blake2b:"
 PROGRESS_QSS = f"""
 QProgressBar {{
     border: 1px solid {ACCENT_COLOR};
@@ -878,51 +885,14 @@ def safe_copy_file(src: str, dst: str) -> None:
     """Bezpečná kopie bez přepsání existujícího cíle."""
     dst = resolve_non_conflicting_path(dst)
     shutil.copy2(src, dst)
-def is_system_like_path(path: str) -> bool:
-    low = os.path.abspath(path).lower()
-    return any(k in low for k in SYSTEM_PATH_KEYWORDS)
-def iter_image_paths(
-    roots: List[str],
-    ignore_system: bool,
-    on_progress: Optional[Callable[[int, int], bool]] = None,
-) -> List[str]:
-    paths: List[str] = []
-    stop_scan = False
-    last_update = time.time()
-    dir_count = 0
-    for root in roots:
-        if not os.path.exists(root):
-            continue
-        for dirpath, dirnames, filenames in os.walk(root, topdown=True):
-            dir_count += 1
-            # odfiltrovat zjevne systemove adresare
-            dirnames[:] = [d for d in dirnames if d not in ["$RECYCLE.BIN", "System Volume Information"]]
-            if ignore_system and is_system_like_path(dirpath):
-                dirnames[:] = []
-                continue
-            for name in filenames:
-                ext = os.path.splitext(name)[1].lower()
-                if ext in IMAGE_EXTS:
-                    full = os.path.join(dirpath, name)
-                    paths.append(full)
-                if on_progress and (time.time() - last_update) > 0.1:
-                    if on_progress(len(paths), dir_count) is False:
-                        stop_scan = True
-                        break
-                    last_update = time.time()
-            if stop_scan:
-                break
-            if on_progress and (time.time() - last_update) > 0.1:
-                if on_progress(len(paths), dir_count) is False:
-                    stop_scan = True
-                    break
-                last_update = time.time()
-        if stop_scan:
-            break
-    return paths
+def read_image_dimensions(path: str) -> Tuple[Optional[int], Optional[int]]:
+    dims = read_header_dimensions(path)
+    if dims is not None:
+        return dims
+    return _qimage_reader_dimensions(path)
 
 
-def read_image_dimensions(path: str) -> Tuple[Optional[int], Optional[int]]:
+def _qimage_reader_dimensions(path: str) -> Tuple[Optional[int], Optional[int]]:
     try:
         reader = QImageReader(path)
         reader.setAutoTransform(True)
@@ -934,28 +904,8 @@ def read_image_dimensions(path: str) -> Tuple[Optional[int], Optional[int]]:
     return None, None
 
 
-def _average_hash_from_qimage(image: QImage, hash_size: int) -> Optional[int]:
-    if image.isNull():
-        return None
-    scaled = image.scaled(
-        hash_size,
-        hash_size,
-        Qt.AspectRatioMode.IgnoreAspectRatio,
-        Qt.TransformationMode.SmoothTransformation,
-    ).convertToFormat(QImage.Format.Format_Grayscale8)
-    pixels: List[int] = []
-    for y in range(hash_size):
-        for x in range(hash_size):
-            pixels.append(scaled.pixelColor(x, y).value())
-    if not pixels:
-        return None
-    avg = sum(pixels) / len(pixels)
-    bits = "".join("1" if p > avg else "0" for p in pixels)
-    return int(bits, 2)
-
-
-def perceptual_hash(path: str, hash_size: int = 8) -> Optional[int]:
-    """Jednoduchy prumerny hash pomoci QImageReader."""
+def image_hashes(path: str, kinds: Sequence[str], hash_size: int = DEFAULT_HASH_SIZE) -> Optional[Dict[str, int]]:
+    """Zvolené percepční hashe z jednoho dekódování zmenšeného náhledu."""
     try:
         reader = QImageReader(path)
         reader.setAutoTransform(True)
@@ -965,21 +915,57 @@ def perceptual_hash(path: str, hash_size: int = 8) -> Optional[int]:
             if pixels > MAX_HASH_PIXELS:
                 logger.warning("Obrázek je při hashování přeskočen (příliš velký): %s", path)
                 return None
-        reader.setScaledSize(QSize(hash_size, hash_size))
+        # jednotna velikost dekodovani: hash nezavisi na zvolene kombinaci a jde ho ukladat do cache
+        side = decode_size(HASH_KINDS, hash_size)
+        reader.setScaledSize(QSize(side, side))
         image = reader.read()
         if image.isNull():
             logger.warning("Soubor není rozpoznán jako obrázek pro hash: %s", path)
             return None
-        return _average_hash_from_qimage(image, hash_size)
+        return compute_hashes(image, kinds, hash_size)
     except Exception as e:
         logger.warning("Chyba při výpočtu hashe pro %s: %s", path, e)
     return None
 
 
-def hamming_distance(left: int, right: int) -> int:
-    return (left ^ right).bit_count()
-
+def _hash_mapped_file(f, hasher) -> bool:
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False  # prazdny soubor nebo souborovy system bez mmap
+    with mapped:
+        view = memoryview(mapped)
+        try:
+            for offset in range(0, len(mapped), FULL_HASH_BLOCK_SIZE):
+                hasher.update(view[offset:offset + FULL_HASH_BLOCK_SIZE])
+        finally:
+            view.release()
+    return True
+def _hash_buffered_file(f, hasher) -> None:
+    buffer = bytearray(FULL_HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        count = f.readinto(buffer)
+        if not count:
+            break
+        hasher.update(view[:count])
+def full_file_signature(path: str, size: int, use_mmap: bool = True) -> Optional[str]:
+    """BLAKE2b otisk celého obsahu; potvrzuje shodu souborů, které se potkaly na vzorkovaném podpisu.
 
+    Soubor se čte přes mmap, kde to nejde, velkými bloky do jednoho bufferu.
+    hashlib nad velkými bloky uvolňuje GIL, takže ověření běží souběžně v poolu.
+    """
+    if size <= 0:
+        return None
+    hasher = hashlib.blake2b(digest_size=32)
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if not (use_mmap and _hash_mapped_file(f, hasher)):
+                _hash_buffered_file(f, hasher)
+        return f"{FULL_SIGNATURE_PREFIX}{size}:{hasher.hexdigest()}"
+    except Exception as e:
+        logger.warning("Chyba při forenznim cteni %s: %s", path, e)
+        return None
 def sampled_file_signature(path: str, size: int) -> Optional[str]:
     if size <= 0:
         return None
@@ -1024,12 +1010,15 @@ class ImageRecord:
     cloud_stable_id: str = ""
     cloud_revision_id: str = ""
     cloud_source_uri: str = ""
+    cloud_source_id: str = ""  # CloudSource.source_id vypisu, ze ktereho zaznam vznikl
     local_cache_path: str = ""
     download_state: str = CloudDownloadState.LOCAL.value
     cloud_original_metadata: Dict[str, object] = field(default_factory=dict)
+    cloud_checksums: Dict[str, str] = field(default_factory=dict)
+    cloud_thumbnail_path: str = ""  # nahled z cache providera, original nemusi byt stazeny
 
 
-def image_record_from_cloud_asset(asset: CloudAsset, record_id: int) -> ImageRecord:
+def image_record_from_cloud_asset(asset: CloudAsset, record_id: int, source_id: str = "") -> ImageRecord:
     local_path = asset.local_cache_path or asset.source_uri or ""
     return ImageRecord(
         id=record_id,
@@ -1049,9 +1038,46 @@ def image_record_from_cloud_asset(asset: CloudAsset, record_id: int) -> ImageRec
         cloud_stable_id=asset.stable_id,
         cloud_revision_id=asset.revision_id,
         cloud_source_uri=asset.source_uri,
+        cloud_source_id=source_id,
         local_cache_path=asset.local_cache_path,
         download_state=asset.download_state,
         cloud_original_metadata=dict(asset.original_provider_metadata or {}),
+        cloud_checksums=dict(asset.checksums or {}),
+        cloud_thumbnail_path=asset.thumbnail_path,
+    )
+
+
+def cloud_source_key(source: CloudSource) -> str:
+    return f"{source.provider}:{source.account_id}:{source.source_id}"
+
+
+def cloud_scan_key(source: CloudSource, min_bytes: int = 0, max_bytes: int = 0) -> str:
+    """Klíč uloženého tokenu výpisu; token platí jen pro filtr velikosti, se kterým vznikl."""
+    return f"{cloud_source_key(source)}:{min_bytes}-{max_bytes}"
+
+
+def cloud_asset_from_record(rec: ImageRecord) -> CloudAsset:
+    """Zpětný převod pro stažení na vyžádání; metadata drží záznam, ne cloudový manažer."""
+    return CloudAsset(
+        provider=rec.cloud_provider,
+        account_id=rec.cloud_account_id,
+        asset_id=rec.cloud_asset_id,
+        stable_id=rec.cloud_stable_id or rec.cloud_asset_id,
+        revision_id=rec.cloud_revision_id,
+        name=str(rec.cloud_original_metadata.get("name") or rec.cloud_asset_id),
+        mime_type=str(rec.cloud_original_metadata.get("mimeType", "")),
+        size=rec.size,
+        width=rec.width,
+        height=rec.height,
+        created_time="",
+        modified_time="",
+        source_uri=rec.cloud_source_uri,
+        download_state=rec.download_state,
+        is_read_only=True,
+        local_cache_path=rec.local_cache_path,
+        original_provider_metadata=dict(rec.cloud_original_metadata or {}),
+        checksums=dict(rec.cloud_checksums or {}),
+        thumbnail_path=rec.cloud_thumbnail_path,
     )
 
 
@@ -1096,6 +1122,408 @@ class ThumbWorker(QRunnable):
         except Exception as e:
             logger.warning("ThumbWorker chyba pro %s: %s", self.path, e)
 # =====================
+# WORKER PRO SKENOVÁNÍ
+# =====================
+SCAN_BATCH_SIZE = 500
+SCAN_BATCH_MAX_DELAY = 0.25
+# soubor zmeneny v tomto okne se pri hlidani bere jako rozkopirovany a zkontroluje se znovu
+WATCH_SETTLE_SECONDS = 2.0
+class ScanWorkerSignals(QObject):
+    batch = pyqtSignal(int, list)  # job_id, [ScanEntry]
+    progress = pyqtSignal(int, int, int)  # job_id, složky, nalezeno
+    finished = pyqtSignal(int, bool, object)  # job_id, přerušeno, ScanStats
+class ScanWorker(QRunnable):
+    """Průchod adresáři mimo GUI vlákno; záznamy posílá po dávkách.
+
+    S `watched` (hlídané adresáře) jde o přesken po události hlídání: vypíšou se
+    jen `roots` a dosud nehlídané podadresáře, `listed_dirs` a `gone_dirs` pak
+    řeknou GUI, které záznamy a hlídané složky porovnat nebo odebrat.
+    """
+    def __init__(
+        self,
+        job_id: int,
+        roots: List[str],
+        ignore_system: bool,
+        min_bytes: int,
+        max_bytes: int,
+        batch_size: int = SCAN_BATCH_SIZE,
+        index: Optional[ScanIndex] = None,
+        known_sizes: Optional[Dict[str, int]] = None,
+        watched: Optional[Set[str]] = None,
+    ):
+        super().__init__()
+        self.job_id = job_id
+        self.roots = list(roots)
+        self.ignore_system = ignore_system
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.index = index
+        # soubory, ktere session uz zna se stejnou velikosti, se do GUI znovu neposilaji
+        self.known_sizes = known_sizes or {}
+        self.watched = frozenset(watched) if watched is not None else None
+        self.listed_dirs: List[str] = []
+        self.gone_dirs: List[str] = []
+        self.stats = ScanStats()
+        self._cancel_event = threading.Event()
+        self.signals = ScanWorkerSignals()
+    def cancel(self):
+        self._cancel_event.set()
+    def is_canceled(self) -> bool:
+        return self._cancel_event.is_set()
+    def _on_progress(self, found_count: int, dir_count: int) -> bool:
+        self.signals.progress.emit(self.job_id, dir_count, found_count)
+        return not self.is_canceled()
+    def _descend(self, dirpath: str) -> bool:
+        # hlidane podadresare maji vlastni udalosti, prochazet je znovu je zbytecne
+        return dirpath not in self.watched
+    def _find_gone_dirs(self) -> List[str]:
+        prefixes = tuple(os.path.abspath(root) + os.sep for root in self.roots)
+        roots = {os.path.abspath(root) for root in self.roots}
+        return sorted(
+            d for d in self.watched
+            if (d in roots or d.startswith(prefixes)) and not os.path.isdir(d)
+        )
+    @pyqtSlot()
+    def run(self):
+        batch: list = []
+        last_emit = time.time()
+        entries = iter_scan_entries(
+            self.roots,
+            ignore_system=self.ignore_system,
+            on_progress=self._on_progress,
+            min_bytes=self.min_bytes,
+            max_bytes=self.max_bytes,
+            stats=self.stats,
+            index=self.index,
+            descend=None if self.watched is None else self._descend,
+            listed_dirs=self.listed_dirs if self.watched is not None else None,
+        )
+        try:
+            for entry in entries:
+                if self.is_canceled():
+                    break
+                if self.known_sizes.get(entry.path) == entry.size:
+                    continue
+                batch.append(entry)
+                # prvni fotky maji byt v GUI hned, ne az po naplneni cele davky
+                if len(batch) >= self.batch_size or time.time() - last_emit > SCAN_BATCH_MAX_DELAY:
+                    self.signals.batch.emit(self.job_id, batch)
+                    batch = []
+                    last_emit = time.time()
+            if batch and not self.is_canceled():
+                self.signals.batch.emit(self.job_id, batch)
+            if self.watched is not None and not self.is_canceled():
+                self.gone_dirs = self._find_gone_dirs()
+        except Exception as e:
+            logger.error("ScanWorker chyba pro %s: %s", self.roots, e)
+        finally:
+            entries.close()
+            self.signals.finished.emit(self.job_id, self.is_canceled(), self.stats)
+# =====================
+# WORKER PRO ROZMĚRY
+# =====================
+DIMENSION_PROBE_BATCH = 256
+DIMENSION_PROBE_PRIORITY = -1  # pod náhledy, ty jsou pro uživatele vidět hned
+class DimensionProbeSignals(QObject):
+    finished = pyqtSignal(list)  # [(rec_id, path, width, height)]
+class DimensionProbeWorker(QRunnable):
+    def __init__(self, items: List[Tuple[int, str]]):
+        super().__init__()
+        self.items = list(items)
+        self.signals = DimensionProbeSignals()
+    @pyqtSlot()
+    def run(self):
+        results = []
+        for rec_id, path in self.items:
+            width, height = read_image_dimensions(path)
+            results.append((rec_id, path, width, height))
+        self.signals.finished.emit(results)
+# =====================
+# WORKER PRO SEZNAM HLÍDANÝCH SLOŽEK
+# =====================
+class WatchDirsSignals(QObject):
+    finished = pyqtSignal(int, list)  # job_id, [adresar]
+class WatchDirsWorker(QRunnable):
+    """Adresáře zdrojů k hlídání; bez snapshotu v indexu se strom projde mimo GUI vlákno."""
+    def __init__(self, job_id: int, roots: List[str], ignore_system: bool, index: ScanIndex):
+        super().__init__()
+        self.job_id = job_id
+        self.roots = list(roots)
+        self.ignore_system = ignore_system
+        self.index = index
+        self.signals = WatchDirsSignals()
+    @pyqtSlot()
+    def run(self):
+        dirs: List[str] = []
+        try:
+            for root in self.roots:
+                if not os.path.isdir(root):
+                    continue
+                # adresare zname z indexu skenu; bez nej se strom projde jen po slozkach
+                found = sorted(self.index.snapshot_dirs(root)) or list_tree_dirs(root, self.ignore_system)
+                if self.ignore_system:
+                    found = [d for d in found if not is_system_like_path(d)]
+                dirs.extend(d for d in found if os.path.isdir(d))
+        except Exception as e:
+            logger.error("Seznam hlidanych slozek selhal pro %s: %s", self.roots, e)
+        finally:
+            self.signals.finished.emit(self.job_id, dirs)
+@dataclass
+class ScanJob:
+    job_id: int
+    worker: ScanWorker
+    progress: Optional["DagmarProgress"]  # None u preskenu po udalosti hlidani
+    existing_paths: Dict[str, int]
+    start_id: int
+    added: int = 0
+    updated: int = 0
+    canceled: bool = False
+    worker_done: bool = False
+    draining: bool = False
+    queue: list = field(default_factory=list)
+    watch_roots: Optional[List[str]] = None
+    min_bytes: int = 0  # filtr novych zaznamu u preskenu, worker ho neuplatnuje
+    max_bytes: int = 0
+    seen_paths: set = field(default_factory=set)
+    unsettled_dirs: set = field(default_factory=set)
+# =====================
+# WORKER PRO DUPLICITY
+# =====================
+DUPLICATE_GROUP_MAX_SIZE = 50  # vetsi shluk je spis retez podobnych zaberu nez skupina dvojniku
+DUPLICATE_PROGRESS_INTERVAL = 0.1  # s; posilat prubeh po kazde polozce by zahltilo GUI vlakno
+DUPLICATE_WAIT_POLL_MS = 100
+class DuplicateSearchSignals(QObject):
+    group_ready = pyqtSignal(int, str, list)  # job_id, "exact"/"visual", [ImageRecord]
+    progress = pyqtSignal(int, str, int, int, float, str)  # job_id, faze, hotovo, celkem, souboru/s, soubor
+    dimensions = pyqtSignal(int, list)  # job_id, [(rec_id, width, height)]
+    failed = pyqtSignal(int, str)  # job_id, chyba; finished prijde i tak
+    finished = pyqtSignal(int, bool)  # job_id, přerušeno
+class DuplicateSearchWorker(QRunnable):
+    """Producent duplicitních skupin mimo GUI vlákno.
+
+    Přesnou skupinu pošle, jakmile jsou zpracované všechny soubory její
+    velikosti; vizuální skupiny až po zahashování všech zbylých fotek,
+    protože union-find potřebuje všechny hrany. Úlohy `signature_task`,
+    `visual_task` a `checksum_task` záznamy jen čtou, rozměry posílá signálem.
+    `cloud_records` jsou nestažené cloudové položky, porovnávají se jen
+    checksumem od providera; `preview_records` mají jen náhled z cache
+    a jdou pouze do vizuálního porovnání.
+    """
+    def __init__(
+        self,
+        job_id: int,
+        records: List[ImageRecord],
+        hash_kinds: Sequence[str],
+        signature_task: Callable,
+        visual_task: Callable,
+        verify_full: bool = True,
+        group_max: int = DUPLICATE_GROUP_MAX_SIZE,
+        cloud_records: Sequence[ImageRecord] = (),
+        checksum_task: Optional[Callable] = None,
+        preview_records: Sequence[ImageRecord] = (),
+    ):
+        super().__init__()
+        self.job_id = job_id
+        self.records = list(records)
+        self.hash_kinds = tuple(hash_kinds)
+        self.signature_task = signature_task
+        self.visual_task = visual_task
+        self.verify_full = verify_full
+        self.group_max = group_max
+        self.cloud_records = list(cloud_records) if checksum_task is not None else []
+        self.checksum_task = checksum_task
+        self.preview_records = list(preview_records)
+        # velikosti nestazenych polozek resi checksumova faze i pro lokalni soubory
+        self._checksum_sizes = {rec.size for rec in self.cloud_records if rec.size > 0}
+        self._dims: Dict[int, Tuple[int, int]] = {}
+        self._pending_dims: List[Tuple[int, int, int]] = []
+        self._cancel_event = threading.Event()
+        self.signals = DuplicateSearchSignals()
+    def cancel(self):
+        self._cancel_event.set()
+    def is_canceled(self) -> bool:
+        return self._cancel_event.is_set()
+    def _dimensions(self, rec: ImageRecord) -> Tuple[Optional[int], Optional[int]]:
+        if rec.width is not None:
+            return rec.width, rec.height
+        return self._dims.get(rec.id, (None, None))
+    def _flush_dimensions(self):
+        if self._pending_dims:
+            self.signals.dimensions.emit(self.job_id, self._pending_dims)
+            self._pending_dims = []
+    def _run_stage(self, label: str, task: Callable, records: List[ImageRecord]):
+        stats = PipelineStats()
+        last_emit = 0.0
+        for i, (rec, result) in enumerate(
+            iter_parallel(task, records, should_cancel=self.is_canceled, stats=stats), start=1
+        ):
+            local_path, value, dims = result or ("", None, None)
+            if dims is not None and dims[0] is not None and rec.id not in self._dims:
+                self._dims[rec.id] = dims
+                self._pending_dims.append((rec.id, dims[0], dims[1]))
+            if i == len(records) or time.monotonic() - last_emit > DUPLICATE_PROGRESS_INTERVAL:
+                last_emit = time.monotonic()
+                self._flush_dimensions()
+                self.signals.progress.emit(
+                    self.job_id, label, i, len(records), stats.rate(), os.path.basename(local_path or rec.path)
+                )
+            yield rec, value
+        self._flush_dimensions()
+        if not self.is_canceled():
+            logger.info("%s: %d souboru za %.1f s (%.0f souboru/s).", label, stats.done, stats.elapsed(), stats.rate())
+    def iter_exact_groups(self):
+        """Byte-identické skupiny ve třech stupních: velikost z paměti, vzorkovaný podpis, celý obsah.
+
+        Soubor s jedinečnou velikostí se vůbec neotevře. Celým obsahem se
+        ověřují jen soubory se shodným vzorkem, a to jen při `verify_full`.
+        """
+        by_size: Dict[int, List[ImageRecord]] = {}
+        for rec in self.records:
+            if rec.size > 0 and rec.size not in self._checksum_sizes:
+                by_size.setdefault(rec.size, []).append(rec)
+        candidates = [rec for recs in by_size.values() if len(recs) > 1 for rec in recs]
+        logger.info("Forenzni faze: %d z %d souboru sdili velikost s jinym.", len(candidates), len(self.records))
+        left = {size: len(recs) for size, recs in by_size.items()}
+        by_signature: Dict[int, Dict[str, List[ImageRecord]]] = {}
+        to_verify: List[List[ImageRecord]] = []
+        for rec, signature in self._run_stage(
+            "Forenzni kontrola vzorku", lambda r: self.signature_task(r, False), candidates
+        ):
+            bucket = by_signature.setdefault(rec.size, {})
+            if signature is not None:
+                bucket.setdefault(signature, []).append(rec)
+            left[rec.size] -= 1
+            if left[rec.size]:
+                continue
+            # vsechny soubory teto velikosti jsou hotove, jejich skupiny uz se nezmeni
+            for signature, recs in by_signature.pop(rec.size).items():
+                if len(recs) < 2:
+                    continue
+                if signature.startswith("full:") or not self.verify_full:
+                    yield recs
+                else:
+                    to_verify.append(recs)
+        if not to_verify or self.is_canceled():
+            return
+        owner = {rec.id: index for index, recs in enumerate(to_verify) for rec in recs}
+        left_in_group = [len(recs) for recs in to_verify]
+        by_digest: Dict[int, Dict[str, List[ImageRecord]]] = {}
+        for rec, digest in self._run_stage(
+            "Overeni celeho obsahu",
+            lambda r: self.signature_task(r, True),
+            [rec for recs in to_verify for rec in recs],
+        ):
+            index = owner[rec.id]
+            if digest is not None:
+                by_digest.setdefault(index, {}).setdefault(digest, []).append(rec)
+            left_in_group[index] -= 1
+            if left_in_group[index]:
+                continue
+            for recs in by_digest.pop(index, {}).values():
+                if len(recs) > 1:
+                    yield recs
+    def iter_checksum_groups(self):
+        """Přesné skupiny s nestaženými cloudovými položkami podle velikosti a checksumu od providera.
+
+        Nic se nestahuje: cloudová položka dodá checksum z metadat, lokální
+        soubor stejné velikosti spočítá jen algoritmy, které ve skupině
+        nabízejí cloudové položky. Shoda v libovolném společném algoritmu spojí
+        záznamy do jedné skupiny.
+        """
+        if not self.cloud_records:
+            return
+        by_size: Dict[int, List[ImageRecord]] = {}
+        for rec in self.cloud_records + [rec for rec in self.records if rec.size in self._checksum_sizes]:
+            by_size.setdefault(rec.size, []).append(rec)
+        algorithms: Dict[int, Set[str]] = {}
+        for rec in self.cloud_records:
+            algorithms.setdefault(rec.size, set()).update(rec.cloud_checksums)
+        candidates = [rec for recs in by_size.values() if len(recs) > 1 for rec in recs]
+        logger.info(
+            "Checksumova faze: %d nestazenych polozek, %d zaznamu sdili velikost.", len(self.cloud_records), len(candidates)
+        )
+        left = {size: len(recs) for size, recs in by_size.items()}
+        by_checksums: Dict[int, List[Tuple[ImageRecord, Dict[str, str]]]] = {}
+        for rec, checksums in self._run_stage(
+            "Kontrola cloudovych checksumu",
+            lambda r: self.checksum_task(r, tuple(sorted(algorithms[r.size]))),
+            candidates,
+        ):
+            if checksums:
+                by_checksums.setdefault(rec.size, []).append((rec, checksums))
+            left[rec.size] -= 1
+            if left[rec.size]:
+                continue
+            items = by_checksums.pop(rec.size, [])
+            dsu = DisjointSet(len(items))
+            first: Dict[Tuple[str, str], int] = {}
+            for idx, (_rec, rec_checksums) in enumerate(items):
+                for pair in rec_checksums.items():
+                    dsu.union(first.setdefault(pair, idx), idx)
+            for members in dsu.groups():
+                yield [items[idx][0] for idx in members]
+    def visual_groups(self, exclude_ids: Set[int]) -> List[List[ImageRecord]]:
+        remaining = [rec for rec in self.records + self.preview_records if rec.id not in exclude_ids]
+        if len(remaining) < 2:
+            return []
+        phashes: List[Tuple[ImageRecord, Dict[str, int]]] = []
+        for rec, h in self._run_stage(
+            "Vizualni porovnani", lambda r: self.visual_task(r, self.hash_kinds), remaining
+        ):
+            if h and all(kind in h for kind in self.hash_kinds):
+                phashes.append((rec, h))
+        if self.is_canceled():
+            return []
+        # kandidaty hleda index nad hashem s nejmensim prahem, ostatni hashe se jen overi
+        primary = min(self.hash_kinds, key=hash_max_distance)
+        index = HammingIndex(hash_max_distance(primary), expected_size=len(phashes))
+        for idx, (_rec, rec_hashes) in enumerate(phashes):
+            index.add(idx, rec_hashes[primary])
+        edges: List[Tuple[int, int, int]] = []
+        for idx, (anchor, anchor_hash) in enumerate(phashes):
+            anchor_dims = self._dimensions(anchor)
+            for other_idx in index.query(anchor_hash[primary]):
+                if other_idx <= idx:
+                    continue
+                other, other_hash = phashes[other_idx]
+                max_size = max(anchor.size, other.size, 1)
+                size_delta = abs(anchor.size - other.size) / max_size
+                same_geometry = anchor_dims[0] is not None and anchor_dims == self._dimensions(other)
+                if hashes_match(anchor_hash, other_hash, self.hash_kinds) and (size_delta <= 0.15 or same_geometry):
+                    edges.append((hash_distance(anchor_hash, other_hash, self.hash_kinds), idx, other_idx))
+        # union-find misto hladoveho prirazovani: skupiny nezavisi na poradi skenu
+        clusters = cluster_edges(len(phashes), edges, self.group_max)
+        logger.info("Vizualni shlukovani: %d hran, %d skupin.", len(edges), len(clusters))
+        return [[phashes[member][0] for member in cluster] for cluster in clusters]
+    @pyqtSlot()
+    def run(self):
+        try:
+            grouped: Set[int] = set()
+            for group in itertools.chain(self.iter_checksum_groups(), self.iter_exact_groups()):
+                grouped.update(rec.id for rec in group)
+                self.signals.group_ready.emit(self.job_id, "exact", group)
+            if not self.is_canceled():
+                for group in self.visual_groups(grouped):
+                    self.signals.group_ready.emit(self.job_id, "visual", group)
+        except Exception as e:
+            logger.error("Chyba pri hledani duplicit: %s", e)
+            self.signals.failed.emit(self.job_id, str(e))
+        finally:
+            self.signals.finished.emit(self.job_id, self.is_canceled())
+@dataclass
+class DuplicateJob:
+    job_id: int
+    worker: DuplicateSearchWorker
+    progress: "DagmarProgress"
+    queue: Deque[List[ImageRecord]] = field(default_factory=deque)
+    found: int = 0
+    shown: int = 0
+    canceled: bool = False
+    worker_done: bool = False
+    review_done: bool = False  # dialogy skupin skoncily, job ceka jen na dobehnuti workeru
+    error: str = ""
+# =====================
 # PROGRESS DIALOG
 # =====================
 class SpinnerWidget(QWidget):
@@ -1305,11 +1733,12 @@ class KajoTextInputDialog(QDialog):
 
 
 class DagmarProgress(QDialog):
-    def __init__(self, text: str, parent: QWidget, maximum: int = 0):
+    def __init__(self, text: str, parent: QWidget, maximum: int = 0, modal: bool = True):
         super().__init__(parent)
         self.setWindowTitle("KájovoPhotoSelector – průběh operace")
-        self.setModal(True)
-        self.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self.setModal(modal)
+        # nemodalni varianta nechava hlavni okno ovladatelne behem prace na pozadi
+        self.setWindowModality(Qt.WindowModality.ApplicationModal if modal else Qt.WindowModality.NonModal)
         self._base_text = text
         self._detail_text = ""
         self._maximum = max(0, int(maximum))
@@ -1541,6 +1970,83 @@ class ScanOptionsDialog(QDialog):
         event.accept()
         super().closeEvent(event)
 
+class DuplicateOptionsDialog(QDialog):
+    def __init__(
+        self,
+        parent: QWidget,
+        last_kinds: Sequence[str],
+        verify_full: bool = True,
+        group_max: int = DUPLICATE_GROUP_MAX_SIZE,
+    ):
+        super().__init__(parent)
+        self.setWindowTitle("Nastavení hledání duplicit")
+        self.setModal(True)
+        apply_dialog_theme(self, extra_h=250)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(22, 22, 22, 22)
+        layout.setSpacing(16)
+        layout.addWidget(make_dialog_header("Hledání duplicit", "Zvolte hashe pro vizuální porovnání fotek."))
+
+        card = make_dialog_card()
+        card_layout = QVBoxLayout(card)
+        card_layout.setContentsMargins(18, 18, 18, 18)
+        card_layout.setSpacing(14)
+        self.checks: Dict[str, QCheckBox] = {}
+        for kind, spec in HASH_KINDS.items():
+            chk = QCheckBox(spec.label)
+            chk.setChecked(kind in last_kinds)
+            chk.toggled.connect(self._update_ok)
+            card_layout.addWidget(chk)
+            self.checks[kind] = chk
+
+        helper = QLabel(
+            "Fotky jsou vizuální duplicity jen tehdy, když jsou blízko všechny zvolené hashe. "
+            "Víc hashů znamená méně falešných skupin, ale pomalejší porovnání."
+        )
+        helper.setWordWrap(True)
+        helper.setStyleSheet(DIALOG_STATUS_QSS)
+        card_layout.addWidget(helper)
+        self.chk_verify = QCheckBox("Ověřit přesné duplicity celým obsahem souboru")
+        self.chk_verify.setChecked(verify_full)
+        self.chk_verify.setToolTip(
+            "Soubory se shodnými vzorky se přečtou celé. Pomalejší u velkých RAW souborů, ale bez falešných shod."
+        )
+        card_layout.addWidget(self.chk_verify)
+        row = QHBoxLayout()
+        row.setSpacing(10)
+        lbl_group_max = QLabel("Max. fotek ve skupině (0 = bez limitu):")
+        lbl_group_max.setStyleSheet(DIALOG_INFO_QSS)
+        self.spin_group_max = QSpinBox()
+        self.spin_group_max.setRange(0, 100000)
+        self.spin_group_max.setValue(group_max)
+        self.spin_group_max.setToolTip("Větší shluk podobných fotek se rozdělí na skupiny kolem nejpodobnějších párů.")
+        row.addWidget(lbl_group_max)
+        row.addWidget(self.spin_group_max)
+        card_layout.addLayout(row)
+        layout.addWidget(card)
+
+        self.btns = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel,
+            parent=self,
+        )
+        self.btns.accepted.connect(self.accept)
+        self.btns.rejected.connect(self.reject)
+        style_dialog_button_box(
+            self.btns,
+            accept_text="Hledat duplicity",
+            reject_text="Zrušit",
+            accept_kind="accent",
+            reject_kind="surface",
+        )
+        layout.addWidget(self.btns)
+        self._update_ok()
+
+    def _update_ok(self):
+        self.btns.button(QDialogButtonBox.StandardButton.Ok).setEnabled(bool(self.get_values()))
+
+    def get_values(self) -> Tuple[str, ...]:
+        return tuple(kind for kind, chk in self.checks.items() if chk.isChecked())
+
 class CloudSourcesDialog(QDialog):
     def __init__(self, parent: QWidget, title: str, sources: List[CloudLocalSource]):
         super().__init__(parent)
@@ -2260,7 +2766,14 @@ class ClickableLabel(QLabel):
 
 
 class DuplicateGroupDialog(QDialog):
-    def __init__(self, parent: QWidget, group_index: int, total_groups: int, records: List[ImageRecord]):
+    def __init__(
+        self,
+        parent: QWidget,
+        group_index: int,
+        total_groups: int,
+        records: List[ImageRecord],
+        search_running: bool = False,
+    ):
         super().__init__(parent)
         self.setWindowTitle("Vyhodnocení duplicit")
         self.setModal(True)
@@ -2275,7 +2788,7 @@ class DuplicateGroupDialog(QDialog):
         layout.setSpacing(16)
         layout.addWidget(
             make_dialog_header(
-                f"Skupina duplicit {group_index + 1} z {total_groups}",
+                f"Skupina duplicit {group_index + 1} z {total_groups}" + (" (hledání pokračuje)" if search_running else ""),
                 "Vyberte fotografii, která má zůstat v hlavním pohledu. Ostatní snímky přesunu do přihrádky Duplicita.",
             )
         )
@@ -2349,10 +2862,13 @@ class DuplicateGroupDialog(QDialog):
             else:
                 d_disp = d
 
+            size_text = human_size(rec.size)
+            if rec.width and rec.height:
+                size_text += f" · {rec.width}×{rec.height} px"
             info = QLabel(
                 f"{base_disp}\n"
                 f"{d_disp}\n"
-                f"{human_size(rec.size)}"
+                f"{size_text}"
             )
             info.setWordWrap(True)
             info.setStyleSheet(DIALOG_INFO_QSS)
@@ -2498,7 +3014,7 @@ class DuplicateGroupDialog(QDialog):
 # HLAVNÍ OKNO
 # =====================
 class MainWindow(QMainWindow):
-    def __init__(self, sfx: Optional[SoundBank] = None):
+    def __init__(self, sfx: Optional[SoundBank] = None, data_dir: Optional[str] = None):
         super().__init__()
         self.setWindowTitle(APP_NAME)
         self.setMinimumSize(1200, 800)
@@ -2523,6 +3039,28 @@ class MainWindow(QMainWindow):
         self.last_min_kb: int = 0
         self.last_max_kb: int = 0
         self.last_ignore_system: bool = True
+        self.last_duplicate_hashes: Tuple[str, ...] = DEFAULT_HASH_KINDS
+        self.verify_full_content = True
+        self.cloud_metadata_only = True  # cloud sken bez stahovani, obsah az pro nahled nebo export
+        self.cloud_scan_resume: Dict[str, str] = {}  # zdroj -> token prvni nezpracovane stranky vypisu
+        self.duplicate_group_max = DUPLICATE_GROUP_MAX_SIZE
+        self._duplicate_job: Optional[DuplicateJob] = None
+        self._duplicate_job_seq = 0
+        self._scan_job: Optional[ScanJob] = None
+        self._scan_job_seq: int = 0
+        # data_dir prepisuje aplikacni adresar pro index skenu a cache hashu (testy, prenosna instalace)
+        self.scan_index = ScanIndex(os.path.join(data_dir, SCAN_INDEX_FILE) if data_dir else None)
+        self.hash_cache = HashCache(os.path.join(data_dir, HASH_CACHE_FILE) if data_dir else None)
+        self.folder_watcher = FolderWatcher(self)
+        self.folder_watcher.dirs_changed.connect(self.on_watched_dirs_changed)
+        self._watch_deferred: set[str] = set()
+        self._watch_listing_seq = 0
+        self._watch_listing_job = 0  # id beziciho WatchDirsWorker, 0 = zadny
+        self._watch_listing_announce = False
+        self._dims_queue: Deque[int] = deque()
+        self._dims_probed: set[int] = set()
+        self._dims_worker_running = False
+        self._dims_kick_pending = False
         # bucket kód -> Bucket
         self.buckets: Dict[str, Bucket] = {
             code: Bucket(code, alias) for code, alias in DEFAULT_BUCKET_ALIASES.items()
@@ -2763,6 +3301,13 @@ class MainWindow(QMainWindow):
         self.btn_sfx.clicked.connect(self._toggle_sfx)
         top_layout.addWidget(self.btn_sfx)
 
+        self.btn_watch = AnimatedPushButton("Hlídání: OFF", sfx=lambda: self.sfx.play(SFX_COIN))
+        self.btn_watch.setStyleSheet(BUTTON_SURFACE_QSS)
+        self.btn_watch.setFixedWidth(140)
+        self.btn_watch.setToolTip("Průběžně přidává nové fotky z načtených složek bez nového skenu.")
+        self.btn_watch.clicked.connect(self._toggle_watch)
+        top_layout.addWidget(self.btn_watch)
+
         main_layout.addWidget(top_frame)
 
         # ===== HEADER nad seznamem =====
@@ -2976,16 +3521,21 @@ class MainWindow(QMainWindow):
         )
     def reset_state(self):
         logger.info("Reset stavu aplikace.")
+        self.cancel_scan()
+        self.stop_watching()
         self.images.clear()
         self.image_by_id.clear()
         self.item_by_id.clear()
         self.thumb_cache.clear()
+        self._dims_queue.clear()
+        self._dims_probed.clear()
         self.list_widget.clear()
         self.next_id = 1
         self.current_view = "MAIN"
         self.session_roots.clear()
         self._reset_bucket_metadata()
         self.scan_sources.clear()
+        self.cloud_scan_resume.clear()
         self.clear_dirty()
         self.update_view_header()
     def prompt_unsaved(self) -> str:
@@ -3080,11 +3630,63 @@ class MainWindow(QMainWindow):
             return rec.path
         return ""
 
+    def _preview_path_for_record(self, rec: ImageRecord) -> str:
+        """Lokální soubor, u nestažené cloudové položky aspoň náhled z cache."""
+        local_path = self._local_path_for_record(rec)
+        if local_path or not rec.is_cloud:
+            return local_path
+        if rec.cloud_thumbnail_path and os.path.exists(rec.cloud_thumbnail_path):
+            return rec.cloud_thumbnail_path
+        return ""
+
     def _can_use_record_for_duplicates(self, rec: ImageRecord) -> bool:
         if rec.is_cloud and rec.download_state not in {CloudDownloadState.LOCAL.value, CloudDownloadState.CACHED.value}:
             return False
         return bool(self._local_path_for_record(rec))
 
+    def _can_match_record_by_checksum(self, rec: ImageRecord) -> bool:
+        """Nestažená cloudová položka jde do přesných duplicit jen s checksumem od providera."""
+        return (
+            rec.is_cloud
+            and bool(rec.cloud_checksums)
+            and rec.size > 0
+            and rec.download_state == CloudDownloadState.NOT_DOWNLOADED.value
+        )
+
+    def _fetch_cloud_records(self, records: Sequence[ImageRecord], progress=None) -> int:
+        """Stáhne nestažené cloudové položky souběžně do cache; vrací počet úspěšně stažených."""
+        pending: Dict[int, ImageRecord] = {}
+        assets: List[CloudAsset] = []
+        for rec in records:
+            if self._local_path_for_record(rec) or not rec.is_cloud:
+                continue
+            if rec.download_state != CloudDownloadState.NOT_DOWNLOADED.value:
+                continue
+            if rec.cloud_account_id not in self.cloud_manager.accounts:
+                continue
+            asset = cloud_asset_from_record(rec)
+            pending[id(asset)] = rec
+            assets.append(asset)
+        if not assets:
+            return 0
+        if progress is not None:
+            progress.set_maximum(len(assets))
+        should_cancel = progress.wasCanceled if progress is not None else None
+        fetched = 0
+        for done, outcome in enumerate(self.cloud_manager.iter_downloads(assets, should_cancel=should_cancel), start=1):
+            rec = pending[id(outcome.asset)]
+            if outcome.ok:
+                rec.local_cache_path = outcome.asset.local_cache_path
+                rec.download_state = outcome.asset.download_state
+                if outcome.asset.local_cache_path:
+                    rec.path = outcome.asset.local_cache_path
+                fetched += 1
+            if progress is not None:
+                progress.update(done, detail_text=f"Stazeno: {fetched}/{len(assets)}\nPolozka: {outcome.asset.name}")
+        if fetched:
+            self.mark_dirty()
+        return fetched
+
     # ---------------- VIEW / HEADER ----------------
     def update_view_header(self):
         if self.current_view == "MAIN":
@@ -3172,7 +3774,7 @@ class MainWindow(QMainWindow):
         self.item_by_id[rec.id] = item
     # ---------------- NÁHLEDY ----------------
     def _start_thumb_worker(self, rec: ImageRecord):
-        local_path = self._local_path_for_record(rec)
+        local_path = self._preview_path_for_record(rec)
         if not local_path:
             return
         worker = ThumbWorker(rec.id, local_path)
@@ -3181,7 +3783,7 @@ class MainWindow(QMainWindow):
     @pyqtSlot(int, str, QImage)
     def on_thumb_ready(self, rec_id: int, source_path: str, image: QImage):
         rec = self.image_by_id.get(rec_id)
-        if rec is None or self._local_path_for_record(rec) != source_path:
+        if rec is None or self._preview_path_for_record(rec) != source_path:
             return
         pm = QPixmap.fromImage(image)
         self.thumb_cache[rec_id] = pm
@@ -3358,6 +3960,19 @@ class MainWindow(QMainWindow):
         self.last_max_kb = xkb
         self.last_ignore_system = ign
         return mkb, xkb, ign
+    def _ask_duplicate_options(self) -> Optional[Tuple[str, ...]]:
+        dlg = DuplicateOptionsDialog(
+            self, self.last_duplicate_hashes, self.verify_full_content, self.duplicate_group_max
+        )
+        if dlg.exec() != QDialog.DialogCode.Accepted:
+            return None
+        kinds = dlg.get_values()
+        if not kinds:
+            return None
+        self.last_duplicate_hashes = kinds
+        self.verify_full_content = dlg.chk_verify.isChecked()
+        self.duplicate_group_max = dlg.spin_group_max.value()
+        return kinds
     def on_kajo_stopa(self):
         dir_ = self._exec_directory_dialog(
             title="Vyberte adresář s fotkami",
@@ -3387,6 +4002,9 @@ class MainWindow(QMainWindow):
         self._scan_cloud_sources(selected, min_kb=mkb, max_kb=xkb, ignore_system=ign)
 
     def _scan_cloud_sources(self, sources: List[CloudSource], min_kb: int, max_kb: int, ignore_system: bool):
+        if self._duplicate_job is not None:
+            self.toast("Kájo právě prochází dvojníky, skenovat půjde až potom.", "warn", 2200)
+            return
         progress = DagmarProgress("Načítám cloudové zdroje…", self, 0)
         progress.set_detail_text("Pripravuji cloudove scany a lokalni cache.")
         min_bytes = min_kb * 1024 if min_kb > 0 else 0
@@ -3396,8 +4014,17 @@ class MainWindow(QMainWindow):
             for rec in self.images
             if rec.is_cloud
         }
+        # inkrementalni vypis vraci zmenene polozky se stejnym asset_id a novou revizi
+        records_by_asset = {
+            (rec.cloud_provider, rec.cloud_account_id, rec.cloud_asset_id): rec
+            for rec in self.images
+            if rec.is_cloud
+        }
         added = 0
+        updated = 0
+        removed = 0
         skipped_unavailable = 0
+        metadata_only = 0
         try:
             for source_index, source in enumerate(sources, start=1):
                 if progress.wasCanceled():
@@ -3405,52 +4032,152 @@ class MainWindow(QMainWindow):
                 progress.set_detail_text(
                     f"Zdroj {source_index}/{len(sources)}\n{source.name}\n{source.limitation_text or 'Načítám metadata'}"
                 )
-                assets = self.cloud_manager.scan_source(source, mime_filter=["image/"])
-                for asset_index, asset in enumerate(assets, start=1):
+                scan_key = cloud_scan_key(source, min_bytes, max_bytes)
+                page_token = self.cloud_scan_resume.get(scan_key)
+                if page_token:
+                    logger.info("Cloud sken %s navazuje na ulozenou stranku vypisu.", source.name)
+                pages = self.cloud_manager.iter_source_pages(source, mime_filter=["image/"], page_token=page_token)
+                resync = False
+                listed_ids: Set[str] = set()
+                for page in pages:
                     if progress.wasCanceled():
                         break
-                    if min_bytes and asset.size < min_bytes:
-                        continue
-                    if max_bytes and asset.size > max_bytes:
-                        continue
-                    asset_key = (asset.provider, asset.account_id, asset.asset_id, asset.revision_id)
-                    if asset_key in existing_keys:
+                    if page.full_resync:
+                        logger.info("Cloud sken %s: provider vyzadal novou plnou synchronizaci.", source.name)
+                        resync = True
+                        listed_ids = set()
+                    if resync:
+                        listed_ids.update(asset.asset_id for asset in page.assets)
+                    removed_ids = {
+                        rec.id
+                        for rec in (
+                            records_by_asset.pop((source.provider, source.account_id, asset_id), None)
+                            for asset_id in page.removed_asset_ids
+                        )
+                        if rec is not None
+                    }
+                    pending: List[CloudAsset] = []
+                    preview_only: Set[int] = set()
+                    for asset in page.assets:
+                        if (min_bytes and asset.size < min_bytes) or (max_bytes and asset.size > max_bytes):
+                            # zmenena polozka mimo filtr uz neodpovida zaznamu, ktery z ni vznikl
+                            asset_ref = (asset.provider, asset.account_id, asset.asset_id)
+                            previous = records_by_asset.get(asset_ref)
+                            if previous is not None and previous.cloud_revision_id != asset.revision_id:
+                                removed_ids.add(records_by_asset.pop(asset_ref).id)
+                            continue
+                        asset_key = (asset.provider, asset.account_id, asset.asset_id, asset.revision_id)
+                        if asset_key in existing_keys:
+                            continue
+                        existing_keys.add(asset_key)
+                        # k trideni staci nahled a duplicity pokryje checksum nebo hash nahledu;
+                        # original se stahne az pro export nebo otevrenou skupinu duplicit
+                        if (
+                            self.cloud_metadata_only
+                            and asset.download_state == CloudDownloadState.NOT_DOWNLOADED.value
+                            and not self.cloud_manager.cache_manager.is_cached(asset)
+                        ):
+                            preview_only.add(id(asset))
+                        pending.append(asset)
+                    if removed_ids:
+                        self._drop_records(removed_ids)
+                        removed += len(removed_ids)
+
+                    def fetch(asset: CloudAsset):
+                        if id(asset) in preview_only:
+                            return self.cloud_manager.ensure_thumbnail(asset)
+                        return self.cloud_manager.ensure_local_asset(asset)
+
+                    completed = 0
+                    for outcome in self.cloud_manager.iter_downloads(pending, task=fetch, should_cancel=progress.wasCanceled):
+                        completed += 1
+                        asset = outcome.asset
+                        if id(asset) in preview_only:
+                            metadata_only += 1
+                        elif not outcome.ok:
+                            if asset.download_state == CloudDownloadState.NOT_DOWNLOADED.value:
+                                skipped_unavailable += 1
+                            else:
+                                asset.download_state = CloudDownloadState.UNAVAILABLE.value
+                        previous = records_by_asset.get((asset.provider, asset.account_id, asset.asset_id))
+                        if previous is not None:
+                            self._replace_cloud_record(previous, asset, source.source_id)
+                            updated += 1
+                        else:
+                            rec = image_record_from_cloud_asset(asset, self.next_id, source.source_id)
+                            self.next_id += 1
+                            self.images.append(rec)
+                            self.image_by_id[rec.id] = rec
+                            records_by_asset[(asset.provider, asset.account_id, asset.asset_id)] = rec
+                            added += 1
+                            if self.current_view == "MAIN":
+                                self._add_record_to_list(rec)
+                        progress.update(
+                            added + updated,
+                            detail_text=(
+                                f"Zdroj: {source.name}\n"
+                                f"Polozka: {asset.name}\n"
+                                f"Pridano cloudovych zaznamu: {added}\n"
+                                f"Jen metadata bez stazeni: {metadata_only}\n"
+                                f"Nedostupne placeholdery nebo nepritomne kopie: {skipped_unavailable}"
+                            ),
+                        )
+                    if completed < len(pending):
+                        # token zustava na nedokoncene strance; uz pridane zaznamy pri navazani odfiltruje existing_keys
+                        break
+                    # po posledni strance zustane token inkrementalniho vypisu, pristi sken nacte jen zmeny
+                    next_token = page.next_page_token or page.sync_token
+                    if resync and page.next_page_token:
+                        # rozpracovana synchronizace si nechava stary token: preruseny sken
+                        # dostane znovu 410 a zacne od zacatku, jinak by nevedel, co odebrat
                         continue
-                    if asset.download_state != CloudDownloadState.NOT_DOWNLOADED.value:
-                        try:
-                            self.cloud_manager.ensure_local_asset(asset)
-                        except (CloudUnavailableError, CloudProviderError):
-                            asset.download_state = CloudDownloadState.UNAVAILABLE.value
-                    else:
-                        try:
-                            self.cloud_manager.ensure_local_asset(asset)
-                        except (CloudUnavailableError, CloudProviderError):
-                            skipped_unavailable += 1
-                    rec = image_record_from_cloud_asset(asset, self.next_id)
-                    self.next_id += 1
-                    self.images.append(rec)
-                    self.image_by_id[rec.id] = rec
-                    existing_keys.add(asset_key)
-                    added += 1
-                    if self.current_view == "MAIN":
-                        self._add_record_to_list(rec)
-                    progress.update(
-                        added,
-                        detail_text=(
-                            f"Zdroj: {source.name}\n"
-                            f"Polozka: {asset.name}\n"
-                            f"Pridano cloudovych zaznamu: {added}\n"
-                            f"Nedostupne placeholdery nebo nepritomne kopie: {skipped_unavailable}"
-                        ),
-                    )
+                    self._store_cloud_scan_token(source, scan_key, next_token)
+                    self.mark_dirty()
+                    if resync:
+                        removed += self._drop_unlisted_cloud_records(source, listed_ids, records_by_asset)
         finally:
             progress.complete()
+        self._log_cloud_transport()
+        if metadata_only:
+            logger.info("Cloud sken: %d polozek jen z metadat, stahnou se az pro nahled nebo export.", metadata_only)
+        if updated or removed:
+            self._recalculate_bucket_totals()
+            logger.info("Cloud sken: aktualizovano %d, odebrano %d zaznamu podle zmen u providera.", updated, removed)
+            self.mark_dirty()
         if added:
             self.mark_dirty()
             self.update_view_header()
             self.toast(f"Kájo pridal {added} cloudovych polozek.", "ok", 2600)
         elif skipped_unavailable:
             self.toast("Kájo nasel jen cloud-only polozky bez lokalni kopie.", "warn", 2600)
+    def _drop_unlisted_cloud_records(
+        self, source: CloudSource, listed_ids: Set[str], records_by_asset: Dict[Tuple[str, str, str], ImageRecord]
+    ) -> int:
+        """Po úplné synchronizaci odebere záznamy zdroje, které výpis už nevrátil."""
+        stale = [
+            rec
+            for rec in self.images
+            if rec.is_cloud
+            and rec.cloud_provider == source.provider
+            and rec.cloud_account_id == source.account_id
+            and rec.cloud_source_id == source.source_id
+            and rec.cloud_asset_id not in listed_ids
+        ]
+        for rec in stale:
+            records_by_asset.pop((rec.cloud_provider, rec.cloud_account_id, rec.cloud_asset_id), None)
+        if stale:
+            self._drop_records({rec.id for rec in stale})
+        return len(stale)
+    def _store_cloud_scan_token(self, source: CloudSource, scan_key: str, token: Optional[str]):
+        # jeden token na zdroj: token jineho filtru velikosti by pri zuzeni i rozsireni filtru lhal
+        source_key = cloud_source_key(source)
+        for key in [k for k in self.cloud_scan_resume if k == source_key or k.rsplit(":", 1)[0] == source_key]:
+            if key != scan_key:
+                del self.cloud_scan_resume[key]
+        if token:
+            self.cloud_scan_resume[scan_key] = token
+        else:
+            self.cloud_scan_resume.pop(scan_key, None)
     def _scan_directories(
         self,
         roots: List[str],
@@ -3459,133 +4186,400 @@ class MainWindow(QMainWindow):
         max_kb: int,
         ignore_system: bool,
     ):
+        if self._scan_job is not None:
+            self.toast("Kájo ještě skenuje předchozí složku.", "warn", 2200)
+            return
+        if self._duplicate_job is not None:
+            self.toast("Kájo právě prochází dvojníky, skenovat půjde až potom.", "warn", 2200)
+            return
         logger.info("Začíná skenování: %s", roots)
         if not append:
             self.reset_state()
-        scan_canceled = False
-        progress_scan = DagmarProgress("Prohledávám složky se zdrojovými fotografiemi…", self, 0)
-        progress_scan.set_detail_text("Prohledáno složek: 0\nNalezeno obrázků: 0")
+        min_bytes = min_kb * 1024 if min_kb > 0 else 0
+        max_bytes = max_kb * 1024 if max_kb > 0 else 0
+        self._scan_job_seq += 1
+        existing_paths = {rec.path: rec.id for rec in self.images}
+        worker = ScanWorker(
+            self._scan_job_seq,
+            roots,
+            ignore_system,
+            min_bytes,
+            max_bytes,
+            index=self.scan_index,
+            known_sizes={rec.path: rec.size for rec in self.images if not rec.is_cloud},
+        )
+        # nemodalni prubeh: behem skenu lze tridit uz nactene fotky
+        progress = DagmarProgress("Prohledávám složky a načítám obrázky…", self, 0, modal=False)
+        progress.set_detail_text("Prohledáno složek: 0\nNalezeno obrázků: 0\nPřidáno nových záznamů: 0")
+        self._scan_job = ScanJob(
+            job_id=worker.job_id,
+            worker=worker,
+            progress=progress,
+            existing_paths=existing_paths,
+            start_id=self.next_id,
+        )
+        worker.signals.batch.connect(self.on_scan_batch)
+        worker.signals.progress.connect(self.on_scan_progress)
+        worker.signals.finished.connect(self.on_scan_finished)
         self.toast("Kájo skenuje svět…", "warn", 1800)
-        def on_progress(found_count: int, dir_count: int) -> bool:
-            nonlocal scan_canceled
-            progress_scan.set_detail_text(
-                f"Prohledáno složek: {dir_count}\nNalezeno obrázků: {found_count}"
-            )
-            if progress_scan.wasCanceled():
-                scan_canceled = True
-                return False
-            return True
-        all_paths = iter_image_paths(roots, ignore_system=ignore_system, on_progress=on_progress)
-        progress_scan.complete()
-        if scan_canceled:
-            logger.info("Skenování preruseno uzivatelem.")
+        self.threadpool.start(worker)
+    def _scan_job_for(self, job_id: int) -> Optional[ScanJob]:
+        job = self._scan_job
+        if job is None or job.job_id != job_id:
+            return None
+        return job
+    def _scan_job_canceled(self, job: ScanJob) -> bool:
+        if not job.canceled and job.progress is not None and job.progress.wasCanceled():
+            logger.info("Skenování přerušeno uživatelem po %d nových záznamech.", job.added)
+            job.canceled = True
+            job.worker.cancel()
+        return job.canceled
+    def cancel_scan(self):
+        job = self._scan_job
+        if job is None:
             return
-        logger.info("Nalezeno %d kandidátů před filtrem velikosti.", len(all_paths))
-        if not all_paths:
-            self.sfx.play(SFX_ERROR)
-            self.toast("Kájo nic nenašel (0 obrázků).", "err", 2600)
+        job.canceled = True
+        job.worker.cancel()
+        if job.progress is not None:
+            job.progress.complete()
+        self._scan_job = None
+    def _update_scan_progress_text(self, job: ScanJob, dir_count: int, found_count: int):
+        if job.progress is None:
             return
-        progress_filter = DagmarProgress("Filtruji soubory podle velikosti…", self, len(all_paths))
-        progress_filter.set_detail_text("Vyřazuji příliš malé nebo příliš velké soubory.")
-        min_bytes = min_kb * 1024 if min_kb > 0 else 0
-        max_bytes = max_kb * 1024 if max_kb > 0 else 0
-        filtered: List[str] = []
-        filter_canceled = False
-        for i, p in enumerate(all_paths, start=1):
-            if progress_filter.wasCanceled():
-                logger.info("Filtrování přerušeno uživatelem.")
-                filter_canceled = True
-                break
-            kept_this_round = False
-            try:
-                sz = os.path.getsize(p)
-            except OSError:
-                sz = -1
-            if sz >= 0:
-                if min_bytes and sz < min_bytes:
-                    pass
-                elif max_bytes and sz > max_bytes:
-                    pass
-                else:
-                    filtered.append(p)
-                    kept_this_round = True
-            progress_filter.update(
-                i,
-                detail_text=(
-                    f"Posouzeno souborů: {i}\n"
-                    f"Zatím ponecháno: {len(filtered)}\n"
-                    f"Poslední soubor: {'ponechán' if kept_this_round else 'vyřazen nebo nepřístupný'}"
-                ),
-            )
-        progress_filter.complete()
-        if progress_filter.wasCanceled():
+        job.progress.set_detail_text(
+            f"Prohledáno složek: {dir_count}\n"
+            f"Nalezeno obrázků: {found_count}\n"
+            f"Přidáno nových záznamů: {job.added}"
+        )
+    @pyqtSlot(int, int, int)
+    def on_scan_progress(self, job_id: int, dir_count: int, found_count: int):
+        job = self._scan_job_for(job_id)
+        if job is None or job.canceled:
             return
-        logger.info("Po filtru velikosti zůstává %d souborů.", len(filtered))
-        if not filtered:
-            self.sfx.play(SFX_ERROR)
-            self.toast("Kájo vše vyfiltroval (0 prošlo).", "err", 2600)
+        self._update_scan_progress_text(job, dir_count, found_count)
+        self._scan_job_canceled(job)
+    @pyqtSlot(int, list)
+    def on_scan_batch(self, job_id: int, batch: list):
+        job = self._scan_job_for(job_id)
+        if job is None or job.canceled:
             return
-        progress = DagmarProgress("Načítám obrázky…", self, len(filtered))
-        progress.set_detail_text("Zakládám virtuální záznamy a připravuji náhledy.")
-        added = 0
-        start_id_before = self.next_id
-        existing_paths = {rec.path for rec in self.images}
-        for i, path in enumerate(filtered, start=1):
-            if progress is not None and progress.wasCanceled():
-                logger.info("Skenování přerušeno uživatelem po %d souborech.", i - 1)
-                break
-            if path in existing_paths:
-                if progress is not None:
-                    progress.update(i)
+        job.queue.append(batch)
+        if job.draining:
+            # wasCanceled() zpracovava udalosti, dalsi davka muze prijit vnorene; poradi drzi fronta
+            return
+        job.draining = True
+        try:
+            while job.queue and self._scan_job is job:
+                if self._scan_job_canceled(job):
+                    job.queue.clear()
+                    break
+                self._add_scanned_entries(job, job.queue.pop(0))
+        finally:
+            job.draining = False
+        if job.worker_done and self._scan_job is job:
+            self._finish_scan_job(job)
+    def _add_scanned_entries(self, job: ScanJob, batch: list):
+        added_now = 0
+        updated_now = 0
+        watch = job.watch_roots is not None
+        now = time.time()
+        for entry in batch:
+            path = entry.path
+            if watch:
+                job.seen_paths.add(path)
+                if 0 <= now - entry.mtime < WATCH_SETTLE_SECONDS:
+                    # soubor se mozna jeste kopiruje: castecna velikost by v zaznamu zustala
+                    job.unsettled_dirs.add(os.path.dirname(path))
+                    continue
+            if path in job.existing_paths:
+                # soubor zmeneny od minuleho skenu: aktualizovat existujici zaznam, nezakladat novy
+                rec = self.image_by_id.get(job.existing_paths[path])
+                if rec is not None and rec.size != entry.size:
+                    rec.size = entry.size
+                    self._invalidate_dimensions(rec)
+                    updated_now += 1
+                continue
+            if watch and (
+                (job.min_bytes and entry.size < job.min_bytes) or (job.max_bytes and entry.size > job.max_bytes)
+            ):
                 continue
+            rec = self._create_local_record(entry)
+            job.existing_paths[path] = rec.id
+            job.added += 1
+            added_now += 1
+        if updated_now:
+            job.updated += updated_now
+            self._recalculate_bucket_totals()
+        if added_now:
             try:
-                size = os.path.getsize(path)
-            except OSError:
-                size = 0
-            width, height = read_image_dimensions(path)
-            source = self._source_for_path(path)
-            rec = ImageRecord(
-                id=self.next_id,
-                path=path,
-                size=size,
-                bucket="MAIN",
-                width=width,
-                height=height,
-                source_provider=source.provider if source else "local",
-                source_label=source.label if source else "Lokalni slozka",
-                source_root=source.root if source else "",
-                read_only=source.read_only if source else False,
-            )
-            self.next_id += 1
-            self.images.append(rec)
-            self.image_by_id[rec.id] = rec
-            existing_paths.add(path)
-            added += 1
-            # pokud aktuální pohled je MAIN, přidat do listu
-            if self.current_view == "MAIN":
-                self._add_record_to_list(rec)
-                try:
-                    self._coin_per_file(1)
-                except Exception:
-                    pass
-            if progress is not None:
-                progress.update(
-                    i,
-                    detail_text=f"Přidáno nových záznamů: {added}\nAktuální soubor: {os.path.basename(path)}",
+                self._coin_per_file(added_now)
+            except Exception:
+                pass
+        if added_now or updated_now:
+            self.mark_dirty()
+    def _create_local_record(self, entry: ScanEntry) -> ImageRecord:
+        source = self._source_for_path(entry.path)
+        # rozmery doplni DimensionProbeWorker na pozadi, zalozeni zaznamu na ne neceka
+        rec = ImageRecord(
+            id=self.next_id,
+            path=entry.path,
+            size=entry.size,
+            bucket="MAIN",
+            source_provider=source.provider if source else "local",
+            source_label=source.label if source else "Lokalni slozka",
+            source_root=source.root if source else "",
+            read_only=source.read_only if source else False,
+        )
+        self.next_id += 1
+        self.images.append(rec)
+        self.image_by_id[rec.id] = rec
+        # pokud aktuální pohled je MAIN, přidat do listu
+        if self.current_view == "MAIN":
+            self._add_record_to_list(rec)
+        self._queue_dimension_probe(rec)
+        return rec
+    def _log_cloud_transport(self):
+        for key, stats in self.cloud_manager.transport_stats().items():
+            if stats.requests:
+                logger.info(
+                    "Cloud HTTP %s: %d pozadavku, %d novych spojeni, %d pres keep-alive.",
+                    key,
+                    stats.requests,
+                    stats.new_connections,
+                    stats.reused_connections,
                 )
-        if progress is not None:
-            progress.complete()
-            if progress.wasCanceled():
+    def _replace_cloud_record(self, rec: ImageRecord, asset: CloudAsset, source_id: str = ""):
+        """Přepíše záznam novou revizí cloudové položky; id a hromádka zůstávají."""
+        fresh = image_record_from_cloud_asset(asset, rec.id, source_id or rec.cloud_source_id)
+        fresh.bucket = rec.bucket
+        for item in fields(ImageRecord):
+            setattr(rec, item.name, getattr(fresh, item.name))
+        self.thumb_cache.pop(rec.id, None)
+        self._dims_probed.discard(rec.id)
+    def _drop_records(self, record_ids: set[int]):
+        """Odebere záznamy včetně položek seznamu bez přestavby celého pohledu."""
+        for rec_id in record_ids:
+            item = self.item_by_id.get(rec_id)
+            if item is not None:
+                self.list_widget.takeItem(self.list_widget.row(item))
+        self._remove_records_by_ids(record_ids)
+    @pyqtSlot(int, bool, object)
+    def on_scan_finished(self, job_id: int, canceled: bool, stats: object):
+        job = self._scan_job_for(job_id)
+        if job is None:
+            return
+        job.worker_done = True
+        job.canceled = job.canceled or canceled
+        if not job.draining:
+            self._finish_scan_job(job)
+    def _finish_scan_job(self, job: ScanJob):
+        self._scan_job = None
+        if job.watch_roots is not None:
+            self._finish_watch_rescan(job)
+            self._flush_watch_deferred()
+            return
+        job.progress.complete()
+        if self.folder_watcher.is_active():
+            self._watch_scan_sources()
+        self._flush_watch_deferred()
+        stats = job.worker.stats
+        if not job.canceled:
+            logger.info(
+                "Prohledáno %d složek (%d beze změny z indexu), %d obrázků prošlo filtrem velikosti, %d vyřazeno.",
+                stats.dirs,
+                stats.reused_dirs,
+                stats.found,
+                stats.filtered_out,
+            )
+            if not stats.found:
+                self.sfx.play(SFX_ERROR)
+                if stats.filtered_out:
+                    self.toast("Kájo vše vyfiltroval (0 prošlo).", "err", 2600)
+                else:
+                    self.toast("Kájo nic nenašel (0 obrázků).", "err", 2600)
                 return
         logger.info(
-            "Skenování dokončeno, přidáno %d nových záznamů (ID od %d do %d).",
-            added,
-            start_id_before,
+            "Skenování dokončeno, přidáno %d nových záznamů (ID od %d do %d), aktualizováno %d změněných.",
+            job.added,
+            job.start_id,
             self.next_id - 1,
+            job.updated,
         )
-        if added > 0:
-            self.mark_dirty()
         self.update_view_header()
+    # ---------------- ROZMĚRY ----------------
+    def _queue_dimension_probe(self, rec: ImageRecord):
+        if rec.width is not None or rec.id in self._dims_probed:
+            return
+        self._dims_queue.append(rec.id)
+        if not self._dims_kick_pending:
+            # davku skladame az po navratu do event loopu, at se sejde vic zaznamu
+            self._dims_kick_pending = True
+            QTimer.singleShot(0, self._start_dimension_probe)
+    def _invalidate_dimensions(self, rec: ImageRecord):
+        rec.width = None
+        rec.height = None
+        self._dims_probed.discard(rec.id)
+        self._queue_dimension_probe(rec)
+    def _start_dimension_probe(self):
+        self._dims_kick_pending = False
+        if self._dims_worker_running:
+            return
+        items: List[Tuple[int, str]] = []
+        while self._dims_queue and len(items) < DIMENSION_PROBE_BATCH:
+            rec = self.image_by_id.get(self._dims_queue.popleft())
+            if rec is None or rec.width is not None or rec.id in self._dims_probed:
+                continue
+            local_path = self._local_path_for_record(rec)
+            if not local_path:
+                continue
+            items.append((rec.id, local_path))
+        if not items:
+            return
+        worker = DimensionProbeWorker(items)
+        worker.signals.finished.connect(self.on_dimensions_ready)
+        self._dims_worker_running = True
+        self.threadpool.start(worker, DIMENSION_PROBE_PRIORITY)
+    @pyqtSlot(list)
+    def on_dimensions_ready(self, results: list):
+        self._dims_worker_running = False
+        for rec_id, path, width, height in results:
+            rec = self.image_by_id.get(rec_id)
+            if rec is None or self._local_path_for_record(rec) != path:
+                continue
+            self._dims_probed.add(rec_id)
+            if rec.width is None:
+                rec.width, rec.height = width, height
+        if self._dims_queue:
+            self._start_dimension_probe()
+    def _ensure_dimensions(self, records: List[ImageRecord]):
+        """Rozměry na vyžádání: co prober ještě nestihl, se přečte hned."""
+        for rec in records:
+            if rec.width is not None or rec.id in self._dims_probed:
+                continue
+            local_path = self._local_path_for_record(rec)
+            if not local_path:
+                continue
+            rec.width, rec.height = read_image_dimensions(local_path)
+            self._dims_probed.add(rec.id)
+    # ---------------- HLÍDÁNÍ SLOŽEK ----------------
+    def _toggle_watch(self):
+        if self.folder_watcher.is_active() or self._watch_listing_job:
+            self.stop_watching()
+            self.toast("Hlídání složek vypnuto.", "warn", 1600)
+            return
+        if not self.scan_sources:
+            self.toast("Kájo nemá co hlídat, nejdřív načtěte složku.", "warn", 2200)
+            return
+        self._watch_scan_sources(announce=True)
+    def _watch_scan_sources(self, announce: bool = False):
+        """Spustí výpis adresářů zdrojů ve vlákně poolu; hlídat se začne v `on_watch_dirs_listed`."""
+        self._watch_listing_seq += 1
+        self._watch_listing_job = self._watch_listing_seq
+        self._watch_listing_announce = announce
+        worker = WatchDirsWorker(
+            self._watch_listing_job,
+            [os.path.abspath(source.root) for source in self.scan_sources],
+            self.last_ignore_system,
+            self.scan_index,
+        )
+        worker.signals.finished.connect(self.on_watch_dirs_listed)
+        self.threadpool.start(worker)
+    @pyqtSlot(int, list)
+    def on_watch_dirs_listed(self, job_id: int, dirs: list):
+        if job_id != self._watch_listing_job:
+            return  # hlidani mezitim vypnuto nebo vypis spusten znovu
+        self._watch_listing_job = 0
+        self.folder_watcher.add_dirs(dirs)
+        watched = len(self.folder_watcher.watched_dirs())
+        logger.info("Hlidani slozek: %d adresaru, z toho %d nativne.", watched, self.folder_watcher.native_dir_count())
+        if not self._watch_listing_announce:
+            return
+        if not watched:
+            self.stop_watching()
+            self.toast("Kájo nenašel žádnou existující složku k hlídání.", "warn", 2200)
+            return
+        self.btn_watch.setText("Hlídání: ON")
+        self.toast(f"Kájo hlídá {watched} složek.", "ok", 2000)
+    def stop_watching(self):
+        self.folder_watcher.stop()
+        self._watch_listing_job = 0
+        self._watch_deferred.clear()
+        if hasattr(self, "btn_watch"):
+            self.btn_watch.setText("Hlídání: OFF")
+    def _flush_watch_deferred(self):
+        if self._watch_deferred and self._scan_job is None and self._duplicate_job is None:
+            deferred = sorted(self._watch_deferred)
+            self._watch_deferred.clear()
+            self.on_watched_dirs_changed(deferred)
+    @pyqtSlot(list)
+    def on_watched_dirs_changed(self, dirs: list):
+        if self._scan_job is not None or self._duplicate_job is not None:
+            # sken ma vlastni snapshot cest a dialog duplicit drzi skupiny zaznamu;
+            # zmeny se zpracuji az po jejich dokonceni
+            self._watch_deferred.update(dirs)
+            return
+        roots = sorted({os.path.abspath(d) for d in dirs})
+        if not roots:
+            return
+        self._scan_job_seq += 1
+        # vypis bezi ve ScanWorker mimo GUI vlakno; filtr velikosti plati jen pro nove zaznamy
+        worker = ScanWorker(
+            self._scan_job_seq,
+            roots,
+            self.last_ignore_system,
+            0,
+            0,
+            index=self.scan_index,
+            watched=self.folder_watcher.watched_dirs(),
+        )
+        self._scan_job = ScanJob(
+            job_id=worker.job_id,
+            worker=worker,
+            progress=None,
+            existing_paths={rec.path: rec.id for rec in self.images if not rec.is_cloud},
+            start_id=self.next_id,
+            watch_roots=roots,
+            min_bytes=self.last_min_kb * 1024 if self.last_min_kb > 0 else 0,
+            max_bytes=self.last_max_kb * 1024 if self.last_max_kb > 0 else 0,
+        )
+        worker.signals.batch.connect(self.on_scan_batch)
+        worker.signals.finished.connect(self.on_scan_finished)
+        self.threadpool.start(worker)
+    def _finish_watch_rescan(self, job: ScanJob):
+        if job.canceled:
+            return
+        worker = job.worker
+        listed = set(worker.listed_dirs)
+        gone = tuple(worker.gone_dirs)
+        gone_prefixes = tuple(d + os.sep for d in gone)
+        removed_ids: set[int] = set()
+        for rec in self.images:
+            if rec.is_cloud or rec.path in job.seen_paths:
+                continue
+            dirpath = os.path.dirname(rec.path)
+            if dirpath in listed or dirpath in gone or dirpath.startswith(gone_prefixes):
+                removed_ids.add(rec.id)
+        if self.folder_watcher.is_active():
+            watched = self.folder_watcher.watched_dirs()
+            # se smazanou slozkou zmizely i jeji podslozky
+            self.folder_watcher.remove_dirs(d for d in watched if d in gone or d.startswith(gone_prefixes))
+            self.folder_watcher.add_dirs(d for d in worker.listed_dirs if d not in watched)
+        if removed_ids:
+            self._drop_records(removed_ids)
+        if job.added or job.updated or removed_ids:
+            logger.info(
+                "Hlidani slozek: pridano %d, aktualizovano %d, odebrano %d zaznamu.",
+                job.added,
+                job.updated,
+                len(removed_ids),
+            )
+            self.mark_dirty()
+        if job.unsettled_dirs:
+            unsettled = sorted(job.unsettled_dirs)
+            QTimer.singleShot(int(WATCH_SETTLE_SECONDS * 1000), lambda: self._recheck_watched_dirs(unsettled))
+    def _recheck_watched_dirs(self, dirs: List[str]):
+        if self.folder_watcher.is_active():
+            self.on_watched_dirs_changed(dirs)
     # ---------------- SAVE / LOAD ----------------
     def _do_save(self) -> bool:
         path = self._exec_save_dialog(
@@ -3619,6 +4613,7 @@ class MainWindow(QMainWindow):
             "scan_sources": [source.to_dict() for source in self.scan_sources],
             "cloud_accounts": [account.to_dict() for account in self.cloud_manager.list_accounts()],
             "cloud_sources": cloud_sources_payload,
+            "cloud_scan_resume": dict(self.cloud_scan_resume),
             "current_view": self.current_view,
             "last_min_kb": self.last_min_kb,
             "last_max_kb": self.last_max_kb,
@@ -3695,6 +4690,11 @@ class MainWindow(QMainWindow):
         self.last_min_kb = data.get("last_min_kb", 0)
         self.last_max_kb = data.get("last_max_kb", 0)
         self.last_ignore_system = data.get("last_ignore_system", True)
+        resume_data = data.get("cloud_scan_resume", {})
+        if isinstance(resume_data, dict):
+            self.cloud_scan_resume = {
+                str(key): value for key, value in resume_data.items() if isinstance(value, str) and value
+            }
         buckets_data = data.get("buckets", {})
         for code, cfg in self.buckets.items():
             bd = buckets_data.get(code, {})
@@ -3759,15 +4759,20 @@ class MainWindow(QMainWindow):
                     cloud_stable_id=rec_data.get("cloud_stable_id", ""),
                     cloud_revision_id=rec_data.get("cloud_revision_id", ""),
                     cloud_source_uri=rec_data.get("cloud_source_uri", ""),
+                    cloud_source_id=rec_data.get("cloud_source_id", ""),
                     local_cache_path=rec_data.get("local_cache_path", ""),
                     download_state=rec_data.get("download_state", CloudDownloadState.LOCAL.value),
                     cloud_original_metadata=rec_data.get("cloud_original_metadata", {}) or {},
+                    cloud_checksums=rec_data.get("cloud_checksums", {}) or {},
+                    cloud_thumbnail_path=rec_data.get("cloud_thumbnail_path", ""),
                 )
                 if rec.is_cloud:
                     if rec.cloud_account_id not in self.cloud_manager.accounts:
                         rec.download_state = CloudDownloadState.UNAVAILABLE.value
                     elif rec.local_cache_path and not os.path.exists(rec.local_cache_path):
                         rec.download_state = CloudDownloadState.UNAVAILABLE.value
+                    if rec.cloud_thumbnail_path and not os.path.exists(rec.cloud_thumbnail_path):
+                        rec.cloud_thumbnail_path = ""
             except Exception:
                 rec = None
             if rec is not None:
@@ -3776,6 +4781,7 @@ class MainWindow(QMainWindow):
                 used_ids.add(rec.id)
                 self.next_id = max(self.next_id, rec.id + 1)
                 loaded_name = os.path.basename(rec.path)
+                self._queue_dimension_probe(rec)
                 if rec.bucket != "MAIN":
                     b = self.buckets.get(rec.bucket)
                     if b:
@@ -3940,110 +4946,287 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(outro_ms + 200, lambda: QApplication.instance().quit())
     # ---------------- DUPLICITY ----------------
     def on_find_duplicates(self):
+        if self._scan_job is not None:
+            self.toast("Kájo ještě skenuje, dvojníky hledejte až po dokončení.", "warn", 2200)
+            return
+        if self._duplicate_job is not None:
+            self.toast("Kájo ještě ukončuje předchozí hledání dvojníků.", "warn", 2200)
+            return
         main_records = [rec for rec in self.images if rec.bucket == "MAIN" and self._can_use_record_for_duplicates(rec)]
-        if len(main_records) < 2:
+        cloud_records = [rec for rec in self.images if rec.bucket == "MAIN" and self._can_match_record_by_checksum(rec)]
+        preview_records = [
+            rec
+            for rec in self.images
+            if rec.bucket == "MAIN"
+            and rec.is_cloud
+            and not self._can_use_record_for_duplicates(rec)
+            and self._preview_path_for_record(rec)
+        ]
+        if len({rec.id for rec in main_records + cloud_records + preview_records}) < 2:
             self.sfx.play(SFX_ERROR)
             self.toast("Kájo potřebuje aspoň 2 fotky v hlavním světě.", "err", 2600)
             return
-        progress = DagmarProgress("Delam forenzni kontrolu souboru…", self, len(main_records))
-        progress.set_detail_text("Porovnavam otisky souboru bez hromadneho kopirovani na lokalni disk.")
-        exact_map: Dict[str, List[ImageRecord]] = {}
-        for i, rec in enumerate(main_records, start=1):
-            if progress is not None and progress.wasCanceled():
-                logger.info("Hledání duplicit přerušeno uživatelem.")
-                progress.complete()
-                return
-            local_path = self._local_path_for_record(rec)
-            signature = sampled_file_signature(local_path, rec.size) if local_path else None
-            if signature is not None:
-                exact_map.setdefault(signature, []).append(rec)
-            if progress is not None:
-                progress.update(
-                    i,
-                    detail_text=f"Zkontrolováno souborů: {i}\nAktuální soubor: {os.path.basename(local_path or rec.path)}",
-                )
-        if progress is not None:
-            progress.complete()
-        groups: List[List[ImageRecord]] = [lst for lst in exact_map.values() if len(lst) > 1]
-        already_grouped_ids = {rec.id for group in groups for rec in group}
-        remaining = [rec for rec in main_records if rec.id not in already_grouped_ids]
-
-        if len(remaining) >= 2:
-            progress = DagmarProgress("Porovnavam vizualni podobnost fotek…", self, len(remaining))
-            progress.set_detail_text("Druha faze porovnava nahledove hashy a rozmery fotek.")
-            phashes: List[Tuple[ImageRecord, int]] = []
-            for i, rec in enumerate(remaining, start=1):
-                if progress is not None and progress.wasCanceled():
-                    logger.info("Vizuální porovnání duplicit přerušeno uživatelem.")
-                    progress.complete()
-                    return
-                local_path = self._local_path_for_record(rec)
-                h = perceptual_hash(local_path) if local_path else None
-                if h is not None:
-                    phashes.append((rec, h))
-                if progress is not None:
-                    progress.update(
-                        i,
-                        detail_text=f"Zkontrolováno fotek: {i}\nAktuální soubor: {os.path.basename(local_path or rec.path)}",
-                    )
-            if progress is not None:
-                progress.complete()
-
-            used_ids = set()
-            for idx, (anchor, anchor_hash) in enumerate(phashes):
-                if anchor.id in used_ids:
-                    continue
-                group = [anchor]
-                for other, other_hash in phashes[idx + 1:]:
-                    if other.id in used_ids:
-                        continue
-                    max_size = max(anchor.size, other.size, 1)
-                    size_delta = abs(anchor.size - other.size) / max_size
-                    same_geometry = (
-                        anchor.width is not None
-                        and anchor.height is not None
-                        and anchor.width == other.width
-                        and anchor.height == other.height
-                    )
-                    if hamming_distance(anchor_hash, other_hash) <= 6 and (size_delta <= 0.15 or same_geometry):
-                        group.append(other)
-                if len(group) > 1:
-                    groups.append(group)
-                    used_ids.update(rec.id for rec in group)
-        if not groups:
-            self.toast("Kájo nenašel žádné dvojníky.", "ok", 2200)
+        hash_kinds = self._ask_duplicate_options()
+        if not hash_kinds:
             return
+        self._duplicate_job_seq += 1
+        worker = DuplicateSearchWorker(
+            self._duplicate_job_seq,
+            main_records,
+            hash_kinds,
+            self._signature_task,
+            self._visual_task,
+            verify_full=self.verify_full_content,
+            group_max=self.duplicate_group_max,
+            cloud_records=cloud_records,
+            checksum_task=self._checksum_task,
+            preview_records=preview_records,
+        )
+        progress = DagmarProgress("Hledám duplicity…", self, len(main_records) + len(cloud_records))
+        progress.set_detail_text("Potvrzené skupiny se ukážou hned, hledání mezitím poběží dál.")
+        job = DuplicateJob(job_id=worker.job_id, worker=worker, progress=progress)
+        self._duplicate_job = job
+        worker.signals.group_ready.connect(self.on_duplicate_group_ready)
+        worker.signals.progress.connect(self.on_duplicate_progress)
+        worker.signals.dimensions.connect(self.on_duplicate_dimensions)
+        worker.signals.failed.connect(self.on_duplicate_failed)
+        worker.signals.finished.connect(self.on_duplicate_finished)
+        self.threadpool.start(worker)
         auto_mode = False
-        for idx, group in enumerate(groups):
-            if auto_mode:
-                self._auto_handle_group(group)
-                continue
-            dlg = DuplicateGroupDialog(self, idx, len(groups), group)
-            dlg_result = dlg.exec()
-            choice = dlg.choice
-            if choice == "abort":
-                logger.info("Uživatel přerušil zpracování duplicit.")
-                break
-            if choice == "skip":
-                continue
-            if choice == "trash_all":
-                for rec in group:
-                    self._set_record_bucket(rec, "DUPLICITA")
-                self.mark_dirty()
-            if choice == "keep_marked":
-                keep_indices = dlg.selected_indices
-                keep_ids = {group[i].id for i in keep_indices}
-                for rec in group:
-                    if rec.id in keep_ids:
-                        self._set_record_bucket(rec, "MAIN")
-                    else:
+        try:
+            while True:
+                group = self._next_duplicate_group(job)
+                if group is None:
+                    break
+                job.shown += 1
+                if auto_mode:
+                    self._auto_handle_group(group)
+                    continue
+                # nahled skupiny je jedine misto, kde se nestazena cloudova polozka opravdu stahuje
+                pending_cloud = [rec for rec in group if rec.is_cloud and not self._local_path_for_record(rec)]
+                if pending_cloud:
+                    fetch_progress = DagmarProgress("Stahuji cloudové originály skupiny…", self, len(pending_cloud))
+                    try:
+                        self._fetch_cloud_records(pending_cloud, fetch_progress)
+                    finally:
+                        fetch_progress.complete()
+                self._ensure_dimensions(group)
+                dlg = DuplicateGroupDialog(
+                    self, job.shown - 1, job.found, group, search_running=not job.worker_done
+                )
+                dlg.exec()
+                choice = dlg.choice
+                if choice == "abort":
+                    logger.info("Uživatel přerušil zpracování duplicit.")
+                    break
+                if choice == "skip":
+                    continue
+                if choice == "trash_all":
+                    for rec in group:
                         self._set_record_bucket(rec, "DUPLICITA")
-                self.mark_dirty()
-            if choice == "auto_all":
-                auto_mode = True
-                self._auto_handle_group(group)
+                    self.mark_dirty()
+                if choice == "keep_marked":
+                    keep_indices = dlg.selected_indices
+                    keep_ids = {group[i].id for i in keep_indices}
+                    for rec in group:
+                        if rec.id in keep_ids:
+                            self._set_record_bucket(rec, "MAIN")
+                        else:
+                            self._set_record_bucket(rec, "DUPLICITA")
+                    self.mark_dirty()
+                if choice == "auto_all":
+                    auto_mode = True
+                    self._auto_handle_group(group)
+        finally:
+            job.review_done = True
+            progress.complete()
+            if job.worker_done:
+                self._release_duplicate_job(job)
+            else:
+                # prerusene ulohy poolu jeste mohou zapisovat do hash cache;
+                # job se uvolni az v on_duplicate_finished
+                worker.cancel()
+        if job.error:
+            self.sfx.play(SFX_ERROR)
+            self.toast("Kájo při hledání dvojníků narazil na chybu, hledání nedoběhlo.", "err", 3200)
+        elif job.canceled:
+            logger.info("Hledání duplicit přerušeno uživatelem.")
+        if not job.shown:
+            if not job.canceled and not job.error:
+                self.toast("Kájo nenašel žádné dvojníky.", "ok", 2200)
+            return
         self.rebuild_list()
         self.update_view_header()
+    def _next_duplicate_group(self, job: DuplicateJob) -> Optional[List[ImageRecord]]:
+        """Další hotová skupina z fronty; na novou čeká ve vnořené smyčce událostí nad dialogem průběhu."""
+        while not job.queue:
+            if job.worker_done or job.canceled:
+                return None
+            if job.progress.wasCanceled():
+                job.canceled = True
+                job.worker.cancel()
+                return None
+            job.progress.show()
+            # skupinu i konec doruci signaly workeru, casovac jen hlida tlacitko preruseni
+            loop = QEventLoop()
+            job.worker.signals.group_ready.connect(loop.quit)
+            job.worker.signals.finished.connect(loop.quit)
+            QTimer.singleShot(DUPLICATE_WAIT_POLL_MS, loop.quit)
+            loop.exec()
+            job.worker.signals.group_ready.disconnect(loop.quit)
+            job.worker.signals.finished.disconnect(loop.quit)
+        job.progress.hide()
+        return job.queue.popleft()
+    def _release_duplicate_job(self, job: DuplicateJob):
+        if self._duplicate_job is not job:
+            return
+        self._duplicate_job = None
+        self.hash_cache.commit()
+        logger.info("Cache hashu: %d zaznamu pouzito, %d spocitano znovu.", *self.hash_cache.take_stats())
+        self._flush_watch_deferred()
+    def _duplicate_job_for(self, job_id: int) -> Optional[DuplicateJob]:
+        job = self._duplicate_job
+        if job is None or job.job_id != job_id:
+            return None
+        return job
+    @pyqtSlot(int, str, list)
+    def on_duplicate_group_ready(self, job_id: int, kind: str, group: list):
+        job = self._duplicate_job_for(job_id)
+        if job is None or job.review_done:
+            return
+        job.queue.append(group)
+        job.found += 1
+        logger.info(
+            "Nalezena %s skupina duplicit (%d fotek), ve fronte %d.",
+            "presna" if kind == "exact" else "vizualni",
+            len(group),
+            len(job.queue),
+        )
+    @pyqtSlot(int, str, int, int, float, str)
+    def on_duplicate_progress(self, job_id: int, stage: str, done: int, total: int, rate: float, current: str):
+        job = self._duplicate_job_for(job_id)
+        if job is None or job.review_done:
+            return
+        if job.progress.maximum() != total:
+            job.progress.set_maximum(total)
+        job.progress.update(
+            done,
+            detail_text=(
+                f"{stage}: {done}/{total}\nRychlost: {rate:.0f} souborů/s\n"
+                f"Nalezeno skupin: {job.found}, zpracováno: {job.shown}\nAktuální soubor: {current}"
+            ),
+        )
+    @pyqtSlot(int, list)
+    def on_duplicate_dimensions(self, job_id: int, dims: list):
+        for rec_id, width, height in dims:
+            rec = self.image_by_id.get(rec_id)
+            if rec is not None:
+                self._apply_known_dimensions(rec, (width, height))
+    @pyqtSlot(int, str)
+    def on_duplicate_failed(self, job_id: int, error: str):
+        job = self._duplicate_job_for(job_id)
+        if job is None:
+            return
+        job.error = error or "neznama chyba"
+    @pyqtSlot(int, bool)
+    def on_duplicate_finished(self, job_id: int, canceled: bool):
+        job = self._duplicate_job_for(job_id)
+        if job is None:
+            return
+        job.worker_done = True
+        job.canceled = job.canceled or canceled
+        if job.review_done:
+            self._release_duplicate_job(job)
+    def _hash_cache_identity(
+        self, rec: ImageRecord, local_path: Optional[str], preview: bool = False
+    ) -> Optional[Tuple[str, int, int]]:
+        """Klíč cache: cloud podle provider/účet/asset/revize (náhled zvlášť), lokální soubor podle cesty, velikosti a mtime."""
+        if rec.is_cloud and rec.cloud_asset_id and rec.cloud_revision_id:
+            key = cloud_key(rec.cloud_provider, rec.cloud_account_id, rec.cloud_asset_id, rec.cloud_revision_id, preview=preview)
+            return key, rec.size, 0
+        if not local_path:
+            return None
+        try:
+            st = os.stat(local_path)
+        except OSError:
+            return None
+        return local_key(local_path), int(st.st_size), int(st.st_mtime_ns)
+    # Ulohy pro iter_parallel bezi ve vlaknech poolu: zaznam jen ctou, GUI stav meni az volajici.
+    def _signature_task(
+        self, rec: ImageRecord, full_content: bool
+    ) -> Tuple[str, Optional[str], Optional[Tuple[int, int]]]:
+        local_path = self._local_path_for_record(rec)
+        identity = self._hash_cache_identity(rec, local_path)
+        cached = self.hash_cache.lookup(*identity) if identity is not None else None
+        dims = (cached.width, cached.height) if cached is not None and cached.width is not None else None
+        field_name = "digest" if full_content else "signature"
+        signature = getattr(cached, field_name) if cached is not None else None
+        if full_content and signature is not None and not signature.startswith(FULL_SIGNATURE_PREFIX):
+            signature = None  # otisk starsim algoritmem nejde porovnat s novymi
+        if signature is None and local_path:
+            compute = full_file_signature if full_content else sampled_file_signature
+            signature = compute(local_path, rec.size)
+            if signature is not None and identity is not None:
+                self.hash_cache.store(*identity, **{field_name: signature})
+        return local_path, signature, dims
+    def _checksum_task(
+        self, rec: ImageRecord, algorithms: Sequence[str]
+    ) -> Tuple[str, Dict[str, str], None]:
+        """Checksumy v algoritmech providera: z metadat cloudu, u lokálního souboru jedním čtením."""
+        checksums = {alg: rec.cloud_checksums[alg] for alg in algorithms if alg in rec.cloud_checksums}
+        missing = [alg for alg in algorithms if alg not in checksums]
+        local_path = self._local_path_for_record(rec) if missing else ""
+        if local_path:
+            checksums.update(file_checksums(local_path, missing))
+        return local_path, checksums, None
+    def _visual_task(
+        self, rec: ImageRecord, hash_kinds: Sequence[str]
+    ) -> Tuple[str, Optional[Dict[str, int]], Optional[Tuple[int, int]]]:
+        """Percepční hashe z cache; chybějící se spočítají jedním dekódováním a uloží.
+
+        Nestažená cloudová položka se hashuje z náhledu a ukládá pod vlastní
+        klíč; po stažení originálu se hashe spočítají znovu z něj.
+        """
+        local_path = self._local_path_for_record(rec)
+        preview_only = not local_path
+        if preview_only:
+            local_path = self._preview_path_for_record(rec)
+        if not local_path:
+            return local_path, None, None
+        identity = self._hash_cache_identity(rec, local_path, preview=preview_only)
+        cached = self.hash_cache.lookup(*identity) if identity is not None else None
+        dims = (cached.width, cached.height) if cached is not None and cached.width is not None else None
+        flat_slot = hash_slot(FLAT_HASH_KIND, DEFAULT_HASH_SIZE)
+        if cached is not None and flat_slot in cached.hashes:
+            return local_path, {FLAT_HASH_KIND: cached.hashes[flat_slot]}, dims
+        slots = {kind: hash_slot(kind, DEFAULT_HASH_SIZE) for kind in hash_kinds}
+        hashes = {kind: cached.hashes[slot] for kind, slot in slots.items() if cached is not None and slot in cached.hashes}
+        missing = [kind for kind in hash_kinds if kind not in hashes]
+        if not missing:
+            return local_path, hashes, dims
+        computed = image_hashes(local_path, missing)
+        if not computed:
+            return local_path, hashes or computed, dims
+        hashes.update(computed)
+        if dims is None:
+            if rec.width is not None:
+                dims = (rec.width, rec.height)
+            elif preview_only:
+                dims = (None, None)  # rozmery nahledu nejsou rozmery originalu
+            else:
+                dims = read_image_dimensions(local_path)
+        if identity is not None:
+            self.hash_cache.store(
+                *identity,
+                hashes={hash_slot(kind, DEFAULT_HASH_SIZE): value for kind, value in computed.items()},
+                width=dims[0],
+                height=dims[1],
+            )
+        return local_path, hashes, dims
+    def _apply_known_dimensions(self, rec: ImageRecord, dims: Optional[Tuple[Optional[int], Optional[int]]]):
+        if rec.width is None and dims is not None and dims[0] is not None:
+            rec.width, rec.height = dims
+            self._dims_probed.add(rec.id)
     def _auto_handle_group(self, group: List[ImageRecord]):
         if not group:
             return
@@ -4056,6 +5239,13 @@ class MainWindow(QMainWindow):
         self.mark_dirty()
     # ---------------- SPUSŤ KÁJU (fyzický přesun) ----------------
     def on_run_apply(self):
+        if self._scan_job is not None:
+            self._kajo_box(
+                "Kájo ještě skenuje",
+                "Skenování složek stále běží. Fyzické přesuny spusťte až po jeho dokončení nebo přerušení.",
+                kind="warn",
+            )
+            return
         if not self.images:
             self._kajo_box("Kájo, není co provést", "Není nic k provedení.", kind="info")
             return
@@ -4092,6 +5282,17 @@ class MainWindow(QMainWindow):
         )
         if clicked != "Kájo, proveď to":
             return
+        # polozky naskenovane jen z metadat se stahnou az pro export, soubezne pred sestavenim operaci
+        cloud_exports = [
+            rec for rec in self.images
+            if rec.is_cloud and rec.bucket not in ("MAIN", "TRASH") and not self._local_path_for_record(rec)
+        ]
+        if cloud_exports:
+            progress = DagmarProgress("Stahuji cloudové originály pro export…", self, len(cloud_exports))
+            try:
+                self._fetch_cloud_records(cloud_exports, progress)
+            finally:
+                progress.complete()
         # sestavit operace
         operations: List[Tuple[ImageRecord, str, str]] = []  # (rec, op_type, target_path_or_empty)
         missing_sources = 0
@@ -4102,14 +5303,14 @@ class MainWindow(QMainWindow):
                 continue
             local_path = self._local_path_for_record(rec)
             if rec.is_cloud:
-                if not local_path:
-                    missing_sources += 1
-                    logger.warning("Cloudova cache nebo lokalni kopie chybi, preskakuji: %s", rec.cloud_asset_id)
-                    continue
                 if rec.bucket == "TRASH":
                     cloud_trash_skipped += 1
                     logger.warning("Cloudovy original se nema mazat, preskakuji TRASH: %s", rec.cloud_asset_id)
                     continue
+                if not local_path:
+                    missing_sources += 1
+                    logger.warning("Cloudova cache nebo lokalni kopie chybi, preskakuji: %s", rec.cloud_asset_id)
+                    continue
                 b = self.buckets.get(rec.bucket)
                 if not b or not b.path:
                     logger.warning("Bucket %s nema cestu pro export cloudove kopie, preskakuji: %s", rec.bucket, rec.cloud_asset_id)
@@ -4288,7 +5489,17 @@ class MainWindow(QMainWindow):
         except Exception:
             pass
         try:
+            self.cancel_scan()
+            if self._duplicate_job is not None:
+                self._duplicate_job.worker.cancel()
+            self.stop_watching()
             self.threadpool.waitForDone(3000)
+            self.scan_index.close()
+            self.hash_cache.evict()
+            self.hash_cache.close()
+            self._log_cloud_transport()
+            self.cloud_manager.download_scheduler.close()
+            self.cloud_manager.http_pool.close()
         except Exception:
             pass
         event.accept()
@@ -0,0 +1,87 @@
+"""Benchmark čtení rozměrů: hlavičkový parser proti QImageReader.
+
+Spuštění z kořene repa:
+    python benchmarks/bench_dimensions.py --files 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from PyQt6.QtWidgets import QApplication
+
+from KajovoPhotoSelector import _qimage_reader_dimensions, read_image_dimensions
+from kps_imagesize import read_header_dimensions
+
+FORMATS = [
+    ("jpg", {"quality": 90}),
+    ("jpg", {"quality": 85, "progressive": True}),
+    ("png", {}),
+    ("webp", {"quality": 80}),
+    ("gif", {}),
+    ("tif", {}),
+    ("bmp", {}),
+]
+
+
+def build_corpus(root: str, count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    exif = Image.Exif()
+    exif[274] = 6
+    paths = []
+    for index in range(count):
+        ext, kwargs = FORMATS[index % len(FORMATS)]
+        width, height = rng.randint(320, 1600), rng.randint(240, 1200)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        image = Image.new("RGB", (width, height), color)
+        if ext == "jpg" and index % 3 == 0:
+            kwargs = dict(kwargs, exif=exif.tobytes())
+        path = os.path.join(root, f"img{index:05d}.{ext}")
+        image.save(path, **kwargs)
+        paths.append(path)
+    return paths
+
+
+def timed(label: str, func, paths: list) -> list:
+    started = time.perf_counter()
+    results = [func(path) for path in paths]
+    elapsed = time.perf_counter() - started
+    rate = len(paths) / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {rate:10.0f} souboru/s")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000, help="velikost syntetickeho korpusu")
+    parser.add_argument("--rounds", type=int, default=3, help="pocet opakovani mereni")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    with tempfile.TemporaryDirectory(prefix="kps-bench-") as root:
+        print(f"Generuji {args.files} souboru do {root} ...")
+        paths = build_corpus(root, args.files)
+        for round_no in range(1, args.rounds + 1):
+            print(f"-- kolo {round_no}")
+            qt = timed("QImageReader.size()", _qimage_reader_dimensions, paths)
+            header = timed("read_header_dimensions", read_header_dimensions, paths)
+            timed("read_image_dimensions", read_image_dimensions, paths)
+        unparsed = sum(1 for dims in header if dims is None)
+        # QImageReader.size() orientaci neuplatni, srovnava se proto bez ohledu na otoceni
+        mismatched = sum(
+            1 for q, h in zip(qt, header)
+            if h is not None and q != h and q != (h[1], h[0])
+        )
+        print(f"Neparsovano hlavickou: {unparsed}, nesouhlasi s QImageReader: {mismatched}")
+    del app
+    return 0 if mismatched == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
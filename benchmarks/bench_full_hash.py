@@ -0,0 +1,81 @@
+"""Benchmark ověření celého obsahu: propustnost v MB/s podle algoritmu a způsobu čtení.
+
+Porovnává vzorkovaný podpis, `full_file_signature` (BLAKE2b přes mmap
+i přes buffer) a SHA1 nad stejným korpusem náhodných souborů velikosti
+RAW fotek. Soubory jsou po prvním kole v page cache, měří se tedy
+hlavně cena hashe, ne disku.
+
+Spuštění z kořene repa:
+    python benchmarks/bench_full_hash.py --files 8 --size-mb 32
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from KajovoPhotoSelector import (
+    FULL_HASH_BLOCK_SIZE,
+    _hash_buffered_file,
+    full_file_signature,
+    sampled_file_signature,
+)
+
+
+def sha1_signature(path: str, size: int) -> str:
+    hasher = hashlib.sha1()
+    with open(path, "rb", buffering=0) as f:
+        _hash_buffered_file(f, hasher)
+    return f"sha1:{size}:{hasher.hexdigest()}"
+
+
+VARIANTS = [
+    ("sampled_file_signature", sampled_file_signature),
+    ("blake2b mmap", full_file_signature),
+    ("blake2b buffer", lambda path, size: full_file_signature(path, size, use_mmap=False)),
+    ("sha1 buffer", sha1_signature),
+]
+
+
+def build_corpus(root: str, count: int, size: int) -> list:
+    paths = []
+    for index in range(count):
+        path = os.path.join(root, f"raw{index:03d}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8, help="pocet souboru v korpusu")
+    parser.add_argument("--size-mb", type=int, default=32, help="velikost jednoho souboru v MB")
+    parser.add_argument("--rounds", type=int, default=3, help="pocet opakovani mereni")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    total_mb = args.files * args.size_mb
+    with tempfile.TemporaryDirectory(prefix="kps-bench-") as root:
+        print(f"Generuji {args.files} x {args.size_mb} MB do {root}, blok cteni {FULL_HASH_BLOCK_SIZE >> 20} MB ...")
+        paths = build_corpus(root, args.files, size)
+        for round_no in range(1, args.rounds + 1):
+            print(f"-- kolo {round_no}")
+            for label, func in VARIANTS:
+                started = time.perf_counter()
+                signatures = [func(path, size) for path in paths]
+                elapsed = time.perf_counter() - started
+                rate = total_mb / elapsed if elapsed else float("inf")
+                print(f"{label:<24} {elapsed * 1000:9.1f} ms  {rate:10.0f} MB/s")
+                if any(signature is None for signature in signatures):
+                    print(f"{label}: nektery soubor se nepodarilo precist")
+                    return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""Benchmark percepčních hashů: přesnost/úplnost a hashe za sekundu.
+
+Korpus tvoří syntetické základní snímky a jejich varianty (zmenšení,
+překomprimování do JPEG, ořez, zesvětlení). Za duplicitu se považují
+varianty stejného základu; páry napříč základy jsou nesouvisející.
+
+Spuštění z kořene repa:
+    python benchmarks/bench_hashes.py --bases 60
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+from PyQt6.QtWidgets import QApplication
+
+from KajovoPhotoSelector import image_hashes
+from kps_hashing import HAS_NUMPY, HASH_KINDS, hashes_match
+
+COMBINATIONS = [("ahash",), ("dhash",), ("phash",), ("whash",), ("phash", "dhash"), ("ahash", "dhash", "phash", "whash")]
+
+
+def make_base(rng: random.Random, size=(640, 480)) -> Image.Image:
+    image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randint(40, 300), y0 + rng.randint(40, 300)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def variants(image: Image.Image):
+    width, height = image.size
+    yield "resized", image.resize((width // 2, height // 2)), {}
+    yield "recompressed", image, {"quality": 35}
+    crop = (int(width * 0.04), int(height * 0.04), int(width * 0.96), int(height * 0.96))
+    yield "cropped", image.crop(crop), {}
+    yield "brighter", ImageEnhance.Brightness(image).enhance(1.15), {}
+
+
+def build_corpus(root: str, bases: int, seed: int = 11):
+    rng = random.Random(seed)
+    items = []  # (path, base_id)
+    for base_id in range(bases):
+        base = make_base(rng)
+        path = os.path.join(root, f"b{base_id:04d}.png")
+        base.save(path)
+        items.append((path, base_id))
+        for name, variant, kwargs in variants(base):
+            vpath = os.path.join(root, f"b{base_id:04d}_{name}.jpg")
+            variant.convert("RGB").save(vpath, **kwargs)
+            items.append((vpath, base_id))
+    return items
+
+
+def evaluate(items, kinds):
+    started = time.perf_counter()
+    hashes = [image_hashes(path, kinds) or {} for path, _base in items]
+    elapsed = time.perf_counter() - started
+    tp = fp = fn = 0
+    for (left, (_lp, lb)), (right, (_rp, rb)) in itertools.combinations(zip(hashes, items), 2):
+        match = hashes_match(left, right, kinds)
+        if lb == rb:
+            tp += match
+            fn += not match
+        else:
+            fp += match
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall, len(items) / elapsed if elapsed else float("inf")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bases", type=int, default=40, help="pocet zakladnich snimku (kazdy ma 4 varianty)")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    with tempfile.TemporaryDirectory(prefix="kps-hash-bench-") as root:
+        items = build_corpus(root, args.bases)
+        print(f"Korpus: {len(items)} souboru, NumPy: {'ano' if HAS_NUMPY else 'ne'}")
+        print(f"{'kombinace':<28} {'presnost':>9} {'uplnost':>9} {'hashu/s':>10}")
+        for kinds in COMBINATIONS:
+            precision, recall, rate = evaluate(items, kinds)
+            label = "+".join(kinds)
+            print(f"{label:<28} {precision:9.3f} {recall:9.3f} {rate:10.0f}")
+        print("Prahy: " + ", ".join(f"{name}<={spec.max_distance}" for name, spec in HASH_KINDS.items()))
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,8 @@
 from .base import CloudProviderBase
 from .cache import CloudCacheManager, app_data_dir, cache_root_dir
+from .downloads import DownloadOutcome, DownloadScheduler, RetryPolicy
+from .http_pool import HttpSessionPool, TransportStats
+from .checksums import CHECKSUM_ALGORITHMS, QuickXorHash, drive_checksums, file_checksums, onedrive_checksums
 from .errors import (
     CloudAuthError,
     CloudConfigurationError,
@@ -23,6 +26,7 @@ from .models import (
 )
 
 __all__ = [
+    "CHECKSUM_ALGORITHMS",
     "CloudAccount",
     "CloudAsset",
     "CloudAuthError",
@@ -42,10 +46,19 @@ __all__ = [
     "CloudSource",
     "CloudUnavailableError",
     "CloudUserActionRequired",
+    "DownloadOutcome",
+    "DownloadScheduler",
+    "HttpSessionPool",
+    "QuickXorHash",
+    "RetryPolicy",
+    "TransportStats",
     "app_data_dir",
     "cache_root_dir",
     "detect_cloud_sources",
+    "drive_checksums",
+    "file_checksums",
     "normalize_scan_sources",
+    "onedrive_checksums",
     "provider_label",
     "source_for_path",
 ]
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
 from typing import Iterable, Optional
 
+from .cache import THUMBNAIL_SIZE
+from .errors import CloudConfigurationError, CloudRateLimitError
 from .models import CloudAccount, CloudAsset, CloudScanResult, CloudSource
 
 
 class CloudProviderBase(ABC):
     provider_type: str = ""
+    http_session = None
+    session_pool = None
+
+    def _http(self, account_id: str = ""):
+        """Injektovaná session má přednost; jinak pooled keep-alive session providera a účtu."""
+        if self.http_session is not None:
+            return self.http_session
+        if self.session_pool is not None:
+            return self.session_pool.session_for(self.provider_type, account_id)
+        return None
+
+    def _http_available(self) -> bool:
+        return self.http_session is not None or (self.session_pool is not None and self.session_pool.available)
 
     @abstractmethod
     def display_name(self) -> str:
@@ -57,3 +73,21 @@ class CloudProviderBase(ABC):
     @abstractmethod
     def health_check(self, account_id: str) -> str:
         raise NotImplementedError
+
+    def download_thumbnail(self, asset: CloudAsset, cache_manager, size: int = THUMBNAIL_SIZE) -> Optional[str]:
+        """Cesta k náhledu v cache; provider bez náhledové vrstvy vrací None."""
+        return None
+
+    def _download_url(self, url: str, headers: dict, target_path: str, timeout: int = 60, account_id: str = "") -> int:
+        session = self._http(account_id)
+        if session is None:
+            raise CloudConfigurationError("Chybi balicek requests.")
+        response = session.get(url, headers=headers, timeout=timeout, stream=True)
+        if response.status_code in {429, 500, 502, 503, 504}:
+            raise CloudRateLimitError("Cloudova sluzba je docasne omezena nebo nedostupna.")
+        response.raise_for_status()
+        with open(target_path, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=1024 * 128):
+                if chunk:
+                    handle.write(chunk)
+        return os.path.getsize(target_path)
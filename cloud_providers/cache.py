@@ -8,6 +8,9 @@ from typing import Callable, Dict
 
 from .models import CloudAsset, CloudDownloadResult, CloudDownloadState
 
+THUMBNAIL_SIZE = 256  # px delsi strany; staci na trideni i na percepcni hashe
+THUMBNAIL_DIR = "_thumbs"
+
 
 def app_data_dir(app_name: str = "KajovoPhotoSelector") -> str:
     home = os.path.expanduser("~")
@@ -72,6 +75,19 @@ class CloudCacheManager:
         name = _safe_segment(asset.name or "soubor", "soubor")
         return os.path.join(asset_dir, name)
 
+    def build_thumbnail_path(self, asset: CloudAsset, size: int = THUMBNAIL_SIZE) -> str:
+        # nahledy maji vlastni strom, aby je nepletl is_cached ani manifest originalu
+        revision = asset.revision_id or "bez_revize"
+        return os.path.join(
+            self.root_dir,
+            THUMBNAIL_DIR,
+            _safe_segment(asset.provider, "provider"),
+            _safe_segment(asset.account_id, "ucet"),
+            _safe_segment(asset.asset_id or asset.stable_id, "asset"),
+            _safe_segment(revision, "revize"),
+            f"nahled_{int(size)}",
+        )
+
     def build_manifest_path(self, asset: CloudAsset) -> str:
         return os.path.join(self._asset_dir(asset), "manifest.json")
 
@@ -118,6 +134,20 @@ class CloudCacheManager:
             json.dump(payload, handle, ensure_ascii=False, indent=2)
         return manifest_path
 
+    @staticmethod
+    def _download_to(partial_path: str, target_path: str, downloader: Callable[[str], int]) -> int:
+        """Stáhne do `.part` a přejmenuje; nedokončený `.part` po chybě smaže."""
+        try:
+            bytes_written = downloader(partial_path)
+            os.replace(partial_path, target_path)
+        except BaseException:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+        return bytes_written
+
     def ensure_download(
         self,
         asset: CloudAsset,
@@ -141,8 +171,7 @@ class CloudCacheManager:
         partial_path = f"{target_path}.part"
         if os.path.exists(partial_path):
             os.remove(partial_path)
-        bytes_written = downloader(partial_path)
-        os.replace(partial_path, target_path)
+        bytes_written = self._download_to(partial_path, target_path, downloader)
         manifest_path = self.write_manifest(asset, target_path, bytes_written)
         asset.local_cache_path = target_path
         asset.download_state = CloudDownloadState.CACHED.value
@@ -154,6 +183,15 @@ class CloudCacheManager:
             bytes_written=bytes_written,
         )
 
+    def ensure_thumbnail(self, asset: CloudAsset, size: int, downloader: Callable[[str], int]) -> str:
+        """Náhled revize assetu v cache; stahuje se jen jednou, originál zůstává nestažený."""
+        target_path = self.build_thumbnail_path(asset, size)
+        if not (os.path.exists(target_path) and os.path.getsize(target_path) > 0):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            self._download_to(f"{target_path}.part", target_path, downloader)
+        asset.thumbnail_path = target_path
+        return target_path
+
     def register_local_asset(self, asset: CloudAsset, local_path: str) -> CloudDownloadResult:
         asset.local_cache_path = local_path
         asset.download_state = CloudDownloadState.LOCAL.value
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+# poradi preference pri porovnani: silnejsi hash vyhrava, quickXorHash je jen u OneDrive
+CHECKSUM_ALGORITHMS = ("sha256", "sha1", "md5", "quickxor")
+CHECKSUM_BLOCK_SIZE = 160 * 8192
+
+_QUICKXOR_WIDTH = 160
+_QUICKXOR_SHIFT = 11
+_QUICKXOR_MASK = (1 << _QUICKXOR_WIDTH) - 1
+_DRIVE_FIELDS = {"md5": "md5Checksum", "sha1": "sha1Checksum", "sha256": "sha256Checksum"}
+_ONEDRIVE_FIELDS = {"sha1": "sha1Hash", "sha256": "sha256Hash", "quickxor": "quickXorHash"}
+
+
+def _fold_rows(data: bytes) -> int:
+    """XOR všech 160bajtových řádků; délka `data` musí být násobkem 160."""
+    value = int.from_bytes(data, "little")
+    rows = len(data) // _QUICKXOR_WIDTH
+    while rows > 1:
+        keep = rows - rows // 2
+        bits = keep * _QUICKXOR_WIDTH * 8
+        value = (value & ((1 << bits) - 1)) ^ (value >> bits)
+        rows = keep
+    return value
+
+
+class QuickXorHash:
+    """quickXorHash z Microsoft Graph: bajt n se XORuje do 160bitového registru na bit (n * 11) mod 160.
+
+    Pozice se opakuje po 160 bajtech, proto se proud nejdřív složí XORem
+    řádků po 160 bajtech a rotace se udělají jen jednou pro každý sloupec.
+    """
+
+    name = "quickxor"
+
+    def __init__(self, data: bytes = b""):
+        self._folded = 0
+        self._pending = b""
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes) -> None:
+        self._length += len(data)
+        buffer = self._pending + bytes(data)
+        usable = len(buffer) - len(buffer) % _QUICKXOR_WIDTH
+        if usable:
+            self._folded ^= _fold_rows(buffer[:usable])
+        self._pending = buffer[usable:]
+
+    def digest(self) -> bytes:
+        folded = self._folded ^ int.from_bytes(self._pending, "little")
+        value = 0
+        for column in range(_QUICKXOR_WIDTH):
+            byte = (folded >> (column * 8)) & 0xFF
+            if byte:
+                shift = (column * _QUICKXOR_SHIFT) % _QUICKXOR_WIDTH
+                value ^= ((byte << shift) | (byte >> (_QUICKXOR_WIDTH - shift))) & _QUICKXOR_MASK
+        result = bytearray(value.to_bytes(_QUICKXOR_WIDTH // 8, "little"))
+        for index, byte in enumerate(self._length.to_bytes(8, "little")):
+            result[_QUICKXOR_WIDTH // 8 - 8 + index] ^= byte
+        return bytes(result)
+
+    def b64digest(self) -> str:
+        return base64.b64encode(self.digest()).decode("ascii")
+
+
+def normalize_checksum(algorithm: str, value: Any) -> Optional[str]:
+    """Jednotný zápis: hex malými písmeny, quickXorHash jako base64 od providera."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if algorithm == "quickxor":
+        return value
+    return value.lower()
+
+
+def _checksums_from(mapping: Mapping[str, Any], fields: Mapping[str, str]) -> Dict[str, str]:
+    checksums: Dict[str, str] = {}
+    for algorithm, key in fields.items():
+        value = normalize_checksum(algorithm, mapping.get(key))
+        if value is not None:
+            checksums[algorithm] = value
+    return checksums
+
+
+def drive_checksums(item: Mapping[str, Any]) -> Dict[str, str]:
+    """Checksumy z položky Google Drive `files.list` / `files.get`."""
+    return _checksums_from(item, _DRIVE_FIELDS)
+
+
+def onedrive_checksums(item: Mapping[str, Any]) -> Dict[str, str]:
+    """Checksumy z facetu `file.hashes` položky OneDrive."""
+    hashes = (item.get("file") or {}).get("hashes") or {}
+    return _checksums_from(hashes, _ONEDRIVE_FIELDS)
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == "quickxor":
+        return QuickXorHash()
+    return hashlib.new(algorithm)
+
+
+def file_checksums(path: str, algorithms: Iterable[str], block_size: int = CHECKSUM_BLOCK_SIZE) -> Dict[str, str]:
+    """Spočítá požadované checksumy lokálního souboru jedním průchodem; při chybě čtení vrací prázdný slovník."""
+    hashers = {algorithm: _new_hasher(algorithm) for algorithm in algorithms if algorithm in CHECKSUM_ALGORITHMS}
+    if not hashers:
+        return {}
+    try:
+        with open(path, "rb") as handle:
+            while True:
+                block = handle.read(block_size)
+                if not block:
+                    break
+                for hasher in hashers.values():
+                    hasher.update(block)
+    except OSError:
+        return {}
+    return {
+        algorithm: hasher.b64digest() if algorithm == "quickxor" else hasher.hexdigest()
+        for algorithm, hasher in hashers.items()
+    }
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from .errors import CloudRateLimitError
+from .models import CloudAsset, CloudProviderType
+
+try:  # pragma: no cover
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
+except Exception:  # pragma: no cover
+    RequestsConnectionError = ConnectionError
+    RequestsTimeout = TimeoutError
+
+logger = logging.getLogger(__name__)
+
+# API providery snesou nekolik soubeznych stahovani na ucet, lokalni zdroje jen kopiruji z disku
+DEFAULT_PROVIDER_LIMITS = {
+    CloudProviderType.GOOGLE_DRIVE.value: 6,
+    CloudProviderType.ONEDRIVE.value: 6,
+    CloudProviderType.GOOGLE_PHOTOS.value: 4,
+}
+DEFAULT_DOWNLOAD_LIMIT = 2
+RETRYABLE_ERRORS: Tuple[type, ...] = (
+    CloudRateLimitError,
+    ConnectionError,
+    TimeoutError,
+    RequestsConnectionError,
+    RequestsTimeout,
+)
+
+
+@dataclass
+class RetryPolicy:
+    """Exponenciální backoff s náhodným rozptylem, společný pro všechny providery."""
+
+    attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    retry_on: Tuple[type, ...] = RETRYABLE_ERRORS
+    sleep: Callable[[float], None] = time.sleep
+
+    def delay(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return ceiling / 2 + random.random() * ceiling / 2
+
+    def call(self, func: Callable[[], object]) -> object:
+        """Zavolá `func` a dočasné chyby zopakuje; po posledním pokusu chybu propustí."""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except self.retry_on as e:
+                if attempt >= self.attempts:
+                    raise
+                delay = self.delay(attempt - 1)
+                logger.info("Docasna chyba stahovani (%s), pokus %d za %.1f s.", e, attempt + 1, delay)
+                self.sleep(delay)
+
+
+@dataclass
+class DownloadOutcome:
+    asset: CloudAsset
+    result: object = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class DownloadScheduler:
+    """Souběžné stahování s limitem na providera a sdílenou retry politikou.
+
+    Fronta se rozděluje po providerech; nová úloha se odešle, jen když má
+    její provider volný slot, takže vlákna nikdy nečekají na semafor.
+    Vlákna žijí přes všechna volání `run` až do `close()`, takže si
+    provider může držet klienty a spojení na vlákno mezi stránkami výpisu.
+    """
+
+    limits: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_PROVIDER_LIMITS))
+    default_limit: int = DEFAULT_DOWNLOAD_LIMIT
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    _executor: Optional[ThreadPoolExecutor] = field(default=None, init=False, repr=False)
+    _executor_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def limit_for(self, provider: str) -> int:
+        return max(1, int(self.limits.get(provider, self.default_limit)))
+
+    def _shared_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # vsechny znamé limity najednou plus sloty pro providera bez vlastniho limitu
+                workers = sum(self.limit_for(provider) for provider in self.limits) + max(1, self.default_limit)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kps-download")
+            return self._executor
+
+    def close(self) -> None:
+        """Ukončí sdílená vlákna; neodeslané úlohy zahodí, další `run` si založí nová."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _attempt(self, task: Callable[[CloudAsset], object], asset: CloudAsset) -> DownloadOutcome:
+        outcome = DownloadOutcome(asset=asset)
+
+        def once():
+            outcome.attempts += 1
+            return task(asset)
+
+        try:
+            outcome.result = self.retry.call(once)
+        except Exception as e:
+            logger.warning("Stazeni %s/%s selhalo: %s", asset.provider, asset.asset_id, e)
+            outcome.error = e
+        return outcome
+
+    def run(
+        self,
+        assets: Iterable[CloudAsset],
+        task: Callable[[CloudAsset], object],
+        should_cancel: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.1,
+    ) -> Iterator[DownloadOutcome]:
+        """Spustí `task` pro každý asset a výsledky vrací v pořadí dokončení.
+
+        Generátor běží ve vlákně volajícího; `should_cancel()` se kontroluje
+        nejméně každých `poll_interval` sekund a True zahodí dosud neodeslané
+        položky, rozběhnutá stahování dokončí na pozadí.
+        """
+        queues: Dict[str, Deque[CloudAsset]] = {}
+        for asset in assets:
+            queues.setdefault(asset.provider, deque()).append(asset)
+        if not queues:
+            return
+        active: Dict[str, int] = {provider: 0 for provider in queues}
+        executor = self._shared_executor()
+        running: Dict[Future, str] = {}
+        try:
+            while True:
+                if should_cancel is not None and should_cancel():
+                    return
+                for provider, queue in queues.items():
+                    while queue and active[provider] < self.limit_for(provider):
+                        running[executor.submit(self._attempt, task, queue.popleft())] = provider
+                        active[provider] += 1
+                if not running:
+                    return
+                done, _pending = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    active[running.pop(future)] -= 1
+                    yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
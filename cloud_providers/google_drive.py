@@ -3,12 +3,16 @@ from __future__ import annotations
 import io
 import json
 import os
+import re
+import threading
 import time
 from typing import Iterable, Optional
 
 from .base import CloudProviderBase
-from .cache import CloudCacheManager
+from .cache import THUMBNAIL_SIZE, CloudCacheManager
+from .checksums import drive_checksums
 from .errors import CloudAuthError, CloudConfigurationError, CloudRateLimitError
+from .http_pool import HttpSessionPool
 from .models import (
     CloudAccount,
     CloudAsset,
@@ -36,14 +40,32 @@ except Exception:  # pragma: no cover - aplikace má zůstat spustitelná i bez
     HttpError = Exception
     MediaIoBaseDownload = None
 
+CHANGES_SCAN_MODE = "changes"
+FILE_FIELDS = (
+    "id,name,mimeType,size,md5Checksum,sha1Checksum,sha256Checksum,thumbnailLink,imageMediaMetadata,"
+    "createdTime,modifiedTime,webViewLink,headRevisionId,driveId,parents"
+)
+# tokeny sync rezimu: "files:<startPageToken>:<pageToken>" behem plneho vypisu, "changes:<pageToken>" pro zmeny
+_FILES_TOKEN = "files:"
+_CHANGES_TOKEN = "changes:"
+
 
 class GoogleDriveProvider(CloudProviderBase):
     provider_type = CloudProviderType.GOOGLE_DRIVE.value
     readonly_scopes = ["https://www.googleapis.com/auth/drive.readonly"]
 
-    def __init__(self, token_store: TokenStore, service_factory=None):
+    def __init__(self, token_store: TokenStore, service_factory=None, http_session=None, session_pool=None):
         self.token_store = token_store
         self.service_factory = service_factory or self._build_service
+        self.http_session = http_session
+        self.session_pool = session_pool or HttpSessionPool()
+        # credentials jsou sdilene pro vsechna vlakna; discovery klient nad httplib2 neni thread-safe,
+        # proto ma kazde vlakno vlastni instanci na ucet
+        self._credentials: dict = {}
+        self._credential_locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._thread_services = threading.local()
+        self._service_generation: dict[str, int] = {}
 
     def display_name(self) -> str:
         return "Google Drive API"
@@ -87,18 +109,56 @@ class GoogleDriveProvider(CloudProviderBase):
     def _serialize_credentials(self, credentials) -> str:
         return credentials.to_json()
 
+    def _credential_lock(self, account_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._credential_locks.setdefault(account_id, threading.Lock())
+
     def _load_credentials(self, account_id: str):
+        """Vrátí credentials účtu z paměti; token store čte jen poprvé a po neplatnosti.
+
+        Prošlé credentials obnoví právě jedno vlákno, ostatní čekají na zámku
+        účtu a dostanou už obnovenou instanci. Do token store se zapisuje
+        jen při skutečné změně serializace.
+        """
         if Credentials is None:
             raise CloudConfigurationError("Chybi knihovny google-auth nebo google-api-python-client.")
-        raw = self.token_store.get_token(self._token_key(account_id))
-        if not raw:
-            raise CloudAuthError("Google Drive ucet neni prihlaseny.")
-        info = json.loads(raw)
-        credentials = Credentials.from_authorized_user_info(info, scopes=self.readonly_scopes)
-        if credentials.expired and credentials.refresh_token and Request is not None:
-            credentials.refresh(Request())
-            self.token_store.set_token(self._token_key(account_id), self._serialize_credentials(credentials))
-        return credentials
+        with self._credential_lock(account_id):
+            credentials = self._credentials.get(account_id)
+            if credentials is None:
+                raw = self.token_store.get_token(self._token_key(account_id))
+                if not raw:
+                    raise CloudAuthError("Google Drive ucet neni prihlaseny.")
+                info = json.loads(raw)
+                credentials = Credentials.from_authorized_user_info(info, scopes=self.readonly_scopes)
+                self._credentials[account_id] = credentials
+            if credentials.expired and credentials.refresh_token and Request is not None:
+                before = self._serialize_credentials(credentials)
+                credentials.refresh(Request())
+                after = self._serialize_credentials(credentials)
+                if after != before:
+                    self.token_store.set_token(self._token_key(account_id), after)
+            return credentials
+
+    def _forget_account(self, account_id: str) -> None:
+        with self._credential_lock(account_id):
+            self._credentials.pop(account_id, None)
+            self._service_generation[account_id] = self._service_generation.get(account_id, 0) + 1
+
+    def _service(self, account_id: str):
+        """Discovery klient účtu pro aktuální vlákno; staví se jednou na vlákno a účet."""
+        if self.service_factory == self._build_service:
+            # obnovi prosle credentials pod zamkem uctu driv, nez si je klient obnovi sam
+            self._load_credentials(account_id)
+        services = getattr(self._thread_services, "by_account", None)
+        if services is None:
+            services = self._thread_services.by_account = {}
+        generation = self._service_generation.get(account_id, 0)
+        cached = services.get(account_id)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        service = self.service_factory(account_id)
+        services[account_id] = (generation, service)
+        return service
 
     def _build_service(self, account_id: str):
         credentials = self._load_credentials(account_id)
@@ -114,6 +174,7 @@ class GoogleDriveProvider(CloudProviderBase):
         user = profile.get("user", {}) or {}
         account_id = user.get("emailAddress") or user.get("displayName") or "google-drive"
         self.token_store.set_token(self._token_key(account_id), self._serialize_credentials(credentials))
+        self._forget_account(account_id)
         return CloudAccount(
             provider=self.provider_type,
             account_id=account_id,
@@ -127,6 +188,7 @@ class GoogleDriveProvider(CloudProviderBase):
 
     def disconnect(self, account_id: str) -> None:
         self.token_store.delete_token(self._token_key(account_id))
+        self._forget_account(account_id)
 
     def _execute_with_retry(self, callback, retries: int = 4):
         delay = 1.0
@@ -144,7 +206,7 @@ class GoogleDriveProvider(CloudProviderBase):
                 raise
 
     def list_sources(self, account_id: str) -> list[CloudSource]:
-        service = self.service_factory(account_id)
+        service = self._service(account_id)
         about = self._execute_with_retry(lambda: service.about().get(fields="user").execute())
         sources = [
             CloudSource(
@@ -156,7 +218,7 @@ class GoogleDriveProvider(CloudProviderBase):
                 kind="drive",
                 is_read_only=True,
                 limitation_text="Cte pouze metadata a obsah v rezimu read-only.",
-                metadata={"space": "drive", "user": about.get("user", {})},
+                metadata={"space": "drive", "user": about.get("user", {}), "scan_mode": CHANGES_SCAN_MODE},
             )
         ]
         drives = self._execute_with_retry(
@@ -173,33 +235,80 @@ class GoogleDriveProvider(CloudProviderBase):
                     kind="shared_drive",
                     is_read_only=True,
                     limitation_text="Sdileny disk v rezimu read-only.",
-                    metadata=dict(drive),
+                    metadata={**drive, "scan_mode": CHANGES_SCAN_MODE},
                 )
             )
         return sources
 
+    def _asset_from_item(self, source: CloudSource, item: dict, mime_prefixes: list[str]) -> Optional[CloudAsset]:
+        mime_type = str(item.get("mimeType", ""))
+        if mime_prefixes and not any(mime_type.startswith(prefix) for prefix in mime_prefixes):
+            return None
+        image_metadata = item.get("imageMediaMetadata", {}) or {}
+        return CloudAsset(
+            provider=self.provider_type,
+            account_id=source.account_id,
+            asset_id=str(item.get("id", "")),
+            stable_id=str(item.get("id", "")),
+            revision_id=str(item.get("headRevisionId", "")) or str(item.get("modifiedTime", "")),
+            name=str(item.get("name", "")),
+            mime_type=mime_type,
+            size=int(item.get("size", 0) or 0),
+            width=image_metadata.get("width"),
+            height=image_metadata.get("height"),
+            created_time=str(item.get("createdTime", "")),
+            modified_time=str(item.get("modifiedTime", "")),
+            source_uri=str(item.get("webViewLink") or f"gdrive://file/{item.get('id', '')}"),
+            download_state=CloudDownloadState.NOT_DOWNLOADED.value,
+            is_read_only=True,
+            original_provider_metadata=dict(item),
+            checksums=drive_checksums(item),
+        )
+
+    def _drive_params(self, source: CloudSource) -> dict:
+        if source.kind == "shared_drive":
+            return {"driveId": source.source_id}
+        return {}
+
     def list_assets(
         self,
         source: CloudSource,
         mime_filter: Optional[Iterable[str]] = None,
         page_token: Optional[str] = None,
     ) -> CloudScanResult:
-        service = self.service_factory(source.account_id)
-        fields = (
-            "nextPageToken, files(id,name,mimeType,size,md5Checksum,imageMediaMetadata,"
-            "createdTime,modifiedTime,webViewLink,headRevisionId,driveId,parents)"
-        )
+        """Vypíše stránku obrázků zdroje.
+
+        Zdroje z `list_sources` běží v sync režimu: před prvním plným výpisem
+        si vezmou `startPageToken`, poslední stránka ho vrátí jako `sync_token`
+        a další sken čte jen `changes.list` (přidané, změněné i odebrané soubory).
+        """
+        service = self._service(source.account_id)
         mime_prefixes = list(mime_filter or ["image/"])
+        sync = source.metadata.get("scan_mode") == CHANGES_SCAN_MODE
+        if sync and page_token and page_token.startswith(_CHANGES_TOKEN):
+            return self._list_changes(service, source, mime_prefixes, page_token[len(_CHANGES_TOKEN):])
+        start_token = None
+        if sync:
+            if page_token and page_token.startswith(_FILES_TOKEN):
+                start_token, _, page_token = page_token[len(_FILES_TOKEN):].partition(":")
+                page_token = page_token or None
+            else:
+                # token zmen se bere pred vypisem, aby se neztratily zmeny behem nej
+                start = self._execute_with_retry(
+                    lambda: service.changes().getStartPageToken(supportsAllDrives=True, **self._drive_params(source)).execute()
+                )
+                start_token = str(start.get("startPageToken", ""))
         query = "trashed = false and mimeType contains 'image/'"
         params = {
-            "fields": fields,
-            "pageSize": 100,
+            "fields": f"nextPageToken, files({FILE_FIELDS})",
+            "pageSize": 1000 if sync else 100,
             "pageToken": page_token,
             "supportsAllDrives": True,
             "includeItemsFromAllDrives": True,
             "q": query,
-            "orderBy": "modifiedTime desc",
         }
+        if not sync:
+            params["orderBy"] = "modifiedTime desc"
         if source.kind == "shared_drive":
             params["corpora"] = "drive"
             params["driveId"] = source.source_id
@@ -209,39 +318,62 @@ class GoogleDriveProvider(CloudProviderBase):
         response = self._execute_with_retry(lambda: service.files().list(**params).execute())
         assets: list[CloudAsset] = []
         for item in response.get("files", []) or []:
-            mime_type = str(item.get("mimeType", ""))
-            if mime_prefixes and not any(mime_type.startswith(prefix) for prefix in mime_prefixes):
+            asset = self._asset_from_item(source, item, mime_prefixes)
+            if asset is not None:
+                assets.append(asset)
+        next_page_token = response.get("nextPageToken")
+        sync_token = None
+        if sync and next_page_token:
+            next_page_token = f"{_FILES_TOKEN}{start_token}:{next_page_token}"
+        elif sync and start_token:
+            sync_token = f"{_CHANGES_TOKEN}{start_token}"
+        return CloudScanResult(
+            assets=assets,
+            next_page_token=next_page_token,
+            listed_count=len(assets),
+            limitation_text=source.limitation_text,
+            sync_token=sync_token,
+        )
+
+    def _list_changes(self, service, source: CloudSource, mime_prefixes: list[str], page_token: str) -> CloudScanResult:
+        params = {
+            "pageToken": page_token,
+            "pageSize": 1000,
+            "fields": f"nextPageToken, newStartPageToken, changes(fileId,removed,file({FILE_FIELDS},trashed))",
+            "includeRemoved": True,
+            "supportsAllDrives": True,
+            "includeItemsFromAllDrives": True,
+            "spaces": "drive",
+            **self._drive_params(source),
+        }
+        response = self._execute_with_retry(lambda: service.changes().list(**params).execute())
+        # changes.list bez driveId vraci i sdilene disky; drzime rozsah uvodniho files.list
+        # (corpora=user nebo jeden sdileny disk) a soubor presunuty mimo nej bereme jako odebrany
+        scope_drive_id = source.source_id if source.kind == "shared_drive" else ""
+        assets: list[CloudAsset] = []
+        removed: list[str] = []
+        for change in response.get("changes", []) or []:
+            item = change.get("file") or {}
+            out_of_scope = bool(item) and str(item.get("driveId") or "") != scope_drive_id
+            if change.get("removed") or item.get("trashed") or out_of_scope:
+                removed.append(str(change.get("fileId", "")))
                 continue
-            image_metadata = item.get("imageMediaMetadata", {}) or {}
-            assets.append(
-                CloudAsset(
-                    provider=self.provider_type,
-                    account_id=source.account_id,
-                    asset_id=str(item.get("id", "")),
-                    stable_id=str(item.get("id", "")),
-                    revision_id=str(item.get("headRevisionId", "")) or str(item.get("modifiedTime", "")),
-                    name=str(item.get("name", "")),
-                    mime_type=mime_type,
-                    size=int(item.get("size", 0) or 0),
-                    width=image_metadata.get("width"),
-                    height=image_metadata.get("height"),
-                    created_time=str(item.get("createdTime", "")),
-                    modified_time=str(item.get("modifiedTime", "")),
-                    source_uri=str(item.get("webViewLink") or f"gdrive://file/{item.get('id', '')}"),
-                    download_state=CloudDownloadState.NOT_DOWNLOADED.value,
-                    is_read_only=True,
-                    original_provider_metadata=dict(item),
-                )
-            )
+            asset = self._asset_from_item(source, item, mime_prefixes)
+            if asset is not None:
+                assets.append(asset)
+        next_page_token = response.get("nextPageToken")
+        new_start = response.get("newStartPageToken")
         return CloudScanResult(
             assets=assets,
-            next_page_token=response.get("nextPageToken"),
+            next_page_token=f"{_CHANGES_TOKEN}{next_page_token}" if next_page_token else None,
             listed_count=len(assets),
             limitation_text=source.limitation_text,
+            sync_token=f"{_CHANGES_TOKEN}{new_start}" if new_start else None,
+            removed_asset_ids=removed,
         )
 
     def download_asset(self, asset: CloudAsset, cache_manager: CloudCacheManager):
-        service = self.service_factory(asset.account_id)
+        service = self._service(asset.account_id)
 
         def writer(target_path: str) -> int:
             request = service.files().get_media(fileId=asset.asset_id)
@@ -254,12 +386,30 @@ class GoogleDriveProvider(CloudProviderBase):
 
         return cache_manager.ensure_download(asset, writer)
 
+    def download_thumbnail(self, asset: CloudAsset, cache_manager: CloudCacheManager, size: int = THUMBNAIL_SIZE):
+        link = str(asset.original_provider_metadata.get("thumbnailLink") or "")
+        if not link:
+            return None
+        # thumbnailLink konci pozadovanou velikosti (=s220), Drive vrati i jine rozmery
+        url = re.sub(r"=s\d+$", f"=s{size}", link)
+
+        def writer(target_path: str) -> int:
+            credentials = self._load_credentials(asset.account_id)
+            return self._download_url(
+                url, {"Authorization": f"Bearer {credentials.token}"}, target_path, account_id=asset.account_id
+            )
+
+        return cache_manager.ensure_thumbnail(asset, size, writer)
+
     def refresh_asset(self, asset: CloudAsset) -> CloudAsset:
-        service = self.service_factory(asset.account_id)
+        service = self._service(asset.account_id)
         item = self._execute_with_retry(
             lambda: service.files().get(
                 fileId=asset.asset_id,
-                fields="id,name,mimeType,size,imageMediaMetadata,createdTime,modifiedTime,webViewLink,headRevisionId",
+                fields=(
+                    "id,name,mimeType,size,md5Checksum,sha1Checksum,sha256Checksum,imageMediaMetadata,"
+                    "createdTime,modifiedTime,webViewLink,headRevisionId"
+                ),
                 supportsAllDrives=True,
             ).execute()
         )
@@ -274,6 +424,7 @@ class GoogleDriveProvider(CloudProviderBase):
         asset.revision_id = str(item.get("headRevisionId", asset.revision_id))
         asset.source_uri = str(item.get("webViewLink", asset.source_uri))
         asset.original_provider_metadata = dict(item)
+        asset.checksums = drive_checksums(item)
         return asset
 
     def revoke_tokens(self, account_id: str) -> None:
@@ -281,7 +432,7 @@ class GoogleDriveProvider(CloudProviderBase):
 
     def health_check(self, account_id: str) -> str:
         try:
-            service = self.service_factory(account_id)
+            service = self._service(account_id)
             self._execute_with_retry(lambda: service.about().get(fields="user").execute())
             return "ok"
         except Exception:
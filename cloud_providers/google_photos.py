@@ -8,8 +8,9 @@ import webbrowser
 from typing import Iterable, Optional
 
 from .base import CloudProviderBase
-from .cache import CloudCacheManager
+from .cache import THUMBNAIL_SIZE, CloudCacheManager
 from .errors import CloudAuthError, CloudConfigurationError, CloudUnavailableError, CloudUserActionRequired
+from .http_pool import HttpSessionPool
 from .models import (
     CloudAccount,
     CloudAsset,
@@ -31,11 +32,6 @@ except Exception:  # pragma: no cover
     InstalledAppFlow = None
     Request = None
 
-try:  # pragma: no cover
-    import requests
-except Exception:  # pragma: no cover
-    requests = None
-
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".heic", ".heif", ".webp", ".gif", ".tif", ".tiff"}
 
@@ -53,9 +49,10 @@ class GooglePhotosProvider(CloudProviderBase):
     provider_type = CloudProviderType.GOOGLE_PHOTOS.value
     picker_scope = "https://www.googleapis.com/auth/photospicker.mediaitems.readonly"
 
-    def __init__(self, token_store: TokenStore | None = None, http_session=None):
+    def __init__(self, token_store: TokenStore | None = None, http_session=None, session_pool=None):
         self.token_store = token_store or TokenStore()
-        self.http_session = http_session or requests
+        self.http_session = http_session
+        self.session_pool = session_pool or HttpSessionPool()
 
     def display_name(self) -> str:
         return "Google Photos - picker nebo export"
@@ -248,9 +245,10 @@ class GooglePhotosProvider(CloudProviderBase):
         return {"Authorization": f"Bearer {credentials.token}"}
 
     def _request_json(self, method: str, url: str, account_id: str, json_body=None, params=None) -> dict:
-        if self.http_session is None:
+        session = self._http(account_id)
+        if session is None:
             raise CloudConfigurationError("Chybi balicek requests.")
-        response = self.http_session.request(
+        response = session.request(
             method,
             url,
             headers=self._auth_headers(account_id),
@@ -369,14 +367,15 @@ class GooglePhotosProvider(CloudProviderBase):
                 raise CloudUnavailableError("Exportovana polozka Google Photos neni dostupna.")
             return cache_manager.register_local_asset(asset, asset.source_uri)
 
-        if self.http_session is None:
+        session = self._http(asset.account_id)
+        if session is None:
             raise CloudConfigurationError("Chybi balicek requests.")
 
         def writer(target_path: str) -> int:
             base_url = str(asset.source_uri)
             if not base_url:
                 raise CloudUnavailableError("Google Photos Picker nevratil baseUrl pro stazeni.")
-            response = self.http_session.get(
+            response = session.get(
                 f"{base_url}=d",
                 headers=self._auth_headers(asset.account_id),
                 timeout=60,
@@ -391,6 +390,20 @@ class GooglePhotosProvider(CloudProviderBase):
 
         return cache_manager.ensure_download(asset, writer)
 
+    def download_thumbnail(self, asset: CloudAsset, cache_manager: CloudCacheManager, size: int = THUMBNAIL_SIZE):
+        if asset.original_provider_metadata.get("mode") == "import_export" or not asset.source_uri:
+            return None
+
+        def writer(target_path: str) -> int:
+            return self._download_url(
+                f"{asset.source_uri}=w{size}-h{size}",
+                self._auth_headers(asset.account_id),
+                target_path,
+                account_id=asset.account_id,
+            )
+
+        return cache_manager.ensure_thumbnail(asset, size, writer)
+
     def refresh_asset(self, asset: CloudAsset) -> CloudAsset:
         if asset.original_provider_metadata.get("mode") == "import_export":
             if asset.source_uri and os.path.exists(asset.source_uri):
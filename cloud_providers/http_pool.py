@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Tuple
+
+from .downloads import DEFAULT_DOWNLOAD_LIMIT, DEFAULT_PROVIDER_LIMITS
+
+try:  # pragma: no cover
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover
+    requests = None
+    HTTPAdapter = None
+
+# rezerva nad limitem stahovani pro vypisy a metadata volane z GUI vlakna
+POOL_HEADROOM = 2
+
+
+@dataclass
+class TransportStats:
+    requests: int = 0
+    new_connections: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(0, self.requests - self.new_connections)
+
+
+class HttpSessionPool:
+    """Sdílené `requests.Session` s keep-alive, jedna na providera a účet.
+
+    Velikost poolu spojení odpovídá limitu souběžného stahování providera,
+    takže vlákna `DownloadScheduler` nečekají na spojení ani je nezahazují.
+    """
+
+    def __init__(self, limits: Optional[Mapping[str, int]] = None, default_limit: int = DEFAULT_DOWNLOAD_LIMIT):
+        self.limits = dict(DEFAULT_PROVIDER_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self._sessions: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return requests is not None
+
+    def pool_size(self, provider: str) -> int:
+        return max(1, int(self.limits.get(provider, self.default_limit))) + POOL_HEADROOM
+
+    def session_for(self, provider: str, account_id: str = ""):
+        """Vrátí session pro providera a účet; bez balíku requests vrací None."""
+        if requests is None:
+            return None
+        key = (provider, account_id)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                size = self.pool_size(provider)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+            return session
+
+    def stats(self) -> Dict[str, TransportStats]:
+        """Počty požadavků a nově otevřených spojení podle `provider:účet`; zbytek šel přes keep-alive."""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        result: Dict[str, TransportStats] = {}
+        for (provider, account_id), session in sessions:
+            stats = TransportStats()
+            for adapter in {id(adapter): adapter for adapter in session.adapters.values()}.values():
+                manager = getattr(adapter, "poolmanager", None)
+                if manager is None:
+                    continue
+                for key in list(manager.pools.keys()):
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    stats.requests += pool.num_requests
+                    stats.new_connections += pool.num_connections
+            result[f"{provider}:{account_id}"] = stats
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -2,15 +2,17 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
 from .apple_photos import ApplePhotosProvider
 from .cache import CloudCacheManager, app_data_dir
+from .downloads import DownloadOutcome, DownloadScheduler
+from .http_pool import HttpSessionPool, TransportStats
 from .google_drive import GoogleDriveProvider
 from .google_photos import GooglePhotosProvider
 from .icloud_local import ICloudLocalProvider
 from .local_sync import LocalSyncProvider
-from .models import CloudAccount, CloudAsset, CloudDownloadState, CloudProviderType, CloudSource
+from .models import CloudAccount, CloudAsset, CloudDownloadState, CloudProviderType, CloudScanResult, CloudSource
 from .onedrive import OneDriveProvider
 from .token_store import TokenStore
 
@@ -21,15 +23,19 @@ class CloudServiceManager:
         token_store: TokenStore | None = None,
         cache_manager: CloudCacheManager | None = None,
         providers: Optional[Dict[str, object]] = None,
+        download_scheduler: DownloadScheduler | None = None,
     ):
         self.token_store = token_store or TokenStore()
         self.cache_manager = cache_manager or CloudCacheManager()
+        self.download_scheduler = download_scheduler or DownloadScheduler()
+        # pool spojeni dimenzovany podle limitu soubezneho stahovani
+        self.http_pool = HttpSessionPool(self.download_scheduler.limits, self.download_scheduler.default_limit)
         self._accounts_path = os.path.join(app_data_dir(), "cloud_accounts.json")
         self.providers = providers or {
             CloudProviderType.LOCAL_SYNC.value: LocalSyncProvider(),
-            CloudProviderType.GOOGLE_DRIVE.value: GoogleDriveProvider(self.token_store),
-            CloudProviderType.GOOGLE_PHOTOS.value: GooglePhotosProvider(self.token_store),
-            CloudProviderType.ONEDRIVE.value: OneDriveProvider(self.token_store),
+            CloudProviderType.GOOGLE_DRIVE.value: GoogleDriveProvider(self.token_store, session_pool=self.http_pool),
+            CloudProviderType.GOOGLE_PHOTOS.value: GooglePhotosProvider(self.token_store, session_pool=self.http_pool),
+            CloudProviderType.ONEDRIVE.value: OneDriveProvider(self.token_store, session_pool=self.http_pool),
             CloudProviderType.ICLOUD_LOCAL.value: ICloudLocalProvider(),
             CloudProviderType.APPLE_PHOTOS.value: ApplePhotosProvider(),
         }
@@ -85,24 +91,37 @@ class CloudServiceManager:
         del self.accounts[account_id]
         self._save_accounts()
 
-    def scan_source(
+    def iter_source_pages(
         self,
         source: CloudSource,
         mime_filter: Optional[Iterable[str]] = None,
-        max_pages: int = 100,
-    ) -> list[CloudAsset]:
+        page_token: Optional[str] = None,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[CloudScanResult]:
+        """Vrací stránky výpisu zdroje postupně, jak přicházejí od providera.
+
+        `page_token` naváže na přerušený sken; `next_page_token` každé stránky
+        si volající uloží, aby mohl příště pokračovat od první nezpracované.
+        Bez `max_pages` se čte až do poslední stránky.
+        """
         provider = self.providers[source.provider]
-        assets: list[CloudAsset] = []
-        page_token = None
+        mime_filter = list(mime_filter) if mime_filter is not None else None
         page_count = 0
-        while page_count < max_pages:
+        while max_pages is None or page_count < max_pages:
             result = provider.list_assets(source, mime_filter=mime_filter, page_token=page_token)
-            assets.extend(result.assets)
-            page_token = result.next_page_token
             page_count += 1
+            yield result
+            page_token = result.next_page_token
             if not page_token:
                 break
-        return assets
+
+    def scan_source(
+        self,
+        source: CloudSource,
+        mime_filter: Optional[Iterable[str]] = None,
+        max_pages: Optional[int] = None,
+    ) -> list[CloudAsset]:
+        return [asset for page in self.iter_source_pages(source, mime_filter, max_pages=max_pages) for asset in page.assets]
 
     def ensure_local_asset(self, asset: CloudAsset) -> CloudAsset:
         provider = self.providers[asset.provider]
@@ -116,6 +135,27 @@ class CloudServiceManager:
             provider.download_asset(asset, self.cache_manager)
         return asset
 
+    def ensure_thumbnail(self, asset: CloudAsset) -> str:
+        """Stáhne jen náhled assetu do cache; prázdný řetězec, když provider náhled nenabízí."""
+        provider = self.providers[asset.provider]
+        return provider.download_thumbnail(asset, self.cache_manager) or ""
+
+    def iter_downloads(
+        self,
+        assets: Iterable[CloudAsset],
+        task: Optional[Callable[[CloudAsset], object]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[DownloadOutcome]:
+        """Stáhne assety souběžně podle limitů providerů; výsledky vrací v pořadí dokončení.
+
+        Výchozí úloha je `ensure_local_asset`; pro náhledy nebo vlastní
+        rozhodnutí o úrovni stažení se předá jiná `task`.
+        """
+        return self.download_scheduler.run(assets, task or self.ensure_local_asset, should_cancel=should_cancel)
+
+    def transport_stats(self) -> Dict[str, TransportStats]:
+        return self.http_pool.stats()
+
     def health_check(self, account_id: str) -> str:
         account = self.accounts.get(account_id)
         if not account:
@@ -121,6 +121,8 @@ class CloudAsset:
     is_read_only: bool
     local_cache_path: str = ""
     original_provider_metadata: Dict[str, Any] = field(default_factory=dict)
+    checksums: Dict[str, str] = field(default_factory=dict)  # "md5"/"sha1"/"sha256"/"quickxor" -> hodnota od providera
+    thumbnail_path: str = ""
 
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -145,6 +147,8 @@ class CloudAsset:
             is_read_only=bool(data.get("is_read_only", True)),
             local_cache_path=str(data.get("local_cache_path", "")),
             original_provider_metadata=dict(data.get("original_provider_metadata", {}) or {}),
+            checksums={str(key): str(value) for key, value in (data.get("checksums", {}) or {}).items()},
+            thumbnail_path=str(data.get("thumbnail_path", "")),
         )
 
 
@@ -166,6 +170,12 @@ class CloudScanResult:
     next_page_token: Optional[str] = None
     listed_count: int = 0
     limitation_text: str = ""
+    # posledni stranka inkrementalniho vypisu: token, od ktereho pristi sken vraci jen zmeny
+    sync_token: Optional[str] = None
+    removed_asset_ids: List[str] = field(default_factory=list)
+    # stranka zacina novou uplnou synchronizaci (stary token expiroval): polozky, ktere
+    # vypis do sync_token nevrati, u providera uz nejsou, i kdyz o nich neprislo "deleted"
+    full_resync: bool = False
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -173,4 +183,7 @@ class CloudScanResult:
             "next_page_token": self.next_page_token,
             "listed_count": self.listed_count,
             "limitation_text": self.limitation_text,
+            "sync_token": self.sync_token,
+            "removed_asset_ids": list(self.removed_asset_ids),
+            "full_resync": self.full_resync,
         }
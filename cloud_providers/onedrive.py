@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import json
 import os
+import threading
 import time
 from typing import Iterable, Optional
 
 from .base import CloudProviderBase
-from .cache import CloudCacheManager
+from .cache import THUMBNAIL_SIZE, CloudCacheManager
+from .checksums import onedrive_checksums
 from .errors import CloudAuthError, CloudConfigurationError, CloudRateLimitError
+from .http_pool import HttpSessionPool
 from .models import (
     CloudAccount,
     CloudAsset,
@@ -25,19 +28,24 @@ try:  # pragma: no cover - volitelné při importu
 except Exception:  # pragma: no cover
     msal = None
 
-try:  # pragma: no cover
-    import requests
-except Exception:  # pragma: no cover
-    requests = None
+DELTA_SCAN_MODE = "delta"
+# delta vraci i slozky a smazane polozky; projekce drzi stranky male i u velkych disku
+DELTA_SELECT = "id,name,size,createdDateTime,lastModifiedDateTime,webUrl,eTag,cTag,file,photo,image,folder,root,deleted"
+DELTA_PAGE_SIZE = 500
 
 
 class OneDriveProvider(CloudProviderBase):
     provider_type = CloudProviderType.ONEDRIVE.value
     readonly_scopes = ["Files.Read", "User.Read", "offline_access"]
 
-    def __init__(self, token_store: TokenStore, http_session=None):
+    def __init__(self, token_store: TokenStore, http_session=None, session_pool=None):
         self.token_store = token_store
-        self.http_session = http_session or requests
+        self.http_session = http_session
+        self.session_pool = session_pool or HttpSessionPool()
+        # MSAL aplikace s deserializovanou cache na ucet; access token pak vydava z pameti
+        self._apps: dict = {}
+        self._app_locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
 
     def display_name(self) -> str:
         return "OneDrive API"
@@ -53,7 +61,7 @@ class OneDriveProvider(CloudProviderBase):
         ]
 
     def is_available(self) -> bool:
-        return msal is not None and self.http_session is not None
+        return msal is not None and self._http_available()
 
     def _client_id(self) -> str:
         client_id = os.environ.get("KPS_MICROSOFT_CLIENT_ID", "").strip()
@@ -85,6 +93,11 @@ class OneDriveProvider(CloudProviderBase):
     def _save_cache(self, account_id: str, cache) -> None:
         if cache.has_state_changed:
             self.token_store.set_token(self._token_key(account_id), cache.serialize())
+            cache.has_state_changed = False
+
+    def _app_lock(self, account_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._app_locks.setdefault(account_id, threading.Lock())
 
     def authenticate(self, parent_widget=None) -> CloudAccount:
         cache = msal.SerializableTokenCache()
@@ -95,6 +108,8 @@ class OneDriveProvider(CloudProviderBase):
         profile = self._graph_get("https://graph.microsoft.com/v1.0/me", result["access_token"])
         account_id = str(profile.get("userPrincipalName") or profile.get("id") or "onedrive")
         self._save_cache(account_id, cache)
+        with self._app_lock(account_id):
+            self._apps[account_id] = (app, cache)
         return CloudAccount(
             provider=self.provider_type,
             account_id=account_id,
@@ -108,38 +123,52 @@ class OneDriveProvider(CloudProviderBase):
 
     def disconnect(self, account_id: str) -> None:
         self.token_store.delete_token(self._token_key(account_id))
+        with self._app_lock(account_id):
+            self._apps.pop(account_id, None)
 
     def _acquire_token(self, account_id: str) -> str:
-        cache = self._load_cache(account_id)
-        app = self._make_app(cache=cache)
-        accounts = app.get_accounts()
-        result = None
-        if accounts:
-            result = app.acquire_token_silent(self.readonly_scopes, account=accounts[0])
-        if not result:
-            raise CloudAuthError("OneDrive ucet vyzaduje znovuprehlaseni.")
-        self._save_cache(account_id, cache)
+        """Access token z MSAL aplikace účtu; cache se deserializuje jen jednou a ukládá jen po změně."""
+        with self._app_lock(account_id):
+            cached = self._apps.get(account_id)
+            if cached is None:
+                cache = self._load_cache(account_id)
+                cached = self._apps[account_id] = (self._make_app(cache=cache), cache)
+            app, cache = cached
+            accounts = app.get_accounts()
+            result = None
+            if accounts:
+                result = app.acquire_token_silent(self.readonly_scopes, account=accounts[0])
+            if not result:
+                self._apps.pop(account_id, None)
+                raise CloudAuthError("OneDrive ucet vyzaduje znovuprehlaseni.")
+            self._save_cache(account_id, cache)
         token = result.get("access_token")
         if not token:
             raise CloudAuthError(result.get("error_description") or "OneDrive token neni dostupny.")
         return token
 
-    def _graph_get(self, url: str, access_token: str) -> dict:
-        if self.http_session is None:
+    def _graph_get(self, url: str, access_token: str, allow_gone: bool = False, account_id: str = "") -> Optional[dict]:
+        session = self._http(account_id)
+        if session is None:
             raise CloudConfigurationError("Chybi balicek requests.")
-        response = self.http_session.get(
+        response = session.get(
             url,
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=30,
         )
         if response.status_code in {429, 500, 502, 503, 504}:
             raise CloudRateLimitError("Microsoft Graph je docasne omezeny nebo nedostupny.")
+        if allow_gone and response.status_code == 410:
+            return None
         response.raise_for_status()
         return response.json()
 
-    def _graph_stream(self, url: str, access_token: str, target_path: str) -> int:
+    def _graph_stream(self, url: str, access_token: str, target_path: str, account_id: str = "") -> int:
         headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
-        response = self.http_session.get(
+        session = self._http(account_id)
+        if session is None:
+            raise CloudConfigurationError("Chybi balicek requests.")
+        response = session.get(
             url,
             headers=headers,
             timeout=60,
@@ -156,7 +185,9 @@ class OneDriveProvider(CloudProviderBase):
 
     def list_sources(self, account_id: str) -> list[CloudSource]:
         access_token = self._acquire_token(account_id)
-        me_drive = self._graph_get("https://graph.microsoft.com/v1.0/me/drive?$select=id,driveType,webUrl", access_token)
+        me_drive = self._graph_get(
+            "https://graph.microsoft.com/v1.0/me/drive?$select=id,driveType,webUrl", access_token, account_id=account_id
+        )
         sources = [
             CloudSource(
                 provider=self.provider_type,
@@ -167,10 +198,12 @@ class OneDriveProvider(CloudProviderBase):
                 kind=str(me_drive.get("driveType", "drive")),
                 is_read_only=True,
                 limitation_text="Read-only pristup pres Microsoft Graph.",
-                metadata=dict(me_drive),
+                metadata={**me_drive, "scan_mode": DELTA_SCAN_MODE},
             )
         ]
-        drives = self._graph_get("https://graph.microsoft.com/v1.0/me/drives?$select=id,driveType,name,webUrl", access_token)
+        drives = self._graph_get(
+            "https://graph.microsoft.com/v1.0/me/drives?$select=id,driveType,name,webUrl", access_token, account_id=account_id
+        )
         for item in drives.get("value", []) or []:
             drive_id = str(item.get("id", ""))
             if drive_id == sources[0].source_id:
@@ -185,61 +218,96 @@ class OneDriveProvider(CloudProviderBase):
                     kind=str(item.get("driveType", "drive")),
                     is_read_only=True,
                     limitation_text="Read-only pristup pres Microsoft Graph.",
-                    metadata=dict(item),
+                    metadata={**item, "scan_mode": DELTA_SCAN_MODE},
                 )
             )
         return sources
 
+    def _asset_from_item(self, source: CloudSource, item: dict, mime_prefixes: list[str]) -> Optional[CloudAsset]:
+        if item.get("folder") or item.get("root"):
+            return None
+        file_info = item.get("file", {}) or {}
+        mime_type = str(file_info.get("mimeType", ""))
+        has_image_metadata = bool(item.get("image") or item.get("photo"))
+        if mime_prefixes and not any(mime_type.startswith(prefix) for prefix in mime_prefixes):
+            if not has_image_metadata:
+                return None
+        image_metadata = item.get("image") or item.get("photo") or {}
+        return CloudAsset(
+            provider=self.provider_type,
+            account_id=source.account_id,
+            asset_id=str(item.get("id", "")),
+            stable_id=str(item.get("id", "")),
+            revision_id=str(item.get("eTag") or item.get("cTag") or item.get("lastModifiedDateTime", "")),
+            name=str(item.get("name", "")),
+            mime_type=mime_type or "image/unknown",
+            size=int(item.get("size", 0) or 0),
+            width=image_metadata.get("width"),
+            height=image_metadata.get("height"),
+            created_time=str(item.get("createdDateTime", "")),
+            modified_time=str(item.get("lastModifiedDateTime", "")),
+            source_uri=str(item.get("webUrl") or f"onedrive://item/{item.get('id', '')}"),
+            download_state=CloudDownloadState.NOT_DOWNLOADED.value,
+            is_read_only=True,
+            original_provider_metadata=dict(item),
+            checksums=onedrive_checksums(item),
+        )
+
+    def _delta_url(self, source: CloudSource) -> str:
+        return (
+            f"https://graph.microsoft.com/v1.0/drives/{source.source_id}/root/delta"
+            f"?$select={DELTA_SELECT}&$top={DELTA_PAGE_SIZE}"
+        )
+
     def list_assets(
         self,
         source: CloudSource,
         mime_filter: Optional[Iterable[str]] = None,
         page_token: Optional[str] = None,
     ) -> CloudScanResult:
+        """Vypíše stránku položek disku.
+
+        Zdroje z `list_sources` používají `/delta`: první průchod projde celý
+        disk včetně podsložek, poslední stránka vrátí `sync_token` (deltaLink)
+        a sken od něj dostane jen změněné a smazané položky. Bez režimu delta
+        se čte jen kořen disku.
+        """
         access_token = self._acquire_token(source.account_id)
-        url = page_token or (
-            f"https://graph.microsoft.com/v1.0/drives/{source.source_id}/root/children"
-            "?$select=id,name,size,createdDateTime,lastModifiedDateTime,webUrl,eTag,cTag,file,photo,image,folder,@microsoft.graph.downloadUrl"
-            "&$top=200"
-        )
-        response = self._graph_get(url, access_token)
+        delta = source.metadata.get("scan_mode") == DELTA_SCAN_MODE
+        resync = False
+        if delta:
+            response = self._graph_get(
+                page_token or self._delta_url(source), access_token, allow_gone=bool(page_token), account_id=source.account_id
+            )
+            if response is None:
+                # 410 Gone: deltaLink expiroval, Graph vyzaduje novou plnou synchronizaci
+                response = self._graph_get(self._delta_url(source), access_token, account_id=source.account_id)
+                resync = True
+        else:
+            url = page_token or (
+                f"https://graph.microsoft.com/v1.0/drives/{source.source_id}/root/children"
+                "?$select=id,name,size,createdDateTime,lastModifiedDateTime,webUrl,eTag,cTag,file,photo,image,folder,@microsoft.graph.downloadUrl"
+                "&$top=200"
+            )
+            response = self._graph_get(url, access_token, account_id=source.account_id)
         assets: list[CloudAsset] = []
+        removed: list[str] = []
         mime_prefixes = list(mime_filter or ["image/"])
         for item in response.get("value", []) or []:
-            if item.get("folder"):
+            if item.get("deleted"):
+                removed.append(str(item.get("id", "")))
                 continue
-            file_info = item.get("file", {}) or {}
-            mime_type = str(file_info.get("mimeType", ""))
-            has_image_metadata = bool(item.get("image") or item.get("photo"))
-            if mime_prefixes and not any(mime_type.startswith(prefix) for prefix in mime_prefixes):
-                if not has_image_metadata:
-                    continue
-            image_metadata = item.get("image") or item.get("photo") or {}
-            assets.append(
-                CloudAsset(
-                    provider=self.provider_type,
-                    account_id=source.account_id,
-                    asset_id=str(item.get("id", "")),
-                    stable_id=str(item.get("id", "")),
-                    revision_id=str(item.get("eTag") or item.get("cTag") or item.get("lastModifiedDateTime", "")),
-                    name=str(item.get("name", "")),
-                    mime_type=mime_type or "image/unknown",
-                    size=int(item.get("size", 0) or 0),
-                    width=image_metadata.get("width"),
-                    height=image_metadata.get("height"),
-                    created_time=str(item.get("createdDateTime", "")),
-                    modified_time=str(item.get("lastModifiedDateTime", "")),
-                    source_uri=str(item.get("webUrl") or f"onedrive://item/{item.get('id', '')}"),
-                    download_state=CloudDownloadState.NOT_DOWNLOADED.value,
-                    is_read_only=True,
-                    original_provider_metadata=dict(item),
-                )
-            )
+            asset = self._asset_from_item(source, item, mime_prefixes)
+            if asset is not None:
+                assets.append(asset)
         return CloudScanResult(
             assets=assets,
             next_page_token=response.get("@odata.nextLink"),
             listed_count=len(assets),
             limitation_text=source.limitation_text,
+            sync_token=response.get("@odata.deltaLink") if delta else None,
+            removed_asset_ids=removed,
+            full_resync=resync,
         )
 
     def download_asset(self, asset: CloudAsset, cache_manager: CloudCacheManager):
@@ -250,24 +318,39 @@ class OneDriveProvider(CloudProviderBase):
                 f"https://graph.microsoft.com/v1.0/me/drive/items/{asset.asset_id}"
                 "?$select=id,name,@microsoft.graph.downloadUrl",
                 access_token,
+                account_id=asset.account_id,
             )
             download_url = item.get("@microsoft.graph.downloadUrl")
             if download_url:
-                return self._graph_stream(download_url, "", target_path)  # download URL je predem autorizovana adresa
+                # download URL je predem autorizovana adresa
+                return self._graph_stream(download_url, "", target_path, account_id=asset.account_id)
             return self._graph_stream(
                 f"https://graph.microsoft.com/v1.0/me/drive/items/{asset.asset_id}/content",
                 access_token,
                 target_path,
+                account_id=asset.account_id,
             )
 
         return cache_manager.ensure_download(asset, writer)
 
+    def download_thumbnail(self, asset: CloudAsset, cache_manager: CloudCacheManager, size: int = THUMBNAIL_SIZE):
+        def writer(target_path: str) -> int:
+            return self._graph_stream(
+                f"https://graph.microsoft.com/v1.0/me/drive/items/{asset.asset_id}/thumbnails/0/c{size}x{size}/content",
+                self._acquire_token(asset.account_id),
+                target_path,
+                account_id=asset.account_id,
+            )
+
+        return cache_manager.ensure_thumbnail(asset, size, writer)
+
     def refresh_asset(self, asset: CloudAsset) -> CloudAsset:
         access_token = self._acquire_token(asset.account_id)
         item = self._graph_get(
             f"https://graph.microsoft.com/v1.0/me/drive/items/{asset.asset_id}"
             "?$select=id,name,size,createdDateTime,lastModifiedDateTime,webUrl,eTag,cTag,file,photo,image",
             access_token,
+            account_id=asset.account_id,
         )
         image_metadata = item.get("image") or item.get("photo") or {}
         asset.name = str(item.get("name", asset.name))
@@ -279,6 +362,7 @@ class OneDriveProvider(CloudProviderBase):
         asset.revision_id = str(item.get("eTag") or item.get("cTag") or asset.revision_id)
         asset.source_uri = str(item.get("webUrl", asset.source_uri))
         asset.original_provider_metadata = dict(item)
+        asset.checksums = onedrive_checksums(item)
         return asset
 
     def revoke_tokens(self, account_id: str) -> None:
@@ -287,7 +371,7 @@ class OneDriveProvider(CloudProviderBase):
     def health_check(self, account_id: str) -> str:
         try:
             access_token = self._acquire_token(account_id)
-            self._graph_get("https://graph.microsoft.com/v1.0/me?$select=id", access_token)
+            self._graph_get("https://graph.microsoft.com/v1.0/me?$select=id", access_token, account_id=account_id)
             return "ok"
         except Exception:
             return "unavailable"
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Optional
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
 from .cache import app_data_dir
 
@@ -11,6 +13,53 @@ try:
 except Exception:  # pragma: no cover - volitelná závislost
     keyring = None
 
+_MISSING = object()
+# chybejici token se cachuje jen kratce: jiny proces ho mohl zapsat nebo keyring docasne selhal
+MISS_TTL_SECONDS = 5.0
+
+
+class _TokenCache:
+    """Procesní cache tokenů sdílená všemi instancemi `TokenStore`.
+
+    Čtení z paměti drží globální zámek jen na vyhledání ve slovníku; I/O do
+    keyringu nebo záložního souboru běží pod zámkem konkrétního klíče, takže
+    vlákna s různými účty na sebe nečekají. Nenalezený token platí jen
+    `MISS_TTL_SECONDS`, potom se úložiště přečte znovu.
+    """
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, str, str], Tuple[Optional[str], float]] = {}
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def lookup(self, key: Tuple[str, str, str]):
+        with self._guard:
+            entry = self._values.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if value is None and time.monotonic() >= expires:
+                del self._values[key]
+                return _MISSING
+            return value
+
+    def store(self, key: Tuple[str, str, str], value: Optional[str]) -> None:
+        expires = time.monotonic() + MISS_TTL_SECONDS if value is None else 0.0
+        with self._guard:
+            self._values[key] = (value, expires)
+
+    def lock_for(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def invalidate(self, key: Tuple[str, str, str]) -> None:
+        with self._guard:
+            self._values.pop(key, None)
+
+
+_TOKEN_CACHE = _TokenCache()
+_FALLBACK_LOCK = threading.Lock()
+
 
 class TokenStore:
     def __init__(self, service_name: str = "KajovoPhotoSelector"):
@@ -22,6 +71,9 @@ class TokenStore:
     def warning_message(self) -> str:
         return self._warning_message
 
+    def _cache_key(self, account_key: str) -> Tuple[str, str, str]:
+        return (self.service_name, self._fallback_path, account_key)
+
     def _read_fallback(self) -> dict:
         if not os.path.exists(self._fallback_path):
             return {}
@@ -44,7 +96,7 @@ class TokenStore:
             "Systémový keyring není dostupný. Tokeny jsou uložené v lokálním souboru s právy 0600."
         )
 
-    def get_token(self, account_key: str) -> Optional[str]:
+    def _load_token(self, account_key: str) -> Optional[str]:
         if keyring is not None:
             try:
                 value = keyring.get_password(self.service_name, account_key)
@@ -54,25 +106,54 @@ class TokenStore:
                 pass
         return self._read_fallback().get(account_key)
 
-    def set_token(self, account_key: str, token_value: str) -> None:
+    def _save_token(self, account_key: str, token_value: str) -> None:
         if keyring is not None:
             try:
                 keyring.set_password(self.service_name, account_key, token_value)
                 return
             except Exception:
                 pass
-        data = self._read_fallback()
-        data[account_key] = token_value
-        self._write_fallback(data)
+        with _FALLBACK_LOCK:
+            data = self._read_fallback()
+            data[account_key] = token_value
+            self._write_fallback(data)
 
-    def delete_token(self, account_key: str) -> None:
+    def _delete_stored(self, account_key: str) -> None:
         if keyring is not None:
             try:
                 keyring.delete_password(self.service_name, account_key)
                 return
             except Exception:
                 pass
-        data = self._read_fallback()
-        if account_key in data:
-            del data[account_key]
-            self._write_fallback(data)
+        with _FALLBACK_LOCK:
+            data = self._read_fallback()
+            if account_key in data:
+                del data[account_key]
+                self._write_fallback(data)
+
+    def get_token(self, account_key: str) -> Optional[str]:
+        """Token z procesní cache; keyring nebo záložní soubor se čte při prvním dotazu na klíč a po vypršení chybějícího tokenu."""
+        key = self._cache_key(account_key)
+        value = _TOKEN_CACHE.lookup(key)
+        if value is not _MISSING:
+            return value
+        with _TOKEN_CACHE.lock_for(key):
+            value = _TOKEN_CACHE.lookup(key)
+            if value is _MISSING:
+                value = self._load_token(account_key)
+                _TOKEN_CACHE.store(key, value)
+            return value
+
+    def set_token(self, account_key: str, token_value: str) -> None:
+        key = self._cache_key(account_key)
+        with _TOKEN_CACHE.lock_for(key):
+            self._save_token(account_key, token_value)
+            _TOKEN_CACHE.store(key, token_value)
+
+    def delete_token(self, account_key: str) -> None:
+        key = self._cache_key(account_key)
+        with _TOKEN_CACHE.lock_for(key):
+            try:
+                self._delete_stored(account_key)
+            finally:
+                _TOKEN_CACHE.invalidate(key)
@@ -0,0 +1,236 @@
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from cloud_providers.cache import app_data_dir
+
+logger = logging.getLogger(__name__)
+
+HASH_CACHE_FILE = "hash_cache.sqlite3"
+# zaznamy, na ktere se duplicitni pruchod dlouho nezeptal, patri smazanym nebo odpojenym souborum
+MAX_AGE_SECONDS = 180 * 24 * 3600
+MAX_ENTRIES = 2_000_000
+SEEN_UPDATE_BATCH = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    seen INTEGER NOT NULL,
+    signature TEXT,
+    digest TEXT,
+    width INTEGER,
+    height INTEGER,
+    hashes BLOB
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_seen ON entries (seen);
+"""
+
+
+@dataclass
+class HashEntry:
+    signature: Optional[str] = None
+    digest: Optional[str] = None  # otisk celeho obsahu, jen u souboru se shodnym vzorkem
+    hashes: Dict[str, int] = field(default_factory=dict)  # "phash/8" -> hodnota
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def local_key(path: str) -> str:
+    return "file:" + os.path.normcase(os.path.abspath(path))
+
+
+def cloud_key(provider: str, account_id: str, asset_id: str, revision_id: str, preview: bool = False) -> str:
+    # revize identifikuje obsah, velikost a mtime lokalni kopie se u cloudu neporovnavaji;
+    # hashe z nahledu maji vlastni klic, aby je po stazeni originalu nahradil jeho vlastni vypocet
+    key = f"cloud:{provider}/{account_id}/{asset_id}/{revision_id}"
+    return f"{key}/preview" if preview else key
+
+
+def hash_slot(kind: str, hash_size: int) -> str:
+    return f"{kind}/{hash_size}"
+
+
+def pack_hashes(hashes: Dict[str, int]) -> bytes:
+    """Kompaktní binární zápis: [délka názvu][název][délka hodnoty][hodnota big-endian] za sebou."""
+    parts: List[bytes] = []
+    for slot, value in sorted(hashes.items()):
+        name = slot.encode("ascii")
+        raw = value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big")
+        parts.append(struct.pack("BB", len(name), len(raw)) + name + raw)
+    return b"".join(parts)
+
+
+def unpack_hashes(blob: Optional[bytes]) -> Dict[str, int]:
+    hashes: Dict[str, int] = {}
+    if not blob:
+        return hashes
+    pos = 0
+    while pos + 2 <= len(blob):
+        name_len, raw_len = blob[pos], blob[pos + 1]
+        pos += 2
+        name = blob[pos:pos + name_len].decode("ascii", errors="replace")
+        pos += name_len
+        hashes[name] = int.from_bytes(blob[pos:pos + raw_len], "big")
+        pos += raw_len
+    return hashes
+
+
+class HashCache:
+    """Perzistentní cache forenzních podpisů, percepčních hashů a rozměrů souborů."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(app_data_dir(), HASH_CACHE_FILE)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._seen: List[str] = []
+        self.available = True
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or not self.available:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "digest" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN digest TEXT")
+            self._conn = conn
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Cache hashu neni dostupna (%s): %s", self.path, e)
+            self.available = False
+        return self._conn
+
+    def _disable(self, error: Exception) -> None:
+        logger.warning("Cache hashu vypnuta po chybe: %s", error)
+        self.available = False
+
+    def _row(self, conn: sqlite3.Connection, key: str) -> Optional[Tuple]:
+        return conn.execute(
+            "SELECT size, mtime_ns, signature, width, height, hashes, digest FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+    def lookup(self, key: str, size: int, mtime_ns: int) -> Optional[HashEntry]:
+        """Uložený záznam, jen pokud soubor od výpočtu nezměnil velikost ani mtime."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = self._row(conn, key)
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._seen.append(key)
+            if len(self._seen) >= SEEN_UPDATE_BATCH:
+                self._flush_seen(conn)
+        return HashEntry(signature=row[2], digest=row[6], width=row[3], height=row[4], hashes=unpack_hashes(row[5]))
+
+    def store(
+        self,
+        key: str,
+        size: int,
+        mtime_ns: int,
+        signature: Optional[str] = None,
+        digest: Optional[str] = None,
+        hashes: Optional[Dict[str, int]] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+    ) -> None:
+        """Uloží nové hodnoty; k platnému záznamu téhož obsahu je doplní, zastaralý nahradí."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                row = self._row(conn, key)
+                if row is not None and row[0] == size and row[1] == mtime_ns:
+                    merged = unpack_hashes(row[5])
+                    merged.update(hashes or {})
+                    signature = signature if signature is not None else row[2]
+                    digest = digest if digest is not None else row[6]
+                    if width is None:
+                        width, height = row[3], row[4]
+                else:
+                    merged = dict(hashes or {})
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, mtime_ns, seen, signature, digest, width, height, hashes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, size, mtime_ns, int(time.time()), signature, digest, width, height, pack_hashes(merged)),
+                )
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def _flush_seen(self, conn: sqlite3.Connection) -> None:
+        if not self._seen:
+            return
+        now = int(time.time())
+        conn.executemany("UPDATE entries SET seen = ? WHERE key = ?", [(now, key) for key in self._seen])
+        self._seen = []
+
+    def evict(self, max_age_seconds: int = MAX_AGE_SECONDS, max_entries: int = MAX_ENTRIES) -> int:
+        """Smaže dlouho nepoužité záznamy a při překročení limitu i ty nejstarší."""
+        removed = 0
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            try:
+                self._flush_seen(conn)
+                cur = conn.execute("DELETE FROM entries WHERE seen < ?", (int(time.time()) - max_age_seconds,))
+                removed += max(0, cur.rowcount)
+                (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+                if count > max_entries:
+                    cur = conn.execute(
+                        "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY seen LIMIT ?)",
+                        (count - max_entries,),
+                    )
+                    removed += max(0, cur.rowcount)
+                conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+        if removed:
+            logger.info("Cache hashu: odstraneno %d zastaralych zaznamu.", removed)
+        return removed
+
+    def take_stats(self) -> Tuple[int, int]:
+        """Počet zásahů a minutí od posledního volání."""
+        with self._lock:
+            stats = (self.hits, self.misses)
+            self.hits = 0
+            self.misses = 0
+        return stats
+
+    def commit(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._flush_seen(self._conn)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            self.commit()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,393 @@
+import itertools
+import logging
+import math
+import statistics
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+HAS_NUMPY = np is not None
+DEFAULT_HASH_SIZE = 8
+# DCT a wavelet hash pracuji nad ctyrnasobnym nahledem, z nej berou nizke frekvence
+HIGH_FREQ_FACTOR = 4
+# jednobarevny snimek ma u vsech hashu stejne bity a "shodoval" by se s kazdym jinym jednobarevnym
+FLAT_IMAGE_MAX_RANGE = 3
+# misto hashu nese jednobarevny snimek jen tuto znacku: da se ulozit do cache, ale nic s ni neporovnava
+FLAT_HASH_KIND = "flat"
+
+
+def grayscale_thumbnail(image: QImage, width: int, height: Optional[int] = None) -> Optional[QImage]:
+    """Zmenší obrázek na width x height (výchozí čtverec) v odstínech šedi (Format_Grayscale8)."""
+    height = width if height is None else height
+    if image.isNull() or width <= 0 or height <= 0:
+        return None
+    if image.width() != width or image.height() != height:
+        image = image.scaled(
+            width,
+            height,
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+    if image.format() != QImage.Format.Format_Grayscale8:
+        image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    return image
+
+
+def _gray_rows_bytes(gray: QImage) -> bytes:
+    width, height = gray.width(), gray.height()
+    stride = gray.bytesPerLine()
+    ptr = gray.constBits()
+    ptr.setsize(gray.sizeInBytes())
+    raw = ptr.asstring()
+    if stride == width:
+        return raw[:width * height]
+    # radky Grayscale8 jsou zarovnane na 4 bajty; zarovnani do hashe nepatri
+    return b"".join(raw[row * stride:row * stride + width] for row in range(height))
+
+
+def gray_pixels(gray: QImage):
+    """Pixely jako NumPy matice (height, width) nebo bez NumPy jako bytes po řádcích."""
+    if np is None:
+        return _gray_rows_bytes(gray)
+    ptr = gray.constBits()
+    ptr.setsize(gray.sizeInBytes())
+    # pohled bez kopie do bufferu QImage; obrazek musi zit, dokud se s polem pracuje
+    view = np.frombuffer(ptr, dtype=np.uint8).reshape(gray.height(), gray.bytesPerLine())
+    return view[:, :gray.width()]
+
+
+def _bits_to_int(bits) -> int:
+    """Bity (po řádcích, první = nejvyšší) na celé číslo, stejně jako int('0101...', 2)."""
+    flat = np.asarray(bits, dtype=bool).ravel()
+    packed = np.packbits(flat)
+    value = int.from_bytes(packed.tobytes(), "big")
+    return value >> ((-flat.size) % 8)
+
+
+def _average_hash_bytes(pixels: bytes) -> int:
+    total = sum(pixels)
+    # p > total/n  <=>  p > total//n pro cele p; prah jde do tabulky pro bytes.translate
+    threshold = total // len(pixels)
+    table = b"0" * (threshold + 1) + b"1" * (255 - threshold)
+    return int(pixels.translate(table), 2)
+
+
+def average_hash(image: QImage, hash_size: int = DEFAULT_HASH_SIZE) -> Optional[int]:
+    gray = grayscale_thumbnail(image, hash_size)
+    if gray is None:
+        return None
+    if np is None:
+        return _average_hash_bytes(_gray_rows_bytes(gray))
+    pixels = gray_pixels(gray)
+    return _bits_to_int(pixels > pixels.mean())
+
+
+def average_hashes(images: Sequence[QImage], hash_size: int = DEFAULT_HASH_SIZE) -> List[Optional[int]]:
+    """Average hash pro více už dekódovaných snímků najednou."""
+    grays = [grayscale_thumbnail(image, hash_size) for image in images]
+    if np is None:
+        return [None if gray is None else _average_hash_bytes(_gray_rows_bytes(gray)) for gray in grays]
+    valid = [index for index, gray in enumerate(grays) if gray is not None]
+    results: List[Optional[int]] = [None] * len(grays)
+    if not valid:
+        return results
+    stack = np.stack([gray_pixels(grays[index]).reshape(-1) for index in valid])
+    bits = stack > stack.mean(axis=1, keepdims=True)
+    for row, index in enumerate(valid):
+        results[index] = _bits_to_int(bits[row])
+    return results
+
+
+def _bits_from_flags(flags: Iterable[bool]) -> int:
+    value = 0
+    for flag in flags:
+        value = (value << 1) | bool(flag)
+    return value
+
+
+def _pixel_rows(gray: QImage) -> List[bytes]:
+    raw = _gray_rows_bytes(gray)
+    width = gray.width()
+    return [raw[row * width:(row + 1) * width] for row in range(gray.height())]
+
+
+def difference_hash(image: QImage, hash_size: int = DEFAULT_HASH_SIZE) -> Optional[int]:
+    """dHash: každý bit říká, zda je pixel jasnější než jeho levý soused."""
+    gray = grayscale_thumbnail(image, hash_size + 1, hash_size)
+    if gray is None:
+        return None
+    if np is None:
+        return _bits_from_flags(right > left for row in _pixel_rows(gray) for left, right in zip(row, row[1:]))
+    pixels = gray_pixels(gray)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+@lru_cache(maxsize=8)
+def _dct_rows(size: int, count: int) -> Tuple[Tuple[float, ...], ...]:
+    """Prvních `count` řádků matice DCT-II pro vstup délky `size`."""
+    return tuple(
+        tuple(math.cos(math.pi * k * (2 * n + 1) / (2 * size)) for n in range(size))
+        for k in range(count)
+    )
+
+
+def dct_hash(image: QImage, hash_size: int = DEFAULT_HASH_SIZE) -> Optional[int]:
+    """pHash: nízké frekvence 2D DCT porovnané s jejich mediánem."""
+    size = hash_size * HIGH_FREQ_FACTOR
+    gray = grayscale_thumbnail(image, size)
+    if gray is None:
+        return None
+    rows = _dct_rows(size, hash_size)
+    if np is None:
+        pixels = _pixel_rows(gray)
+        # nejdriv DCT radku (jen nizke frekvence), potom sloupcu
+        partial = [[sum(c * p for c, p in zip(basis, row)) for basis in rows] for row in pixels]
+        low = [
+            sum(basis[y] * partial[y][u] for y in range(size))
+            for basis in rows
+            for u in range(hash_size)
+        ]
+        median = statistics.median(low)
+        return _bits_from_flags(value > median for value in low)
+    basis = np.asarray(rows, dtype=np.float64)
+    low = basis @ gray_pixels(gray).astype(np.float64) @ basis.T
+    return _bits_to_int(low > np.median(low))
+
+
+def wavelet_hash(image: QImage, hash_size: int = DEFAULT_HASH_SIZE) -> Optional[int]:
+    """wHash: Haarovo LL pásmo po dvou úrovních rozkladu porovnané s mediánem."""
+    size = hash_size * HIGH_FREQ_FACTOR
+    gray = grayscale_thumbnail(image, size)
+    if gray is None:
+        return None
+    block = HIGH_FREQ_FACTOR
+    if np is None:
+        pixels = _pixel_rows(gray)
+        low = [
+            sum(sum(row[x * block:(x + 1) * block]) for row in pixels[y * block:(y + 1) * block])
+            for y in range(hash_size)
+            for x in range(hash_size)
+        ]
+        median = statistics.median(low)
+        return _bits_from_flags(value > median for value in low)
+    # LL koeficient Haarovy transformace je (az na meritko) prumer bloku 2x2; dve urovne = bloky 4x4
+    pixels = gray_pixels(gray).astype(np.float64)
+    low = pixels.reshape(hash_size, block, hash_size, block).sum(axis=(1, 3))
+    return _bits_to_int(low > np.median(low))
+
+
+class HashKind(NamedTuple):
+    label: str
+    func: Callable[[QImage, int], Optional[int]]
+    scale: int  # strana potrebneho nahledu v nasobcich hash_size
+    max_distance: int  # prah Hammingovy vzdalenosti pro 64bitovy hash
+
+
+HASH_KINDS: Dict[str, HashKind] = {
+    "ahash": HashKind("Průměrový hash (aHash)", average_hash, 1, 6),
+    "dhash": HashKind("Rozdílový hash (dHash)", difference_hash, 2, 10),
+    "phash": HashKind("DCT hash (pHash)", dct_hash, HIGH_FREQ_FACTOR, 12),
+    "whash": HashKind("Waveletový hash (wHash)", wavelet_hash, HIGH_FREQ_FACTOR, 8),
+}
+DEFAULT_HASH_KINDS = ("phash", "dhash")
+
+
+def decode_size(kinds: Iterable[str], hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """Strana náhledu, ze kterého jde spočítat všechny zvolené hashe jedním dekódováním."""
+    return max((HASH_KINDS[kind].scale for kind in kinds), default=1) * hash_size
+
+
+def max_distance(kind: str, hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    # prah roste s poctem bitu hashe
+    return round(HASH_KINDS[kind].max_distance * hash_size * hash_size / 64)
+
+
+def is_flat_image(image: QImage) -> bool:
+    gray = grayscale_thumbnail(image, 2 * DEFAULT_HASH_SIZE)
+    if gray is None:
+        return False
+    if np is None:
+        pixels = _gray_rows_bytes(gray)
+        return max(pixels) - min(pixels) <= FLAT_IMAGE_MAX_RANGE
+    pixels = gray_pixels(gray)
+    return int(pixels.max()) - int(pixels.min()) <= FLAT_IMAGE_MAX_RANGE
+
+
+def compute_hashes(image: QImage, kinds: Iterable[str], hash_size: int = DEFAULT_HASH_SIZE) -> Dict[str, int]:
+    """Všechny zvolené hashe z jednoho už dekódovaného snímku.
+
+    Nespočitatelné hashe ve výsledku chybí; jednobarevný snímek vrací jen
+    značku `FLAT_HASH_KIND`, protože jeho hashe nic nerozlišují.
+    """
+    if image.isNull():
+        return {}
+    if is_flat_image(image):
+        return {FLAT_HASH_KIND: 0}
+    hashes: Dict[str, int] = {}
+    for kind in kinds:
+        value = HASH_KINDS[kind].func(image, hash_size)
+        if value is not None:
+            hashes[kind] = value
+    return hashes
+
+
+def hashes_match(
+    left: Dict[str, int],
+    right: Dict[str, int],
+    kinds: Iterable[str],
+    hash_size: int = DEFAULT_HASH_SIZE,
+) -> bool:
+    """Shoda jen tehdy, když jsou blízko všechny zvolené hashe; kombinace snižuje falešné shody."""
+    checked = False
+    for kind in kinds:
+        if kind not in left or kind not in right:
+            return False
+        if (left[kind] ^ right[kind]).bit_count() > max_distance(kind, hash_size):
+            return False
+        checked = True
+    return checked
+
+
+@lru_cache(maxsize=64)
+def _flip_masks(width: int, radius: int) -> Tuple[int, ...]:
+    """Masky všech změn nejvýš `radius` bitů v pásmu šířky `width` (včetně nulové)."""
+    masks = [0]
+    for count in range(1, radius + 1):
+        for bits in itertools.combinations(range(width), count):
+            masks.append(sum(1 << bit for bit in bits))
+    return tuple(masks)
+
+
+def _choose_bands(bits: int, max_distance: int, expected_size: int) -> Tuple[int, int]:
+    """Počet pásem a poloměr v pásmu s nejmenším odhadem práce na jeden dotaz."""
+    best: Optional[Tuple[float, int, int]] = None
+    for bands in range(1, bits + 1):
+        # holubnik: pary do max_distance se v nekterem pasmu lisi nejvys o radius bitu
+        radius = max_distance // bands
+        width = bits // bands
+        if radius > 3:
+            continue
+        probes = bands * sum(math.comb(width, count) for count in range(radius + 1))
+        # kazda sonda stoji vyhledani v dict a prumerne expected_size / 2^width overeni kandidatu
+        cost = probes * (1 + expected_size / float(1 << min(width, 62)))
+        if best is None or cost < best[0]:
+            best = (cost, bands, radius)
+    if best is None:
+        return bits, 0
+    return best[1], best[2]
+
+
+class HammingIndex:
+    """Multi-index hashing: hledání sousedů v Hammingově prostoru bez porovnání každý s každým.
+
+    Hash se rozdělí na pásma tak, aby se pár do vzdálenosti `max_distance`
+    aspoň v jednom pásmu lišil nejvýš o poloměr pásma (holubníkový princip).
+    Dotaz v každém pásmu projde hodnoty v tomto poloměru a kandidáty ověří
+    skutečnou vzdáleností. Počet pásem se volí podle očekávané velikosti
+    indexu, aby kandidátů na dotaz zůstávalo málo.
+    """
+
+    def __init__(
+        self,
+        max_distance: int,
+        bits: int = DEFAULT_HASH_SIZE * DEFAULT_HASH_SIZE,
+        expected_size: int = 100_000,
+    ):
+        self.max_distance = max(0, max_distance)
+        self.bits = bits
+        bands, self.band_radius = _choose_bands(bits, self.max_distance, max(1, expected_size))
+        base, extra = divmod(bits, bands)
+        self._bands: List[Tuple[int, int]] = []  # (posun, sirka)
+        shift = 0
+        for band in range(bands):
+            width = base + (1 if band < extra else 0)
+            self._bands.append((shift, width))
+            shift += width
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._values: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, key: int, value: int) -> None:
+        self._values[key] = value
+        for table, (shift, width) in zip(self._tables, self._bands):
+            table.setdefault((value >> shift) & ((1 << width) - 1), []).append(key)
+
+    def query(self, value: int) -> List[int]:
+        """Klíče všech hashů do vzdálenosti max_distance (včetně shodných)."""
+        seen = set()
+        found: List[int] = []
+        for table, (shift, width) in zip(self._tables, self._bands):
+            band = (value >> shift) & ((1 << width) - 1)
+            for mask in _flip_masks(width, self.band_radius):
+                for key in table.get(band ^ mask, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if (self._values[key] ^ value).bit_count() <= self.max_distance:
+                        found.append(key)
+        return found
+
+
+def hash_distance(left: Dict[str, int], right: Dict[str, int], kinds: Iterable[str]) -> int:
+    """Součet Hammingových vzdáleností přes zvolené hashe; řadí hrany shlukování od nejbližších."""
+    return sum((left[kind] ^ right[kind]).bit_count() for kind in kinds)
+
+
+class DisjointSet:
+    """Union-find s půlením cest, spojováním podle velikosti a volitelným limitem velikosti množiny."""
+
+    def __init__(self, count: int):
+        self._parent = list(range(count))
+        self._size = [1] * count
+
+    def find(self, item: int) -> int:
+        parent = self._parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, left: int, right: int, max_size: int = 0) -> bool:
+        """Spojí množiny; při `max_size` > 0 odmítne spojení, které by limit překročilo."""
+        left, right = self.find(left), self.find(right)
+        if left == right:
+            return False
+        if max_size and self._size[left] + self._size[right] > max_size:
+            return False
+        if self._size[left] < self._size[right]:
+            left, right = right, left
+        self._parent[right] = left
+        self._size[left] += self._size[right]
+        return True
+
+    def groups(self) -> List[List[int]]:
+        """Množiny s více prvky, prvky vzestupně, skupiny podle nejmenšího prvku."""
+        members: Dict[int, List[int]] = {}
+        for item in range(len(self._parent)):
+            members.setdefault(self.find(item), []).append(item)
+        return [group for group in members.values() if len(group) > 1]
+
+
+def cluster_edges(count: int, edges: Iterable[Tuple[int, int, int]], max_group_size: int = 0) -> List[List[int]]:
+    """Skupiny indexů `0..count-1` spojené hranami `(vzdálenost, i, j)`.
+
+    Bez limitu jde o komponenty souvislosti, takže výsledek nezávisí na pořadí
+    hran ani na pořadí skenu a tranzitivní dvojníci skončí v jedné skupině.
+    S limitem se hrany spojují od nejbližších a spojení nad limit se vynechá;
+    obří řetězec podobných fotek se rozpadne na skupiny kolem nejtěsnějších párů.
+    """
+    dsu = DisjointSet(count)
+    for _distance, left, right in sorted(edges):
+        dsu.union(left, right, max_group_size)
+    return dsu.groups()
@@ -0,0 +1,275 @@
+import logging
+import struct
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 32
+# metadata HEIF/AVIF byvaji v radu desitek kB, u dlazdicovych snimku i vic; vetsi box radsi necteme
+MAX_META_BOX = 1 << 20
+MAX_JPEG_SEGMENTS = 256
+# EXIF/TIFF orientace 5-8 znamena otoceni o 90/270 stupnu: zobrazeny snimek ma prohozenou sirku a vysku
+_SWAPPING_ORIENTATIONS = {5, 6, 7, 8}
+_TAG_WIDTH = 256
+_TAG_HEIGHT = 257
+_TAG_ORIENTATION = 274
+_TIFF_INT_TYPES = {1, 3, 4}  # BYTE, SHORT, LONG
+_HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1", b"avif", b"avis"}
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01, 0xD8}
+
+Dimensions = Tuple[int, int]
+
+
+def _valid(width: int, height: int) -> Optional[Dimensions]:
+    if width > 0 and height > 0:
+        return int(width), int(height)
+    return None
+
+
+def _oriented(dims: Optional[Dimensions], orientation: Optional[int]) -> Optional[Dimensions]:
+    if dims is not None and orientation in _SWAPPING_ORIENTATIONS:
+        return dims[1], dims[0]
+    return dims
+
+
+def _tiff_tags(read_at: Callable[[int, int], bytes], wanted: Iterable[int]) -> Dict[int, int]:
+    """Hodnoty vybraných číselných tagů z IFD0; `read_at(offset, n)` čte relativně k TIFF hlavičce."""
+    header = read_at(0, 8)
+    if len(header) < 8:
+        return {}
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        return {}
+    magic, ifd_offset = struct.unpack(endian + "HI", header[2:8])
+    if magic != 42:
+        # BigTIFF (43) a exoticke varianty necha parser na QImageReaderu
+        return {}
+    raw_count = read_at(ifd_offset, 2)
+    if len(raw_count) < 2:
+        return {}
+    (count,) = struct.unpack(endian + "H", raw_count)
+    table = read_at(ifd_offset + 2, count * 12)
+    wanted_set = set(wanted)
+    found: Dict[int, int] = {}
+    for pos in range(0, len(table) - 11, 12):
+        tag, typ, n = struct.unpack(endian + "HHI", table[pos:pos + 8])
+        if tag not in wanted_set or n < 1 or typ not in _TIFF_INT_TYPES:
+            continue
+        value = table[pos + 8:pos + 12]
+        if typ == 1:
+            found[tag] = value[0]
+        elif typ == 3:
+            found[tag] = struct.unpack(endian + "H", value[:2])[0]
+        elif typ == 4:
+            found[tag] = struct.unpack(endian + "I", value)[0]
+    return found
+
+
+def _exif_orientation(segment: bytes) -> Optional[int]:
+    if not segment.startswith(b"Exif\x00\x00"):
+        return None
+    tiff = segment[6:]
+    tags = _tiff_tags(lambda offset, n: tiff[offset:offset + n], [_TAG_ORIENTATION])
+    return tags.get(_TAG_ORIENTATION)
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) < n:
+        raise EOFError
+    return data
+
+
+def _jpeg_dimensions(f: BinaryIO) -> Optional[Dimensions]:
+    f.seek(2)
+    orientation: Optional[int] = None
+    for _ in range(MAX_JPEG_SEGMENTS):
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            return None
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:
+            marker = _read_exact(f, 1)[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            # obrazova data bez SOF pred nimi: neznamy/poskozeny soubor
+            return None
+        (length,) = struct.unpack(">H", _read_exact(f, 2))
+        if length < 2:
+            return None
+        if marker in _JPEG_SOF_MARKERS:
+            _precision, height, width = struct.unpack(">BHH", _read_exact(f, 5))
+            # vyska 0 = DNL marker za skenem, to uz hlavickou nevyresime
+            return _oriented(_valid(width, height), orientation)
+        if marker == 0xE1 and orientation is None:
+            orientation = _exif_orientation(_read_exact(f, length - 2))
+            continue
+        f.seek(length - 2, 1)
+    return None
+
+
+def _png_dimensions(head: bytes) -> Optional[Dimensions]:
+    if head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return _valid(width, height)
+
+
+def _gif_dimensions(head: bytes) -> Optional[Dimensions]:
+    width, height = struct.unpack("<HH", head[6:10])
+    return _valid(width, height)
+
+
+def _bmp_dimensions(head: bytes) -> Optional[Dimensions]:
+    (dib_size,) = struct.unpack("<I", head[14:18])
+    if dib_size == 12:
+        width, height = struct.unpack("<HH", head[18:22])
+    elif dib_size >= 40:
+        width, height = struct.unpack("<ii", head[18:26])
+    else:
+        return None
+    # zaporna vyska = bitmapa ulozena shora dolu
+    return _valid(width, abs(height))
+
+
+def _webp_dimensions(head: bytes) -> Optional[Dimensions]:
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        if head[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", head[26:30])
+        return _valid(width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        if head[20] != 0x2F:
+            return None
+        (bits,) = struct.unpack("<I", head[21:25])
+        return _valid((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return _valid(width, height)
+    return None
+
+
+def _tiff_dimensions(f: BinaryIO) -> Optional[Dimensions]:
+    def read_at(offset: int, n: int) -> bytes:
+        f.seek(offset)
+        return f.read(n)
+
+    tags = _tiff_tags(read_at, [_TAG_WIDTH, _TAG_HEIGHT, _TAG_ORIENTATION])
+    if _TAG_WIDTH not in tags or _TAG_HEIGHT not in tags:
+        return None
+    return _oriented(_valid(tags[_TAG_WIDTH], tags[_TAG_HEIGHT]), tags.get(_TAG_ORIENTATION))
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            (size,) = struct.unpack(">Q", data[pos + 8:pos + 16])
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _heif_dimensions(f: BinaryIO) -> Optional[Dimensions]:
+    f.seek(0)
+    meta: Optional[bytes] = None
+    offset = 0
+    while meta is None:
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            (size,) = struct.unpack(">Q", header[8:16])
+            header_len = 16
+        if offset == 0 and kind != b"ftyp":
+            return None
+        if kind == b"ftyp":
+            f.seek(offset + header_len)
+            body = f.read(max(0, size - header_len))
+            brands = {body[i:i + 4] for i in range(0, len(body) - 3, 4) if i != 4}
+            if not brands & _HEIF_BRANDS:
+                return None
+        elif kind == b"meta":
+            if size == 0 or size - header_len > MAX_META_BOX:
+                return None
+            f.seek(offset + header_len)
+            meta = f.read(size - header_len)
+            break
+        if size == 0:
+            return None
+        offset += size
+        f.seek(offset)
+    # meta je FullBox: 4 bajty verze a flagu pred potomky
+    for kind, start, end in _iter_boxes(meta, 4):
+        if kind != b"iprp":
+            continue
+        for sub_kind, sub_start, sub_end in _iter_boxes(meta, start, end):
+            if sub_kind != b"ipco":
+                continue
+            return _heif_ipco_dimensions(meta, sub_start, sub_end)
+    return None
+
+
+def _heif_ipco_dimensions(meta: bytes, start: int, end: int) -> Optional[Dimensions]:
+    best: Optional[Dimensions] = None
+    rotated = False
+    for kind, box_start, box_end in _iter_boxes(meta, start, end):
+        if kind == b"ispe" and box_end - box_start >= 12:
+            width, height = struct.unpack(">II", meta[box_start + 4:box_start + 12])
+            dims = _valid(width, height)
+            # dlazdice a nahledy maji vlastni ispe; primarni (mrizka) obrazek je ten nejvetsi
+            if dims and (best is None or dims[0] * dims[1] > best[0] * best[1]):
+                best = dims
+        elif kind == b"irot" and box_end > box_start:
+            rotated = (meta[box_start] & 0x03) in (1, 3)
+    if best is not None and rotated:
+        return best[1], best[0]
+    return best
+
+
+def read_header_dimensions(path: str) -> Optional[Dimensions]:
+    """Rozměry z hlavičky souboru bez dekódování; None pro neznámý nebo nečitelný formát.
+
+    Orientace z EXIF/TIFF a HEIF `irot` se uplatní, takže výsledek odpovídá
+    snímku zobrazenému přes QImageReader s autoTransform.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_BYTES)
+            if head.startswith(b"\xff\xd8"):
+                return _jpeg_dimensions(f)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+                return _png_dimensions(head)
+            if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+                return _gif_dimensions(head)
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+                return _webp_dimensions(head)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                return _tiff_dimensions(f)
+            if head[:2] == b"BM" and len(head) >= 26:
+                return _bmp_dimensions(head)
+            if head[4:8] == b"ftyp":
+                return _heif_dimensions(f)
+    except (OSError, EOFError, struct.error, IndexError) as e:
+        logger.debug("Hlavicku obrazku nelze precist %s: %s", path, e)
+    return None
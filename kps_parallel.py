@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# dekodovani v QImageReader, hashlib i cteni souboru uvolnuji GIL, vlakna tedy skaluji s jadry
+DEFAULT_HASH_WORKERS = max(1, min(32, os.cpu_count() or 1))
+DEFAULT_CHUNK_SIZE = 16
+
+
+@dataclass
+class PipelineStats:
+    done: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def elapsed(self) -> float:
+        return max(1e-9, time.monotonic() - self.started)
+
+    def rate(self) -> float:
+        """Zpracované položky za sekundu od startu."""
+        return self.done / self.elapsed()
+
+
+def _run_chunk(func: Callable[[T], R], chunk: Sequence[T]) -> List[Optional[R]]:
+    results: List[Optional[R]] = []
+    for item in chunk:
+        try:
+            results.append(func(item))
+        except Exception as e:
+            logger.warning("Chyba paralelni ulohy: %s", e)
+            results.append(None)
+    return results
+
+
+def iter_parallel(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    stats: Optional[PipelineStats] = None,
+) -> Iterator[Tuple[T, Optional[R]]]:
+    """Spustí `func` nad položkami v poolu vláken a výsledky vrací ve vstupním pořadí.
+
+    Položky se odesílají po dávkách `chunk_size`, rozpracovaných dávek je
+    nejvýš dvojnásobek počtu vláken. Generátor běží ve vlákně volajícího:
+    `should_cancel()` se volá po každé položce a True zbytek fronty zahodí.
+    Výjimka z `func` se zaloguje a položka dostane výsledek None.
+    """
+    workers = max(1, int(max_workers or DEFAULT_HASH_WORKERS))
+    chunk_size = max(1, int(chunk_size))
+    stats = stats if stats is not None else PipelineStats()
+    chunks = (items[start:start + chunk_size] for start in range(0, len(items), chunk_size))
+    in_flight: Deque = deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kps-hash")
+    try:
+        pending = True
+        while pending or in_flight:
+            while pending and len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    pending = False
+                    break
+                in_flight.append((chunk, executor.submit(_run_chunk, func, chunk)))
+            if not in_flight:
+                break
+            chunk, future = in_flight.popleft()
+            for item, result in zip(chunk, future.result()):
+                stats.done += 1
+                yield item, result
+                if should_cancel is not None and should_cancel():
+                    return
+    finally:
+        # bezici davky dobehnou na pozadi, cekajici se zahodi
+        executor.shutdown(wait=False, cancel_futures=True)
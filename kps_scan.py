@@ -0,0 +1,226 @@
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTS = {
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".webp",
+    ".bmp",
+    ".gif",
+    ".heic",
+    ".heif",
+    ".avif",
+    ".tif",
+    ".tiff",
+}
+SYSTEM_PATH_KEYWORDS = [
+    "\\windows\\",
+    "\\program files\\",
+    "\\program files (x86)\\",
+    "\\programdata\\",
+    "\\appdata\\",
+    "\\$recycle.bin\\",
+    "\\system volume information\\",
+    "\\venv\\",
+    "\\.venv\\",
+    "\\site-packages\\",
+    "\\comfyui\\",
+]
+EXCLUDED_DIR_NAMES = {"$RECYCLE.BIN", "System Volume Information"}
+# I/O vazana prace: vic vlaken nez jader pomaha hlavne na NAS a sitovych discich.
+DEFAULT_WALK_WORKERS = min(16, (os.cpu_count() or 2) * 2)
+PROGRESS_INTERVAL = 0.1
+
+
+class ScanEntry(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+
+
+@dataclass
+class ScanStats:
+    dirs: int = 0
+    found: int = 0
+    filtered_out: int = 0
+    reused_dirs: int = 0
+
+
+def is_system_like_path(path: str) -> bool:
+    low = os.path.abspath(path).lower()
+    return any(k in low for k in SYSTEM_PATH_KEYWORDS)
+
+
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTS
+
+
+def scan_directory(dirpath: str) -> Tuple[List[ScanEntry], List[str]]:
+    """Jeden scandir průchod: obrázky se stat daty z DirEntry a podadresáře k dalšímu průchodu."""
+    files: List[ScanEntry] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # stejne jako os.walk(followlinks=False): do symlinku na adresar nevstupujeme
+                    if entry.name not in EXCLUDED_DIR_NAMES and not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                if not is_image_name(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append(ScanEntry(entry.path, int(st.st_size), float(st.st_mtime)))
+    except OSError as e:
+        logger.debug("Adresar nelze projit %s: %s", dirpath, e)
+    return files, subdirs
+
+
+class _Listing(NamedTuple):
+    files: List[ScanEntry]
+    subdirs: List[str]
+    mtime_ns: Optional[int]
+    reused: bool = False
+    changed: bool = True
+
+
+def _refresh_entries(entries: List[ScanEntry]) -> Tuple[List[ScanEntry], bool]:
+    """Znovu stat souborů z uloženého výpisu; úprava obsahu mtime adresáře nemění."""
+    fresh: List[ScanEntry] = []
+    changed = False
+    for entry in entries:
+        try:
+            st = os.stat(entry.path)
+        except OSError:
+            changed = True
+            continue
+        current = ScanEntry(entry.path, int(st.st_size), float(st.st_mtime))
+        changed = changed or current != entry
+        fresh.append(current)
+    return fresh, changed
+
+
+def _list_directory(dirpath: str, known: Optional[Tuple[int, int]], index: Optional[Any]) -> _Listing:
+    """Výpis adresáře; s platným výpisem v indexu se přeskočí jen scandir, soubory se stat-ují znovu."""
+    if index is None:
+        files, subdirs = scan_directory(dirpath)
+        return _Listing(files, subdirs, None)
+    try:
+        mtime_ns = os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return _Listing([], [], None, changed=False)
+    if index.listing_is_current(known, mtime_ns):
+        cached = index.cached_listing(dirpath)
+        if cached is not None:
+            files, changed = _refresh_entries(cached[0])
+            return _Listing(files, cached[1], mtime_ns, reused=True, changed=changed)
+    files, subdirs = scan_directory(dirpath)
+    return _Listing(files, subdirs, mtime_ns)
+
+
+def iter_scan_entries(
+    roots: Iterable[str],
+    ignore_system: bool,
+    on_progress: Optional[Callable[[int, int], bool]] = None,
+    max_workers: Optional[int] = None,
+    min_bytes: int = 0,
+    max_bytes: int = 0,
+    stats: Optional[ScanStats] = None,
+    index: Optional[Any] = None,
+    descend: Optional[Callable[[str], bool]] = None,
+    listed_dirs: Optional[List[str]] = None,
+) -> Iterator[ScanEntry]:
+    """Paralelní průchod stromy přes os.scandir v omezeném poolu vláken.
+
+    Adresáře se zpracovávají v pořadí, v jakém byly nalezeny, takže výsledek je
+    deterministický. Limity velikosti se uplatní rovnou při průchodu, žádný
+    mezivýsledek se všemi cestami nevzniká. `on_progress(nalezeno, adresaru)` se
+    volá z vlákna volajícího nejvýš každých PROGRESS_INTERVAL sekund; návrat
+    False průchod zastaví.
+
+    S `index` (ScanIndex) se adresáře, jejichž mtime se od minulého průchodu
+    nezměnilo, neprocházejí znovu: jejich obrázky a podadresáře se vezmou z indexu
+    a velikost i mtime každého obrázku se jen ověří přes os.stat.
+
+    `descend(podadresář)` vracející False podadresář vynechá (hlídání složek
+    prochází jen změněné a nové adresáře); `listed_dirs` dostane každý vypsaný
+    adresář v pořadí zpracování.
+    """
+    workers = max(1, int(max_workers or DEFAULT_WALK_WORKERS))
+    root_paths = [os.path.abspath(root) for root in roots if os.path.exists(root)]
+    pending: Deque[str] = deque(root_paths)
+    in_flight: Deque = deque()
+    stats = stats if stats is not None else ScanStats()
+    known: Dict[str, Tuple[int, int]] = {}
+    visited: List[str] = []
+    if index is not None:
+        for root in root_paths:
+            known.update(index.snapshot_dirs(root))
+    completed = False
+    last_update = time.time()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kps-scan")
+    try:
+        while pending or in_flight:
+            # predstih je omezeny, aby obri stromy nezahltily frontu futures
+            while pending and len(in_flight) < workers * 4:
+                dirpath = pending.popleft()
+                if ignore_system and is_system_like_path(dirpath):
+                    stats.dirs += 1
+                    continue
+                in_flight.append((dirpath, executor.submit(_list_directory, dirpath, known.get(dirpath), index)))
+            if not in_flight:
+                continue
+            dirpath, future = in_flight.popleft()
+            files, subdirs, mtime_ns, reused, changed = future.result()
+            if index is not None and mtime_ns is not None:
+                if reused:
+                    stats.reused_dirs += 1
+                if changed:
+                    index.store_listing(dirpath, mtime_ns, files, subdirs)
+                visited.append(dirpath)
+            stats.dirs += 1
+            if listed_dirs is not None:
+                listed_dirs.append(dirpath)
+            pending.extend(subdirs if descend is None else [d for d in subdirs if descend(d)])
+            for entry in files:
+                if (min_bytes and entry.size < min_bytes) or (max_bytes and entry.size > max_bytes):
+                    stats.filtered_out += 1
+                    continue
+                stats.found += 1
+                yield entry
+            if on_progress and (time.time() - last_update) > PROGRESS_INTERVAL:
+                if on_progress(stats.found, stats.dirs) is False:
+                    return
+                last_update = time.time()
+        completed = True
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if index is not None:
+            # jen uplny pruchod smi z indexu mazat adresare, ktere uz neexistuji;
+            # s descend nejsou vynechane podadresare navstivene, ale existuji
+            if completed and descend is None:
+                index.prune(root_paths, visited)
+            index.commit()
+
+
+def iter_image_paths(
+    roots: List[str],
+    ignore_system: bool,
+    on_progress: Optional[Callable[[int, int], bool]] = None,
+) -> List[str]:
+    return [entry.path for entry in iter_scan_entries(roots, ignore_system, on_progress=on_progress)]
@@ -0,0 +1,177 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cloud_providers.cache import app_data_dir
+from kps_scan import ScanEntry
+
+logger = logging.getLogger(__name__)
+
+SCAN_INDEX_FILE = "scan_index.sqlite3"
+# FAT/exFAT ma mtime po 2 s: adresar zmeneny tesne kolem indexace muze mit i po dalsi zmene stejne mtime
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+COMMIT_EVERY_DIRS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    indexed_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (dir, name)
+) WITHOUT ROWID;
+"""
+
+DirState = Tuple[int, int]  # mtime_ns, indexed_ns
+
+
+def listing_is_current(known: Optional[DirState], mtime_ns: int) -> bool:
+    """Uložený výpis adresáře platí, jen když se mtime nezměnilo a nebylo 'racy' vůči času indexace."""
+    if known is None:
+        return False
+    known_mtime, indexed_ns = known
+    return known_mtime == mtime_ns and indexed_ns - mtime_ns > RACY_MTIME_WINDOW_NS
+
+
+def _subtree_bounds(root: str) -> Tuple[str, str]:
+    prefix = root.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class ScanIndex:
+    """Perzistentní index adresářů (mtime) a obrázků (velikost, mtime) pro inkrementální rescan."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(app_data_dir(), SCAN_INDEX_FILE)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._pending_dirs = 0
+        self.available = True
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or not self.available:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Index skenovani neni dostupny (%s): %s", self.path, e)
+            self.available = False
+        return self._conn
+
+    @staticmethod
+    def listing_is_current(known: Optional[DirState], mtime_ns: int) -> bool:
+        return listing_is_current(known, mtime_ns)
+
+    def _disable(self, error: Exception) -> None:
+        logger.warning("Index skenovani vypnut po chybe: %s", error)
+        self.available = False
+
+    def snapshot_dirs(self, root: str) -> Dict[str, DirState]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return {}
+            low, high = _subtree_bounds(root)
+            try:
+                rows = conn.execute(
+                    "SELECT path, mtime_ns, indexed_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                    (root, low, high),
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return {}
+        return {path: (int(mtime_ns), int(indexed_ns)) for path, mtime_ns, indexed_ns in rows}
+
+    def cached_listing(self, dirpath: str) -> Optional[Tuple[List[ScanEntry], List[str]]]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT subdirs FROM dirs WHERE path = ?", (dirpath,)).fetchone()
+                if row is None:
+                    return None
+                files = conn.execute("SELECT name, size, mtime FROM files WHERE dir = ?", (dirpath,)).fetchall()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+        entries = [ScanEntry(os.path.join(dirpath, name), int(size), float(mtime)) for name, size, mtime in files]
+        subdirs = [os.path.join(dirpath, name) for name in row[0].split("\n") if name]
+        return entries, subdirs
+
+    def store_listing(self, dirpath: str, mtime_ns: int, files: List[ScanEntry], subdirs: List[str]) -> None:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO dirs (path, mtime_ns, indexed_ns, subdirs) VALUES (?, ?, ?, ?)",
+                    (dirpath, int(mtime_ns), time.time_ns(), "\n".join(os.path.basename(p) for p in subdirs)),
+                )
+                conn.execute("DELETE FROM files WHERE dir = ?", (dirpath,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (dir, name, size, mtime) VALUES (?, ?, ?, ?)",
+                    [(dirpath, os.path.basename(e.path), e.size, e.mtime) for e in files],
+                )
+            except sqlite3.Error as e:
+                self._disable(e)
+                return
+            self._pending_dirs += 1
+            if self._pending_dirs >= COMMIT_EVERY_DIRS:
+                self.commit()
+
+    def prune(self, roots: Iterable[str], visited: Iterable[str]) -> int:
+        """Smaže adresáře pod roots, které poslední úplný průchod už nenavštívil."""
+        visited_set = set(visited)
+        removed = 0
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            try:
+                for root in roots:
+                    low, high = _subtree_bounds(root)
+                    rows = conn.execute(
+                        "SELECT path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                        (root, low, high),
+                    ).fetchall()
+                    stale = [(path,) for (path,) in rows if path not in visited_set]
+                    conn.executemany("DELETE FROM dirs WHERE path = ?", stale)
+                    conn.executemany("DELETE FROM files WHERE dir = ?", stale)
+                    removed += len(stale)
+            except sqlite3.Error as e:
+                self._disable(e)
+        return removed
+
+    def commit(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+            self._pending_dirs = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            self.commit()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from kps_scan import EXCLUDED_DIR_NAMES, is_system_like_path
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_MS = 750
+# souvisly proud udalosti nesmi zmeny odkladat donekonecna
+MAX_DEBOUNCE_DELAY = 5.0
+POLL_INTERVAL_MS = 3000
+POLL_DIRS_PER_TICK = 2000
+# inotify ma systemovy limit watchu (fs.inotify.max_user_watches); zbytek stromu hlida polling
+MAX_NATIVE_WATCHES = 4096
+
+
+def list_tree_dirs(root: str, ignore_system: bool) -> List[str]:
+    dirs: List[str] = []
+    for dirpath, dirnames, _filenames in os.walk(root, topdown=True):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIR_NAMES]
+        if ignore_system and is_system_like_path(dirpath):
+            dirnames[:] = []
+            continue
+        dirs.append(dirpath)
+    return dirs
+
+
+def _dir_mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FolderWatcher(QObject):
+    """Hlídá adresáře a po utišení dávky událostí ohlásí změněné složky.
+
+    Nativní QFileSystemWatcher používá inotify (Linux), ReadDirectoryChangesW
+    (Windows) nebo kqueue/FSEvents (macOS). Adresáře nad limit nativních watchů
+    nebo ty, které backend odmítne, se hlídají levným pollingem mtime po částech.
+    """
+
+    dirs_changed = pyqtSignal(list)
+
+    def __init__(
+        self,
+        parent: Optional[QObject] = None,
+        debounce_ms: int = DEBOUNCE_MS,
+        poll_interval_ms: int = POLL_INTERVAL_MS,
+        max_native_watches: int = MAX_NATIVE_WATCHES,
+    ):
+        super().__init__(parent)
+        self.max_native_watches = max(0, max_native_watches)
+        self._native = QFileSystemWatcher(self)
+        self._native.directoryChanged.connect(self._on_native_change)
+        self._native_dirs: Set[str] = set()
+        self._polled: Dict[str, Optional[int]] = {}
+        self._poll_order: List[str] = []
+        self._poll_pos = 0
+        self._pending: Set[str] = set()
+        self._pending_since = 0.0
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(max(0, debounce_ms))
+        self._debounce.timeout.connect(self._flush)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(max(50, poll_interval_ms))
+        self._poll_timer.timeout.connect(self._poll_tick)
+
+    def is_active(self) -> bool:
+        return bool(self._native_dirs or self._polled)
+
+    def watched_dirs(self) -> Set[str]:
+        return set(self._native_dirs) | set(self._polled)
+
+    def native_dir_count(self) -> int:
+        return len(self._native_dirs)
+
+    def add_dirs(self, dirs: Iterable[str]) -> None:
+        new_dirs = [d for d in dirs if d not in self._native_dirs and d not in self._polled]
+        if not new_dirs:
+            return
+        room = max(0, self.max_native_watches - len(self._native_dirs))
+        native_candidates = new_dirs[:room]
+        failed: List[str] = []
+        if native_candidates:
+            failed = list(self._native.addPaths(native_candidates))
+            failed_set = set(failed)
+            self._native_dirs.update(d for d in native_candidates if d not in failed_set)
+        for path in failed + new_dirs[room:]:
+            self._polled[path] = _dir_mtime_ns(path)
+            self._poll_order.append(path)
+        if self._polled and not self._poll_timer.isActive():
+            self._poll_timer.start()
+
+    def remove_dirs(self, dirs: Iterable[str]) -> None:
+        dirs = list(dirs)
+        native = [d for d in dirs if d in self._native_dirs]
+        if native:
+            self._native.removePaths(native)
+            self._native_dirs.difference_update(native)
+        removed = [d for d in dirs if d in self._polled]
+        for path in removed:
+            self._polled.pop(path, None)
+        if removed:
+            self._poll_order = [d for d in self._poll_order if d in self._polled]
+            self._poll_pos = 0
+        if not self._polled:
+            self._poll_timer.stop()
+
+    def stop(self) -> None:
+        self._debounce.stop()
+        self._poll_timer.stop()
+        if self._native_dirs:
+            self._native.removePaths(list(self._native_dirs))
+        self._native_dirs.clear()
+        self._polled.clear()
+        self._poll_order = []
+        self._poll_pos = 0
+        self._pending.clear()
+
+    def _on_native_change(self, path: str) -> None:
+        self._mark_changed(path)
+
+    def _mark_changed(self, path: str) -> None:
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.add(path)
+        if time.monotonic() - self._pending_since >= MAX_DEBOUNCE_DELAY:
+            self._flush()
+            return
+        self._debounce.start()
+
+    def _poll_tick(self) -> None:
+        if not self._poll_order:
+            return
+        end = min(len(self._poll_order), self._poll_pos + POLL_DIRS_PER_TICK)
+        for path in self._poll_order[self._poll_pos:end]:
+            mtime_ns = _dir_mtime_ns(path)
+            if mtime_ns != self._polled.get(path):
+                self._polled[path] = mtime_ns
+                self._mark_changed(path)
+        self._poll_pos = 0 if end >= len(self._poll_order) else end
+
+    def _flush(self) -> None:
+        self._debounce.stop()
+        if not self._pending:
+            return
+        changed = sorted(self._pending)
+        self._pending.clear()
+        logger.info("Hlidani slozek: zmena v %d adresarich.", len(changed))
+        self.dirs_changed.emit(changed)
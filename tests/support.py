@@ -1,4 +1,5 @@
 import os
+import time
 
 os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
@@ -29,6 +30,21 @@ class DummyProgress:
     def set_detail_text(self, text):
         self.detail = text
 
+    def set_base_text(self, text):
+        self.text = text
+
+    def set_maximum(self, maximum):
+        self._maximum = maximum
+
+    def maximum(self):
+        return getattr(self, "_maximum", 0)
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+
     def complete(self):
         self.closed = True
 
@@ -86,5 +102,16 @@ class DummyScanDialog:
         return self._canceled
 
 
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        APP.processEvents()
+        if predicate():
+            return True
+        time.sleep(0.01)
+    APP.processEvents()
+    return bool(predicate())
+
+
 def write_test_image(path: str, color: tuple[int, int, int] = (255, 0, 0)) -> None:
     Image.new("RGB", (16, 16), color).save(path, format="PNG")
@@ -1,32 +1,57 @@
+import hashlib
 import json
 import os
+import shutil
 import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
 os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
+from PIL import Image, ImageDraw
 from PyQt6.QtGui import QImage
 from PyQt6.QtWidgets import QApplication
 
-from KajovoPhotoSelector import DEFAULT_BUCKET_ALIASES, DuplicateGroupDialog, ImageRecord, MainWindow
+import KajovoPhotoSelector
+from KajovoPhotoSelector import (
+    DEFAULT_BUCKET_ALIASES,
+    FORENSIC_CHUNK_SIZE,
+    DuplicateGroupDialog,
+    DuplicateSearchWorker,
+    ImageRecord,
+    MainWindow,
+    ScanJob,
+    ScanWorker,
+    full_file_signature,
+    read_image_dimensions,
+)
+from kps_hash_cache import HashCache
+from kps_scan_index import ScanIndex
+from kps_watch import list_tree_dirs
 from support import (
     APP,
     AlwaysCanceledProgress,
     CancelAfterFirstProgress,
     DummyProgress,
-    DummyScanDialog,
     DummySfx,
+    wait_until,
+    write_test_image,
 )
 
 
 class AppRegressionTests(unittest.TestCase):
     def setUp(self):
-        self.win = MainWindow(sfx=DummySfx())
+        self._state_dir = tempfile.TemporaryDirectory()
+        self.win = MainWindow(sfx=DummySfx(), data_dir=self._state_dir.name)
 
     def tearDown(self):
+        self.win.scan_index.close()
+        self.win.hash_cache.close()
         self.win.deleteLater()
         QApplication.processEvents()
+        self._state_dir.cleanup()
 
     def test_reset_state_clears_bucket_aliases_and_paths(self):
         bucket = self.win.buckets["T1"]
@@ -147,20 +172,466 @@ class AppRegressionTests(unittest.TestCase):
 
     def test_scan_filter_cancel_does_not_import_partial_results(self):
         with tempfile.TemporaryDirectory() as root:
-            paths = []
-            for name in ["a.jpg", "b.jpg"]:
-                path = os.path.join(root, name)
-                with open(path, "wb") as f:
+            for index in range(5):
+                with open(os.path.join(root, f"img{index}.jpg"), "wb") as f:
                     f.write(b"img")
-                paths.append(path)
 
-            with patch("KajovoPhotoSelector.iter_image_paths", return_value=paths), \
-                patch("KajovoPhotoSelector.DagmarProgress", AlwaysCanceledProgress), \
-                patch("KajovoPhotoSelector.QProgressDialog", DummyScanDialog), \
+            with patch("KajovoPhotoSelector.DagmarProgress", AlwaysCanceledProgress), \
+                patch.object(self.win, "_coin_per_file") as coin_mock, \
                 patch.object(self.win, "toast"):
                 self.win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                worker = self.win._scan_job.worker
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
 
+            self.assertTrue(worker.is_canceled())
+            coin_mock.assert_not_called()
             self.assertEqual(self.win.images, [])
+            self.assertEqual(self.win.list_widget.count(), 0)
+
+    def test_rescan_of_same_root_adds_only_new_files_and_updates_modified_ones(self):
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as state_dir:
+            self.win.scan_index = ScanIndex(os.path.join(state_dir, "scan_index.sqlite3"))
+            old_dir = os.path.join(root, "old")
+            new_dir = os.path.join(root, "new")
+            os.makedirs(old_dir)
+            os.makedirs(new_dir)
+            kept = os.path.join(old_dir, "kept.jpg")
+            changed = os.path.join(old_dir, "changed.jpg")
+            for path in [kept, changed]:
+                with open(path, "wb") as f:
+                    f.write(b"img")
+            # mimo RACY_MTIME_WINDOW_NS, aby rescan vzal vypis "old" z indexu
+            stamp = time.time() - 3600
+            for path in [root, old_dir, new_dir]:
+                os.utime(path, (stamp, stamp))
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch.object(self.win, "_coin_per_file"), \
+                patch.object(self.win, "toast"):
+                self.win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+                with open(changed, "ab") as f:
+                    f.write(b"-edited")
+                added = os.path.join(new_dir, "added.jpg")
+                with open(added, "wb") as f:
+                    f.write(b"img")
+                self.win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+
+            self.win.scan_index.close()
+            sizes = {rec.path: rec.size for rec in self.win.images}
+            self.assertEqual(len(self.win.images), 3)
+            self.assertEqual(sizes, {kept: 3, changed: 10, added: 3})
+
+    def test_watched_directory_change_updates_records_without_rebuilding_list(self):
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as state_dir:
+            self.win.scan_index = ScanIndex(os.path.join(state_dir, "scan_index.sqlite3"))
+            stays = os.path.join(root, "stays.jpg")
+            vanishes = os.path.join(root, "vanishes.jpg")
+            for path in [stays, vanishes]:
+                with open(path, "wb") as f:
+                    f.write(b"img")
+            self.win._register_scan_source(self.win._make_local_source(root))
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch.object(self.win, "_coin_per_file"), \
+                patch.object(self.win, "toast"):
+                self.win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+                self.win._toggle_watch()
+                self.assertTrue(wait_until(lambda: self.win.folder_watcher.is_active()))
+
+            os.remove(vanishes)
+            arrived_dir = os.path.join(root, "dump")
+            os.makedirs(arrived_dir)
+            arrived = os.path.join(arrived_dir, "new.jpg")
+            with open(arrived, "wb") as f:
+                f.write(b"new")
+            settled = time.time() - 60
+            os.utime(arrived, (settled, settled))
+            with patch.object(self.win, "rebuild_list") as rebuild_mock, \
+                patch.object(self.win, "_coin_per_file"):
+                self.win.on_watched_dirs_changed([root])
+                self.assertIsNotNone(self.win._scan_job)
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+
+            rebuild_mock.assert_not_called()
+            self.assertEqual(sorted(rec.path for rec in self.win.images), sorted([stays, arrived]))
+            self.assertEqual(self.win.list_widget.count(), 2)
+            self.assertIn(arrived_dir, self.win.folder_watcher.watched_dirs())
+            self.assertEqual(self.win.btn_watch.text(), "Hlídání: ON")
+            self.win.stop_watching()
+            self.win.scan_index.close()
+
+    def test_watched_file_still_being_copied_is_added_once_its_size_settles(self):
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as state_dir:
+            self.win.scan_index = ScanIndex(os.path.join(state_dir, "scan_index.sqlite3"))
+            self.win._register_scan_source(self.win._make_local_source(root))
+            walk_threads = []
+
+            def recording_walk(*args):
+                walk_threads.append(threading.current_thread())
+                return list_tree_dirs(*args)
+
+            with patch.object(self.win, "toast"), \
+                patch("KajovoPhotoSelector.list_tree_dirs", side_effect=recording_walk):
+                self.win._toggle_watch()
+                self.assertFalse(self.win.folder_watcher.is_active())
+                self.assertTrue(wait_until(lambda: self.win.folder_watcher.is_active()))
+            # bez snapshotu v indexu se strom prochazi ve vlakne poolu, ne v GUI vlakne
+            self.assertEqual(len(walk_threads), 1)
+            self.assertIsNot(walk_threads[0], threading.main_thread())
+            copying = os.path.join(root, "copying.jpg")
+            with open(copying, "wb") as f:
+                f.write(b"part")
+
+            with patch("KajovoPhotoSelector.WATCH_SETTLE_SECONDS", 1.0), \
+                patch.object(self.win, "_coin_per_file"):
+                self.win.on_watched_dirs_changed([root])
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+                self.assertEqual(self.win.images, [])
+
+                with open(copying, "ab") as f:
+                    f.write(b"-rest-of-file")
+                settled = time.time() - 60
+                os.utime(copying, (settled, settled))
+                self.assertTrue(wait_until(lambda: self.win.images, timeout=5.0))
+
+            self.assertEqual([(rec.path, rec.size) for rec in self.win.images], [(copying, 17)])
+            self.win.stop_watching()
+            self.win.scan_index.close()
+
+    def test_removed_folder_stops_watching_its_subfolders(self):
+        with tempfile.TemporaryDirectory() as root:
+            sub = os.path.join(root, "sub")
+            deep = os.path.join(sub, "deep")
+            os.makedirs(deep)
+            self.win.folder_watcher.add_dirs([root, sub, deep])
+            shutil.rmtree(sub)
+            worker = ScanWorker(1, [root], False, 0, 0, watched=set())
+            worker.listed_dirs = [root]
+            worker.gone_dirs = [sub]
+            job = ScanJob(job_id=1, worker=worker, progress=None, existing_paths={}, start_id=1, watch_roots=[root])
+
+            self.win._finish_watch_rescan(job)
+
+            self.assertEqual(self.win.folder_watcher.watched_dirs(), {root})
+            self.win.stop_watching()
+
+    def test_watch_stays_off_when_no_source_folder_exists(self):
+        with tempfile.TemporaryDirectory() as root:
+            missing = os.path.join(root, "odpojeny-disk")
+        self.win._register_scan_source(self.win._make_local_source(missing))
+        self.assertEqual(len(self.win.scan_sources), 1)
+
+        with patch.object(self.win, "toast") as toast_mock:
+            self.win._toggle_watch()
+            self.assertTrue(wait_until(lambda: toast_mock.called))
+
+        self.assertFalse(self.win.folder_watcher.is_active())
+        self.assertEqual(self.win.btn_watch.text(), "Hlídání: OFF")
+        self.assertEqual(toast_mock.call_args.args[1], "warn")
+
+    def test_scanned_records_get_dimensions_from_background_probe(self):
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as state_dir:
+            self.win.scan_index = ScanIndex(os.path.join(state_dir, "scan_index.sqlite3"))
+            for index in range(3):
+                write_test_image(os.path.join(root, f"img{index}.png"))
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch("KajovoPhotoSelector.read_image_dimensions", wraps=read_image_dimensions) as read_mock, \
+                patch.object(self.win, "_coin_per_file"), \
+                patch.object(self.win, "toast"):
+                self.win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+                self.assertEqual(len(self.win.images), 3)
+                self.assertTrue(wait_until(lambda: all(rec.width is not None for rec in self.win.images)))
+                self.win._ensure_dimensions(self.win.images)
+
+            self.win.scan_index.close()
+            self.assertEqual({(rec.width, rec.height) for rec in self.win.images}, {(16, 16)})
+            self.assertEqual(read_mock.call_count, 3)
+
+    def test_ensure_dimensions_reads_missing_sizes_on_demand(self):
+        with tempfile.TemporaryDirectory() as root:
+            image_path = os.path.join(root, "probe.png")
+            write_test_image(image_path)
+            rec = ImageRecord(id=1, path=image_path, size=os.path.getsize(image_path))
+            self.win.images.append(rec)
+            self.win.image_by_id[rec.id] = rec
+
+            self.win._ensure_dimensions([rec])
+
+            self.assertEqual((rec.width, rec.height), (16, 16))
+
+    def test_find_duplicates_groups_resized_copy_with_selected_hashes(self):
+        with tempfile.TemporaryDirectory() as root:
+            original = Image.new("RGB", (320, 240), (30, 60, 90))
+            draw = ImageDraw.Draw(original)
+            draw.ellipse((20, 30, 180, 200), fill=(240, 200, 40))
+            draw.rectangle((200, 20, 300, 120), fill=(200, 30, 60))
+            draw.ellipse((150, 140, 310, 230), fill=(90, 220, 120))
+            base = os.path.join(root, "base.png")
+            copy = os.path.join(root, "copy.jpg")
+            original.save(base)
+            original.resize((160, 120)).save(copy, quality=60)
+            records = [
+                ImageRecord(id=1, path=base, size=os.path.getsize(base)),
+                ImageRecord(id=2, path=copy, size=os.path.getsize(base)),
+            ]
+            self.win.images = list(records)
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            shown = []
+
+            class RecordingDialog:
+                def __init__(self, _parent, _idx, _total, group, **_kwargs):
+                    shown.append([rec.id for rec in group])
+                    self.choice = "skip"
+
+                def exec(self):
+                    return 0
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch("KajovoPhotoSelector.DuplicateGroupDialog", RecordingDialog), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("phash", "dhash")):
+                self.win.on_find_duplicates()
+
+            self.assertEqual(shown, [[1, 2]])
+
+    def _exact_groups(self, root, records):
+        self.win.hash_cache = HashCache(os.path.join(root, "hash_cache.sqlite3"))
+        worker = DuplicateSearchWorker(
+            1,
+            records,
+            ("phash",),
+            self.win._signature_task,
+            self.win._visual_task,
+            verify_full=self.win.verify_full_content,
+        )
+        try:
+            with patch("KajovoPhotoSelector.sampled_file_signature", wraps=KajovoPhotoSelector.sampled_file_signature) as sampled, \
+                patch("KajovoPhotoSelector.full_file_signature", wraps=KajovoPhotoSelector.full_file_signature) as full:
+                groups = list(worker.iter_exact_groups())
+        finally:
+            self.win.hash_cache.close()
+        opened = lambda mock: sorted(os.path.basename(call.args[0]) for call in mock.call_args_list)
+        return [[rec.id for rec in group] for group in groups], opened(sampled), opened(full)
+
+    def test_exact_duplicates_skip_files_with_unique_size(self):
+        with tempfile.TemporaryDirectory() as root:
+            contents = {"a.jpg": b"x" * 100, "b.jpg": b"x" * 100, "c.jpg": b"y" * 100, "solo.jpg": b"z" * 50}
+            records = []
+            for index, (name, data) in enumerate(contents.items(), start=1):
+                path = os.path.join(root, name)
+                with open(path, "wb") as f:
+                    f.write(data)
+                records.append(ImageRecord(id=index, path=path, size=len(data)))
+
+            groups, sampled, full = self._exact_groups(root, records)
+
+        self.assertEqual(groups, [[1, 2]])
+        self.assertEqual(sampled, ["a.jpg", "b.jpg", "c.jpg"])
+        self.assertEqual(full, [])  # male soubory se ctou cele uz ve vzorku
+
+    def _sample_collision_records(self, root):
+        size = FORENSIC_CHUNK_SIZE * 8
+        base = bytearray(os.urandom(size))
+        altered = bytearray(base)
+        altered[FORENSIC_CHUNK_SIZE * 2] ^= 0xFF  # mimo vzorkovane useky
+        records = []
+        for index, (name, data) in enumerate((("a.raw", base), ("b.raw", base), ("c.raw", altered)), start=1):
+            path = os.path.join(root, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            records.append(ImageRecord(id=index, path=path, size=size))
+        return records
+
+    def test_exact_duplicates_without_verification_trust_sampled_signature(self):
+        self.win.verify_full_content = False
+        with tempfile.TemporaryDirectory() as root:
+            groups, sampled, full = self._exact_groups(root, self._sample_collision_records(root))
+
+        self.assertEqual(groups, [[1, 2, 3]])
+        self.assertEqual(sampled, ["a.raw", "b.raw", "c.raw"])
+        self.assertEqual(full, [])
+
+    def test_exact_duplicates_confirm_sample_collision_with_full_content(self):
+        with tempfile.TemporaryDirectory() as root:
+            groups, sampled, full = self._exact_groups(root, self._sample_collision_records(root))
+
+        self.assertEqual(groups, [[1, 2]])
+        self.assertEqual(sampled, ["a.raw", "b.raw", "c.raw"])
+        self.assertEqual(full, ["a.raw", "b.raw", "c.raw"])
+
+    def test_full_file_signature_matches_blake2b_with_and_without_mmap(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "big.raw")
+            data = os.urandom(KajovoPhotoSelector.FULL_HASH_BLOCK_SIZE + 12345)
+            with open(path, "wb") as f:
+                f.write(data)
+            expected = f"blake2b:{len(data)}:{hashlib.blake2b(data, digest_size=32).hexdigest()}"
+
+            self.assertEqual(full_file_signature(path, len(data)), expected)
+            self.assertEqual(full_file_signature(path, len(data), use_mmap=False), expected)
+            self.assertIsNone(full_file_signature(os.path.join(root, "missing.raw"), 10))
+
+    def test_exact_groups_are_reviewed_while_visual_hashing_still_runs(self):
+        with tempfile.TemporaryDirectory() as root:
+            records = []
+            for index, name in enumerate(("a.jpg", "b.jpg", "c.jpg", "d.jpg"), start=1):
+                path = os.path.join(root, name)
+                with open(path, "wb") as f:
+                    f.write(b"same bytes" if index < 3 else b"other" * index)
+                records.append(ImageRecord(id=index, path=path, size=os.path.getsize(path)))
+            self.win.images = list(records)
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            self.win.hash_cache = HashCache(os.path.join(root, "hash_cache.sqlite3"))
+            release_hashing = threading.Event()
+            events = []
+
+            def slow_hashes(path, kinds):
+                events.append(("hash", os.path.basename(path)))
+                release_hashing.wait(5)
+                return None
+
+            class RecordingDialog:
+                def __init__(self, _parent, _idx, _total, group, search_running=False):
+                    events.append(("dialog", [rec.id for rec in group], search_running))
+                    self.choice = "skip"
+
+                def exec(self):
+                    release_hashing.set()
+                    return 0
+
+            try:
+                with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                    patch("KajovoPhotoSelector.DuplicateGroupDialog", RecordingDialog), \
+                    patch("KajovoPhotoSelector.image_hashes", side_effect=slow_hashes), \
+                    patch.object(self.win, "_ask_duplicate_options", return_value=("phash",)), \
+                    patch.object(self.win, "toast"):
+                    self.win.on_find_duplicates()
+            finally:
+                self.win.hash_cache.close()
+
+        dialogs = [event for event in events if event[0] == "dialog"]
+        self.assertEqual(dialogs, [("dialog", [1, 2], True)])
+        self.assertIn(("hash", "d.jpg"), events)
+        self.assertIsNone(self.win._duplicate_job)
+
+    def test_failed_duplicate_search_is_reported_as_error(self):
+        with tempfile.TemporaryDirectory() as root:
+            records = []
+            for index in (1, 2):
+                path = os.path.join(root, f"img{index}.jpg")
+                with open(path, "wb") as f:
+                    f.write(b"same bytes")
+                records.append(ImageRecord(id=index, path=path, size=os.path.getsize(path)))
+            self.win.images = list(records)
+            self.win.image_by_id = {rec.id: rec for rec in records}
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch.object(DuplicateSearchWorker, "iter_exact_groups", side_effect=RuntimeError("disk zmizel")), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("phash",)), \
+                patch.object(self.win, "toast") as toast_mock:
+                self.win.on_find_duplicates()
+
+        self.assertEqual([call.args[1] for call in toast_mock.call_args_list], ["err"])
+        self.assertNotIn("nenašel", toast_mock.call_args.args[0])
+        self.assertIsNone(self.win._duplicate_job)
+
+    def test_watcher_changes_and_scans_wait_for_duplicate_review(self):
+        with tempfile.TemporaryDirectory() as root:
+            records = []
+            for index, payload in enumerate((b"same bytes", b"same bytes", b"other"), start=1):
+                path = os.path.join(root, f"img{index}.jpg")
+                with open(path, "wb") as f:
+                    f.write(payload)
+                records.append(ImageRecord(id=index, path=path, size=os.path.getsize(path)))
+            self.win.images = list(records)
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            during_dialog = []
+            win = self.win
+
+            class WatcherDuringDialog:
+                def __init__(self, _parent, _idx, _total, group, **_kwargs):
+                    self.choice = "skip"
+
+                def exec(self):
+                    os.remove(records[2].path)
+                    win.on_watched_dirs_changed([root])
+                    win._scan_directories([root], append=True, min_kb=0, max_kb=0, ignore_system=False)
+                    during_dialog.append((sorted(win.image_by_id), win._scan_job))
+                    return 0
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch("KajovoPhotoSelector.DuplicateGroupDialog", WatcherDuringDialog), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("phash",)), \
+                patch.object(self.win, "toast"):
+                self.win.on_find_duplicates()
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+
+        self.assertEqual(during_dialog, [([1, 2, 3], None)])
+        self.assertEqual(sorted(self.win.image_by_id), [1, 2])
+        self.assertEqual(self.win._watch_deferred, set())
+
+    def test_aborted_review_keeps_duplicate_job_until_worker_finishes(self):
+        with tempfile.TemporaryDirectory() as root:
+            records = []
+            for index, payload in enumerate((b"same bytes", b"same bytes", b"other", b"third"), start=1):
+                path = os.path.join(root, f"img{index}.jpg")
+                with open(path, "wb") as f:
+                    f.write(payload)
+                records.append(ImageRecord(id=index, path=path, size=os.path.getsize(path)))
+            self.win.images = list(records)
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            visual_started = threading.Event()
+            release_visual = threading.Event()
+
+            def blocking_visual_task(rec, hash_kinds):
+                visual_started.set()
+                release_visual.wait(10)
+                return rec.path, None, None
+
+            class AbortingDialog:
+                def __init__(self, _parent, _idx, _total, group, **_kwargs):
+                    self.choice = "abort"
+
+                def exec(self):
+                    visual_started.wait(10)
+                    return 0
+
+            try:
+                with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                    patch("KajovoPhotoSelector.DuplicateGroupDialog", AbortingDialog), \
+                    patch.object(self.win, "_visual_task", blocking_visual_task), \
+                    patch.object(self.win, "_ask_duplicate_options", return_value=("phash",)), \
+                    patch.object(self.win, "toast") as toast_mock:
+                    self.win.on_find_duplicates()
+                    job = self.win._duplicate_job
+                    self.win.on_watched_dirs_changed([root])
+                    self.win.on_find_duplicates()
+                    deferred = set(self.win._watch_deferred)
+            finally:
+                release_visual.set()
+
+            self.assertIsNotNone(job)
+            self.assertTrue(job.review_done)
+            self.assertEqual(deferred, {root})
+            toast_mock.assert_any_call("Kájo ještě ukončuje předchozí hledání dvojníků.", "warn", 2200)
+            self.assertTrue(wait_until(lambda: self.win._duplicate_job is None))
+            self.assertTrue(job.worker_done)
+            self.assertEqual(self.win._watch_deferred, set())
+            self.assertTrue(wait_until(lambda: self.win._scan_job is None))
+
+    def test_find_duplicates_does_nothing_when_options_are_canceled(self):
+        records = [ImageRecord(id=1, path="/tmp/a.jpg", size=1), ImageRecord(id=2, path="/tmp/b.jpg", size=1)]
+        self.win.images = list(records)
+        self.win.image_by_id = {rec.id: rec for rec in records}
+
+        with patch.object(self.win, "_ask_duplicate_options", return_value=None), \
+            patch("KajovoPhotoSelector.sampled_file_signature") as signature_mock:
+            self.win.on_find_duplicates()
+
+        signature_mock.assert_not_called()
 
     def test_duplicate_dialog_requires_selection_before_keep(self):
         with tempfile.TemporaryDirectory() as root:
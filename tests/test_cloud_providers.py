@@ -1,16 +1,29 @@
+import base64
+import hashlib
+import io
 import json
 import os
 import tempfile
+import threading
+import time
 import unittest
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
 os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
+from PIL import Image, ImageDraw
+
 from KajovoPhotoSelector import ImageRecord, MainWindow, image_record_from_cloud_asset
 from cloud_providers.apple_photos import ApplePhotosProvider
 from cloud_providers.cache import CloudCacheManager
-from cloud_providers.google_drive import GoogleDriveProvider
+from cloud_providers.checksums import QuickXorHash, drive_checksums, file_checksums, onedrive_checksums
+from cloud_providers.downloads import DownloadScheduler, RetryPolicy
+from cloud_providers.errors import CloudRateLimitError, CloudUnavailableError
+from cloud_providers.google_drive import CHANGES_SCAN_MODE, GoogleDriveProvider
 from cloud_providers.google_photos import GooglePhotosProvider
+from cloud_providers.http_pool import HttpSessionPool
 from cloud_providers.local_sync import CloudLocalSource, detect_cloud_sources
 from cloud_providers.manager import CloudServiceManager
 from cloud_providers.models import (
@@ -20,9 +33,12 @@ from cloud_providers.models import (
     CloudCapability,
     CloudDownloadState,
     CloudProviderType,
+    CloudScanResult,
     CloudSource,
 )
-from cloud_providers.onedrive import OneDriveProvider
+from cloud_providers.onedrive import DELTA_SCAN_MODE, DELTA_SELECT, OneDriveProvider
+from cloud_providers.token_store import MISS_TTL_SECONDS, TokenStore
+from kps_hash_cache import HashCache, cloud_key
 from support import APP, DummyProgress, DummySfx, write_test_image
 
 
@@ -41,6 +57,43 @@ class FakeTokenStore:
         self.tokens.pop(account_key, None)
 
 
+class CountingTokenStore(FakeTokenStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.writes = 0
+
+    def get_token(self, account_key):
+        self.reads += 1
+        return super().get_token(account_key)
+
+    def set_token(self, account_key, token_value):
+        self.writes += 1
+        super().set_token(account_key, token_value)
+
+
+class FakeGoogleCredentials:
+    refreshes = 0
+
+    def __init__(self, info):
+        self.token = info["token"]
+        self.refresh_token = "refresh"
+        self.expired = info.get("expired", False)
+
+    @classmethod
+    def from_authorized_user_info(cls, info, scopes=None):
+        return cls(info)
+
+    def refresh(self, request):
+        time.sleep(0.01)
+        type(self).refreshes += 1
+        self.token = f"fresh-{type(self).refreshes}"
+        self.expired = False
+
+    def to_json(self):
+        return json.dumps({"token": self.token})
+
+
 class FakeGoogleDriveListRequest:
     def __init__(self, payload):
         self.payload = payload
@@ -60,6 +113,21 @@ class FakeGoogleDriveFilesResource:
         return FakeGoogleDriveListRequest(self.pages.get(page_token))
 
 
+class FakeGoogleDriveChangesResource:
+    def __init__(self, start_token, pages, calls):
+        self.start_token = start_token
+        self.pages = pages
+        self.calls = calls
+
+    def getStartPageToken(self, **params):
+        self.calls.append(("start", params))
+        return FakeGoogleDriveListRequest({"startPageToken": self.start_token})
+
+    def list(self, **params):
+        self.calls.append(("changes", params))
+        return FakeGoogleDriveListRequest(self.pages[params["pageToken"]])
+
+
 class FakeGoogleDriveDrivesResource:
     def list(self, **kwargs):
         return FakeGoogleDriveListRequest({"drives": []})
@@ -71,12 +139,16 @@ class FakeGoogleDriveAboutResource:
 
 
 class FakeGoogleDriveService:
-    def __init__(self, pages, calls):
+    def __init__(self, pages, calls, changes=None):
         self._files = FakeGoogleDriveFilesResource(pages, calls)
+        self._changes = changes
 
     def files(self):
         return self._files
 
+    def changes(self):
+        return self._changes
+
     def drives(self):
         return FakeGoogleDriveDrivesResource()
 
@@ -119,12 +191,333 @@ class FakeRequests:
         return FakeResponse(payload.get("status_code", 200), payload["json"])
 
 
+def reference_quickxor(data: bytes) -> str:
+    """Přímý přepis referenčního C# algoritmu: bajt po bajtu do tří 64bitových buněk (poslední 32bitová)."""
+    cells = [0, 0, 0]
+    index, offset = 0, 0
+    for position in range(min(len(data), 160)):
+        last = index == 2
+        bits = 32 if last else 64
+        xored = 0
+        for byte in data[position::160]:
+            xored ^= byte
+        if offset <= bits - 8:
+            cells[index] ^= xored << offset
+        else:
+            cells[index] ^= xored << offset
+            cells[0 if last else index + 1] ^= xored >> (bits - offset)
+        offset += 11
+        while offset >= bits:
+            index = 0 if last else index + 1
+            offset -= bits
+    raw = bytearray(
+        (cells[0] & (2**64 - 1)).to_bytes(8, "little")
+        + (cells[1] & (2**64 - 1)).to_bytes(8, "little")
+        + (cells[2] & (2**32 - 1)).to_bytes(4, "little")
+    )
+    for position, byte in enumerate(len(data).to_bytes(8, "little")):
+        raw[12 + position] ^= byte
+    return base64.b64encode(bytes(raw)).decode("ascii")
+
+
+class ChecksumTests(unittest.TestCase):
+    def test_quickxor_matches_reference_for_any_chunking(self):
+        data = bytes((index * 37 + index // 7) % 256 for index in range(5000))
+        for length in (0, 1, 159, 160, 161, 1000, 5000):
+            prefix = data[:length]
+            for step in (1, 7, 160, 333, 5000):
+                hasher = QuickXorHash()
+                for start in range(0, length, step):
+                    hasher.update(prefix[start:start + step])
+                self.assertEqual(hasher.b64digest(), reference_quickxor(prefix), (length, step))
+        self.assertEqual(QuickXorHash().b64digest(), "AAAAAAAAAAAAAAAAAAAAAAAAAAA=")
+
+    def test_provider_checksums_are_normalized(self):
+        drive = drive_checksums({"md5Checksum": "ABC", "sha256Checksum": "", "sha1Checksum": None})
+        onedrive = onedrive_checksums({"file": {"hashes": {"sha1Hash": "DEAD", "quickXorHash": "AbC="}}})
+
+        self.assertEqual(drive, {"md5": "abc"})
+        self.assertEqual(onedrive, {"sha1": "dead", "quickxor": "AbC="})
+        self.assertEqual(onedrive_checksums({"folder": {}}), {})
+
+    def test_file_checksums_compute_requested_algorithms_in_one_pass(self):
+        data = os.urandom(1000)
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "a.bin")
+            with open(path, "wb") as handle:
+                handle.write(data)
+
+            checksums = file_checksums(path, ["md5", "quickxor"], block_size=64)
+
+            self.assertEqual(checksums, {"md5": hashlib.md5(data).hexdigest(), "quickxor": reference_quickxor(data)})
+            self.assertEqual(file_checksums(os.path.join(root, "missing.bin"), ["md5"]), {})
+
+
+class FakeKeyring:
+    def __init__(self):
+        self.passwords = {}
+        self.reads = 0
+        self.lock = threading.Lock()
+
+    def get_password(self, service, key):
+        with self.lock:
+            self.reads += 1
+        time.sleep(0.005)
+        return self.passwords.get((service, key))
+
+    def set_password(self, service, key, value):
+        self.passwords[(service, key)] = value
+
+    def delete_password(self, service, key):
+        self.passwords.pop((service, key), None)
+
+
+class FakeMsalCache:
+    deserialized = 0
+
+    def __init__(self):
+        self.has_state_changed = False
+
+    def deserialize(self, raw):
+        type(self).deserialized += 1
+
+    def serialize(self):
+        return "msal-cache"
+
+
+class FakeMsalApp:
+    silent_calls = 0
+
+    def __init__(self, client_id=None, authority=None, token_cache=None):
+        self.token_cache = token_cache
+
+    def get_accounts(self):
+        return [{"username": "acc"}]
+
+    def acquire_token_silent(self, scopes, account=None):
+        type(self).silent_calls += 1
+        if type(self).silent_calls == 1:
+            self.token_cache.has_state_changed = True  # prvni volani obnovi access token
+        return {"access_token": "graph-token"}
+
+
+class FakeMsal:
+    SerializableTokenCache = FakeMsalCache
+    PublicClientApplication = FakeMsalApp
+
+
+class TokenCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.service = f"kps-test-{uuid.uuid4().hex}"
+
+    def test_keyring_is_read_once_per_key_across_instances_and_threads(self):
+        fake_keyring = FakeKeyring()
+        fake_keyring.passwords[(self.service, "onedrive:acc")] = "ulozeny"
+        with patch("cloud_providers.token_store.keyring", fake_keyring):
+            stores = [TokenStore(self.service), TokenStore(self.service)]
+            values = []
+            threads = [
+                threading.Thread(target=lambda store=stores[index % 2]: values.append(store.get_token("onedrive:acc")))
+                for index in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual((values, fake_keyring.reads), (["ulozeny"] * 8, 1))
+
+            stores[0].set_token("onedrive:acc", "novy")
+            self.assertEqual(fake_keyring.passwords[(self.service, "onedrive:acc")], "novy")
+            self.assertEqual((stores[1].get_token("onedrive:acc"), fake_keyring.reads), ("novy", 1))
+
+            stores[1].delete_token("onedrive:acc")
+            self.assertIsNone(stores[0].get_token("onedrive:acc"))
+            self.assertEqual(fake_keyring.reads, 2)
+
+    def test_fallback_file_is_parsed_once_and_written_through(self):
+        with tempfile.TemporaryDirectory() as root, patch("cloud_providers.token_store.keyring", None):
+            store = TokenStore(self.service)
+            store._fallback_path = os.path.join(root, "cloud_tokens.json")
+            store.set_token("google_drive:a", "token-a")
+            with patch.object(store, "_read_fallback", wraps=store._read_fallback) as read_mock:
+                for _ in range(10):
+                    self.assertEqual(store.get_token("google_drive:a"), "token-a")
+                    self.assertIsNone(store.get_token("google_drive:b"))
+            self.assertEqual(read_mock.call_count, 1)
+
+            store.delete_token("google_drive:a")
+            with open(store._fallback_path, "r", encoding="utf-8") as handle:
+                self.assertEqual(json.load(handle), {})
+            self.assertIsNone(store.get_token("google_drive:a"))
+
+    def test_missing_token_is_read_again_after_short_ttl(self):
+        fake_keyring = FakeKeyring()
+        store = TokenStore(self.service)
+        store._fallback_path = os.path.join(tempfile.gettempdir(), f"{self.service}.json")
+        now = [1000.0]
+        with patch("cloud_providers.token_store.keyring", fake_keyring), \
+            patch("cloud_providers.token_store.time.monotonic", lambda: now[0]):
+            self.assertIsNone(store.get_token("onedrive:acc"))
+            # token zapsal jiny proces primo do keyringu
+            fake_keyring.passwords[(self.service, "onedrive:acc")] = "z-jineho-procesu"
+            self.assertIsNone(store.get_token("onedrive:acc"))
+            self.assertEqual(fake_keyring.reads, 1)
+
+            now[0] += MISS_TTL_SECONDS
+            self.assertEqual(store.get_token("onedrive:acc"), "z-jineho-procesu")
+            now[0] += MISS_TTL_SECONDS
+            self.assertEqual(store.get_token("onedrive:acc"), "z-jineho-procesu")
+            self.assertEqual(fake_keyring.reads, 2)
+
+    def test_onedrive_deserializes_msal_cache_once_and_saves_only_changes(self):
+        token_store = CountingTokenStore()
+        token_store.tokens["onedrive:acc"] = "msal-cache"
+        FakeMsalCache.deserialized = 0
+        FakeMsalApp.silent_calls = 0
+        provider = OneDriveProvider(token_store, http_session=FakeRequests({}))
+        with patch("cloud_providers.onedrive.msal", FakeMsal), \
+            patch.dict(os.environ, {"KPS_MICROSOFT_CLIENT_ID": "client"}):
+            tokens = [provider._acquire_token("acc") for _ in range(5)]
+            provider.disconnect("acc")
+            token_store.tokens["onedrive:acc"] = "msal-cache"
+            provider._acquire_token("acc")
+
+        self.assertEqual(tokens, ["graph-token"] * 5)
+        self.assertEqual((FakeMsalCache.deserialized, token_store.reads, token_store.writes), (2, 2, 1))
+
+
+def drive_asset(asset_id, **overrides):
+    values = dict(
+        provider=CloudProviderType.GOOGLE_DRIVE.value,
+        account_id="acc",
+        asset_id=asset_id,
+        stable_id=asset_id,
+        revision_id="rev",
+        name=f"{asset_id}.jpg",
+        mime_type="image/jpeg",
+        size=10,
+        width=None,
+        height=None,
+        created_time="",
+        modified_time="",
+        source_uri=f"gdrive://file/{asset_id}",
+        download_state=CloudDownloadState.NOT_DOWNLOADED.value,
+        is_read_only=True,
+    )
+    values.update(overrides)
+    return CloudAsset(**values)
+
+
+def write_pattern_image(path, size):
+    image = Image.new("RGB", size, (20, 40, 160))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size[0] // 8, size[1] // 8, size[0] // 2, size[1] - 4), fill=(240, 220, 20))
+    draw.rectangle((size[0] * 5 // 8, 2, size[0] - 3, size[1] // 2), fill=(10, 10, 10))
+    image.save(path, format="PNG")
+
+
+class DownloadSchedulerTests(unittest.TestCase):
+    def test_concurrency_is_limited_per_provider(self):
+        lock = threading.Lock()
+        active = {}
+        peak = {}
+
+        def task(asset):
+            with lock:
+                active[asset.provider] = active.get(asset.provider, 0) + 1
+                peak[asset.provider] = max(peak.get(asset.provider, 0), active[asset.provider])
+            time.sleep(0.02)
+            with lock:
+                active[asset.provider] -= 1
+            return asset.asset_id
+
+        assets = [drive_asset(f"d{index}") for index in range(6)]
+        assets += [drive_asset(f"o{index}", provider=CloudProviderType.ONEDRIVE.value) for index in range(3)]
+        scheduler = DownloadScheduler(limits={CloudProviderType.GOOGLE_DRIVE.value: 3, CloudProviderType.ONEDRIVE.value: 1})
+
+        results = sorted(outcome.result for outcome in scheduler.run(assets, task, poll_interval=0.01))
+
+        self.assertEqual(results, sorted(asset.asset_id for asset in assets))
+        self.assertEqual(peak, {CloudProviderType.GOOGLE_DRIVE.value: 3, CloudProviderType.ONEDRIVE.value: 1})
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        delays = []
+        failures = {"a": 2}
+
+        def task(asset):
+            if asset.asset_id == "broken":
+                raise ValueError("poskozena odpoved")
+            if failures.get(asset.asset_id, 0):
+                failures[asset.asset_id] -= 1
+                raise CloudRateLimitError("429")
+            return "ok"
+
+        scheduler = DownloadScheduler(retry=RetryPolicy(attempts=4, base_delay=1.0, sleep=delays.append))
+        outcomes = {outcome.asset.asset_id: outcome for outcome in scheduler.run([drive_asset("a"), drive_asset("broken")], task)}
+
+        self.assertTrue(outcomes["a"].ok)
+        self.assertEqual((outcomes["a"].result, outcomes["a"].attempts), ("ok", 3))
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0)
+        self.assertIsInstance(outcomes["broken"].error, ValueError)
+        self.assertEqual(outcomes["broken"].attempts, 1)
+
+    def test_outcomes_arrive_in_completion_order_and_cancel_stops_queue(self):
+        release = threading.Event()
+        started = []
+
+        def task(asset):
+            started.append(asset.asset_id)
+            if asset.asset_id == "slow":
+                release.wait(2)
+            return asset.asset_id
+
+        scheduler = DownloadScheduler(limits={CloudProviderType.GOOGLE_DRIVE.value: 2})
+        runner = scheduler.run([drive_asset("slow"), drive_asset("fast")], task, poll_interval=0.01)
+        first = next(runner)
+        release.set()
+        rest = [outcome.asset.asset_id for outcome in runner]
+        self.assertEqual((first.asset.asset_id, rest), ("fast", ["slow"]))
+
+        started.clear()
+        canceled = []
+        scheduler = DownloadScheduler(limits={CloudProviderType.GOOGLE_DRIVE.value: 1})
+        outcomes = []
+        for outcome in scheduler.run(
+            [drive_asset(name) for name in "abc"], task, should_cancel=lambda: bool(canceled), poll_interval=0.01
+        ):
+            outcomes.append(outcome.asset.asset_id)
+            canceled.append(True)
+        self.assertEqual((outcomes, started), (["a"], ["a"]))
+
+    def test_worker_threads_are_reused_across_runs_until_close(self):
+        def task(asset):
+            return threading.get_ident()
+
+        scheduler = DownloadScheduler(limits={CloudProviderType.GOOGLE_DRIVE.value: 1})
+        try:
+            first = {outcome.result for outcome in scheduler.run([drive_asset("a"), drive_asset("b")], task)}
+            second = {outcome.result for outcome in scheduler.run([drive_asset("c")], task)}
+            self.assertEqual(len(first), 1)
+            self.assertEqual(second, first)
+
+            scheduler.close()
+            after_close = [outcome.result for outcome in scheduler.run([drive_asset("d")], task)]
+            self.assertEqual(len(after_close), 1)
+        finally:
+            scheduler.close()
+
+
 class CloudProviderTests(unittest.TestCase):
     def setUp(self):
-        self.win = MainWindow(sfx=DummySfx())
+        self._state_dir = tempfile.TemporaryDirectory()
+        self.win = MainWindow(sfx=DummySfx(), data_dir=self._state_dir.name)
 
     def tearDown(self):
+        self.win.scan_index.close()
+        self.win.hash_cache.close()
         self.win.deleteLater()
+        self._state_dir.cleanup()
 
     def test_cloud_asset_to_image_record_maps_cloud_metadata(self):
         asset = CloudAsset(
@@ -300,6 +693,25 @@ class CloudProviderTests(unittest.TestCase):
             self.assertTrue(second.was_cached)
             self.assertEqual(calls["count"], 1)
 
+    def test_failed_download_leaves_no_partial_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache_manager = CloudCacheManager(root_dir=root)
+            asset = drive_asset("asset")
+
+            def downloader(target_path):
+                with open(target_path, "wb") as handle:
+                    handle.write(b"da")
+                raise ConnectionError("spojeni spadlo")
+
+            with self.assertRaises(ConnectionError):
+                cache_manager.ensure_download(asset, downloader)
+            with self.assertRaises(ConnectionError):
+                cache_manager.ensure_thumbnail(asset, 256, downloader)
+
+            leftovers = [name for _, _, names in os.walk(root) for name in names]
+            self.assertEqual(leftovers, [])
+            self.assertFalse(cache_manager.is_cached(asset))
+
     def test_cloud_only_asset_is_not_sent_to_duplicate_pipeline_as_local_file(self):
         with tempfile.TemporaryDirectory() as root:
             local1 = os.path.join(root, "a.png")
@@ -328,7 +740,8 @@ class CloudProviderTests(unittest.TestCase):
                 return None
 
             with patch("KajovoPhotoSelector.sampled_file_signature", side_effect=fake_signature), \
-                patch("KajovoPhotoSelector.perceptual_hash", return_value=None), \
+                patch("KajovoPhotoSelector.image_hashes", return_value=None), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("ahash",)), \
                 patch.object(self.win, "toast"):
                 self.win.on_find_duplicates()
 
@@ -369,6 +782,165 @@ class CloudProviderTests(unittest.TestCase):
         self.assertEqual([asset.asset_id for asset in first.assets + second.assets], ["1", "2"])
         self.assertEqual(len(calls), 2)
 
+    def test_google_drive_sync_mode_lists_fully_and_then_reads_only_changes(self):
+        calls = []
+        image = {"mimeType": "image/jpeg", "imageMediaMetadata": {}}
+        pages = {
+            None: {"files": [{"id": "1", "name": "a.jpg", "size": "10", "headRevisionId": "r1", **image}], "nextPageToken": "p2"},
+            "p2": {"files": [{"id": "2", "name": "b.jpg", "size": "20", "headRevisionId": "r1", **image}]},
+        }
+        changes = FakeGoogleDriveChangesResource(
+            "100",
+            {
+                "100": {
+                    "changes": [
+                        {"fileId": "1", "file": {"id": "1", "name": "a.jpg", "size": "12", "headRevisionId": "r2", **image}},
+                        {"fileId": "2", "removed": True},
+                        {"fileId": "3", "file": {"id": "3", "name": "c.jpg", "trashed": True, **image}},
+                        {"fileId": "4", "file": {"id": "4", "name": "doc.pdf", "mimeType": "application/pdf"}},
+                    ],
+                    "nextPageToken": "101",
+                },
+                "101": {
+                    "changes": [{"fileId": "5", "file": {"id": "5", "name": "e.jpg", "size": "5", "headRevisionId": "r1", **image}}],
+                    "newStartPageToken": "102",
+                },
+            },
+            calls,
+        )
+        provider = GoogleDriveProvider(
+            FakeTokenStore(), service_factory=lambda account_id: FakeGoogleDriveService(pages, calls, changes)
+        )
+        source = CloudSource(
+            provider=CloudProviderType.GOOGLE_DRIVE.value,
+            account_id="acc",
+            source_id="me",
+            name="Muj Disk",
+            source_uri="gdrive://me",
+            kind="drive",
+            is_read_only=True,
+            metadata={"scan_mode": CHANGES_SCAN_MODE},
+        )
+
+        first = provider.list_assets(source)
+        second = provider.list_assets(source, page_token=first.next_page_token)
+        delta = provider.list_assets(source, page_token=second.sync_token)
+        tail = provider.list_assets(source, page_token=delta.next_page_token)
+
+        self.assertEqual((first.next_page_token, first.sync_token), ("files:100:p2", None))
+        self.assertEqual((second.next_page_token, second.sync_token), (None, "changes:100"))
+        self.assertEqual([asset.asset_id for asset in first.assets + second.assets], ["1", "2"])
+        self.assertEqual([(asset.asset_id, asset.revision_id, asset.size) for asset in delta.assets], [("1", "r2", 12)])
+        self.assertEqual((delta.removed_asset_ids, delta.next_page_token, delta.sync_token), (["2", "3"], "changes:101", None))
+        self.assertEqual(([asset.asset_id for asset in tail.assets], tail.sync_token), (["5"], "changes:102"))
+        self.assertEqual([call[0] for call in calls if isinstance(call, tuple)], ["start", "changes", "changes"])
+        self.assertNotIn("orderBy", calls[1])
+
+    def test_google_drive_changes_keep_scope_of_initial_listing(self):
+        calls = []
+        image = {"mimeType": "image/jpeg", "imageMediaMetadata": {}}
+        changes = FakeGoogleDriveChangesResource(
+            "100",
+            {
+                "100": {
+                    "changes": [
+                        {"fileId": "1", "file": {"id": "1", "name": "a.jpg", "size": "10", "headRevisionId": "r1", **image}},
+                        {
+                            "fileId": "2",
+                            "file": {"id": "2", "name": "b.jpg", "size": "20", "headRevisionId": "r1", "driveId": "team", **image},
+                        },
+                        {
+                            "fileId": "3",
+                            "file": {"id": "3", "name": "c.jpg", "size": "30", "headRevisionId": "r1", "driveId": "other", **image},
+                        },
+                    ],
+                    "newStartPageToken": "101",
+                },
+            },
+            calls,
+        )
+        provider = GoogleDriveProvider(
+            FakeTokenStore(), service_factory=lambda account_id: FakeGoogleDriveService({}, calls, changes)
+        )
+
+        def source(source_id, kind):
+            return CloudSource(
+                provider=CloudProviderType.GOOGLE_DRIVE.value,
+                account_id="acc",
+                source_id=source_id,
+                name=source_id,
+                source_uri=f"gdrive://{source_id}",
+                kind=kind,
+                is_read_only=True,
+                metadata={"scan_mode": CHANGES_SCAN_MODE},
+            )
+
+        my_drive = provider.list_assets(source("me", "drive"), page_token="changes:100")
+        team_drive = provider.list_assets(source("team", "shared_drive"), page_token="changes:100")
+
+        self.assertEqual(([asset.asset_id for asset in my_drive.assets], my_drive.removed_asset_ids), (["1"], ["2", "3"]))
+        self.assertEqual(([asset.asset_id for asset in team_drive.assets], team_drive.removed_asset_ids), (["2"], ["1", "3"]))
+        self.assertEqual([call[1].get("driveId") for call in calls], [None, "team"])
+
+    def test_google_drive_credentials_are_cached_and_refreshed_once_for_all_workers(self):
+        token_store = CountingTokenStore()
+        token_store.tokens["google_drive:acc"] = json.dumps({"token": "old", "expired": True})
+        FakeGoogleCredentials.refreshes = 0
+        provider = GoogleDriveProvider(token_store)
+        seen = []
+        barrier = threading.Barrier(6)
+
+        def worker():
+            barrier.wait()
+            seen.append(provider._load_credentials("acc").token)
+
+        with patch("cloud_providers.google_drive.Credentials", FakeGoogleCredentials), \
+            patch("cloud_providers.google_drive.Request", object):
+            threads = [threading.Thread(target=worker) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for _ in range(20):
+                provider._load_credentials("acc")
+            provider.disconnect("acc")
+            token_store.tokens["google_drive:acc"] = json.dumps({"token": "relogin"})
+            after_disconnect = provider._load_credentials("acc").token
+
+        self.assertEqual(seen, ["fresh-1"] * 6)
+        self.assertEqual((FakeGoogleCredentials.refreshes, token_store.reads, token_store.writes), (1, 2, 1))
+        self.assertEqual(json.loads(token_store.tokens["google_drive:acc"]), {"token": "relogin"})
+        self.assertEqual(after_disconnect, "relogin")
+
+    def test_google_drive_service_is_built_once_per_thread_and_account(self):
+        built = []
+
+        def factory(account_id):
+            built.append((threading.get_ident(), account_id))
+            return FakeGoogleDriveService({None: {"files": []}}, [])
+
+        provider = GoogleDriveProvider(FakeTokenStore(), service_factory=factory)
+        source = CloudSource(
+            provider=CloudProviderType.GOOGLE_DRIVE.value,
+            account_id="acc",
+            source_id="me",
+            name="Muj Disk",
+            source_uri="gdrive://me",
+            kind="drive",
+            is_read_only=True,
+        )
+        for _ in range(5):
+            provider.list_assets(source)
+        worker = threading.Thread(target=lambda: [provider.list_assets(source) for _ in range(3)])
+        worker.start()
+        worker.join()
+
+        self.assertEqual(len(built), 2)
+        self.assertEqual(len({ident for ident, _account in built}), 2)
+        provider.disconnect("acc")
+        provider.list_assets(source)
+        self.assertEqual(len(built), 3)
+
     def test_google_drive_provider_filters_only_image_mime_types(self):
         provider = GoogleDriveProvider(
             FakeTokenStore(),
@@ -477,6 +1049,68 @@ class CloudProviderTests(unittest.TestCase):
         self.assertEqual(result.assets[0].width, 100)
         self.assertEqual(result.assets[0].height, 50)
 
+    def test_onedrive_delta_lists_subfolders_and_then_only_changes(self):
+        first_url = f"https://graph.microsoft.com/v1.0/drives/drive-1/root/delta?$select={DELTA_SELECT}&$top=500"
+        fake_requests = FakeRequests(
+            {
+                first_url: {
+                    "json": {
+                        "value": [
+                            {"id": "root", "name": "root", "root": {}, "folder": {"childCount": 1}},
+                            {"id": "dir", "name": "Dovolena", "folder": {"childCount": 2}},
+                            {"id": "1", "name": "a.jpg", "size": 10, "eTag": "e1", "file": {"mimeType": "image/jpeg"}},
+                        ],
+                        "@odata.nextLink": "delta-page-2",
+                    }
+                },
+                "delta-page-2": {
+                    "json": {
+                        "value": [
+                            {"id": "2", "name": "b.jpg", "size": 20, "eTag": "e2", "file": {"mimeType": "image/jpeg"}},
+                            {"id": "3", "name": "notes.txt", "size": 5, "file": {"mimeType": "text/plain"}},
+                        ],
+                        "@odata.deltaLink": "delta-link-1",
+                    }
+                },
+                "delta-link-1": {
+                    "json": {
+                        "value": [
+                            {"id": "1", "name": "a.jpg", "size": 12, "eTag": "e1b", "file": {"mimeType": "image/jpeg"}},
+                            {"id": "2", "deleted": {"state": "deleted"}},
+                        ],
+                        "@odata.deltaLink": "delta-link-2",
+                    }
+                },
+                "expired-link": {"status_code": 410, "json": {"error": {"code": "resyncRequired"}}},
+            }
+        )
+        provider = OneDriveProvider(FakeTokenStore(), http_session=fake_requests)
+        provider._acquire_token = lambda account_id: "token"
+        source = CloudSource(
+            provider=CloudProviderType.ONEDRIVE.value,
+            account_id="acc",
+            source_id="drive-1",
+            name="Muj OneDrive",
+            source_uri="onedrive://me/drive",
+            kind="personal",
+            is_read_only=True,
+            metadata={"scan_mode": DELTA_SCAN_MODE},
+        )
+
+        first = provider.list_assets(source)
+        second = provider.list_assets(source, page_token=first.next_page_token)
+        changes = provider.list_assets(source, page_token=second.sync_token)
+        resynced = provider.list_assets(source, page_token="expired-link")
+
+        self.assertEqual((first.next_page_token, first.sync_token), ("delta-page-2", None))
+        self.assertEqual([asset.asset_id for asset in first.assets + second.assets], ["1", "2"])
+        self.assertEqual((second.next_page_token, second.sync_token), (None, "delta-link-1"))
+        self.assertEqual([(asset.asset_id, asset.revision_id, asset.size) for asset in changes.assets], [("1", "e1b", 12)])
+        self.assertEqual((changes.removed_asset_ids, changes.sync_token), (["2"], "delta-link-2"))
+        self.assertEqual([asset.asset_id for asset in resynced.assets], ["1"])
+        self.assertEqual([page.full_resync for page in (first, second, changes, resynced)], [False, False, False, True])
+        self.assertEqual(fake_requests.calls[-1]["url"], first_url)
+
     def test_google_photos_provider_truthfully_reports_limited_mode(self):
         provider = GooglePhotosProvider(FakeTokenStore())
         with tempfile.TemporaryDirectory() as root, patch(
@@ -608,5 +1242,497 @@ class CloudProviderTests(unittest.TestCase):
         self.assertIn("onedrive", providers)
 
 
+    def _cloud_record(self, record_id, provider, asset_id, size, checksums):
+        return ImageRecord(
+            id=record_id,
+            path=f"{provider}://file/{asset_id}",
+            size=size,
+            bucket="MAIN",
+            is_cloud=True,
+            cloud_provider=provider,
+            cloud_account_id="acc",
+            cloud_asset_id=asset_id,
+            download_state=CloudDownloadState.NOT_DOWNLOADED.value,
+            cloud_checksums=checksums,
+        )
+
+    def test_metadata_only_duplicates_match_by_provider_checksum_and_download_only_shown_group(self):
+        with tempfile.TemporaryDirectory() as root:
+            local = os.path.join(root, "a.png")
+            write_test_image(local, color=(9, 8, 7))
+            with open(local, "rb") as handle:
+                data = handle.read()
+            size = len(data)
+            drive_copy = self._cloud_record(
+                2, CloudProviderType.GOOGLE_DRIVE.value, "d1", size, {"md5": hashlib.md5(data).hexdigest()}
+            )
+            onedrive_copy = self._cloud_record(
+                3, CloudProviderType.ONEDRIVE.value, "o1", size, {"quickxor": reference_quickxor(data)}
+            )
+            other = self._cloud_record(4, CloudProviderType.GOOGLE_DRIVE.value, "d2", size, {"md5": "0" * 32})
+            records = [ImageRecord(id=1, path=local, size=size, bucket="MAIN"), drive_copy, onedrive_copy, other]
+            self.win.images = records
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            shown = []
+            downloads = []
+
+            class RecordingDialog:
+                def __init__(self, _parent, _idx, _total, group, **_kwargs):
+                    shown.append(sorted(rec.id for rec in group))
+                    self.choice = "skip"
+
+                def exec(self):
+                    return 0
+
+            def fake_download(asset):
+                downloads.append(asset.asset_id)
+                return asset
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch("KajovoPhotoSelector.DuplicateGroupDialog", RecordingDialog), \
+                patch("KajovoPhotoSelector.sampled_file_signature") as sig_mock, \
+                patch("KajovoPhotoSelector.image_hashes", return_value=None), \
+                patch.dict(self.win.cloud_manager.accounts, {"acc": object()}), \
+                patch.object(self.win.cloud_manager, "ensure_local_asset", side_effect=fake_download), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("ahash",)), \
+                patch.object(self.win, "toast"):
+                self.win.on_find_duplicates()
+
+            self.assertEqual(shown, [[1, 2, 3]])
+            self.assertEqual(sorted(downloads), ["d1", "o1"])
+            sig_mock.assert_not_called()
+
+    def test_metadata_only_cloud_scan_fetches_thumbnails_instead_of_originals(self):
+        source = CloudSource(
+            provider=CloudProviderType.GOOGLE_DRIVE.value,
+            account_id="acc",
+            source_id="me",
+            name="Muj Disk",
+            source_uri="gdrive://me",
+            kind="drive",
+            is_read_only=True,
+        )
+        downloads = []
+        thumbnails = []
+
+        def fake_thumbnail(asset):
+            thumbnails.append(asset.asset_id)
+            asset.thumbnail_path = f"/thumbs/{asset.asset_id}"
+            return asset.thumbnail_path
+
+        with tempfile.TemporaryDirectory() as root:
+            self.win.cloud_manager.cache_manager = CloudCacheManager(root)
+            assets = [drive_asset("a", checksums={"md5": "abc"}), drive_asset("b")]
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                patch.object(self.win.cloud_manager, "iter_source_pages", return_value=[CloudScanResult(assets=assets)]), \
+                patch.object(self.win.cloud_manager, "ensure_local_asset", side_effect=lambda a: downloads.append(a.asset_id)), \
+                patch.object(self.win.cloud_manager, "ensure_thumbnail", side_effect=fake_thumbnail), \
+                patch.object(self.win, "toast"):
+                self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        self.assertEqual(downloads, [])
+        self.assertEqual(sorted(thumbnails), ["a", "b"])
+        by_asset = {rec.cloud_asset_id: rec for rec in self.win.images}
+        self.assertEqual(by_asset["a"].download_state, CloudDownloadState.NOT_DOWNLOADED.value)
+        self.assertEqual(by_asset["a"].cloud_checksums, {"md5": "abc"})
+        self.assertEqual(by_asset["b"].cloud_thumbnail_path, "/thumbs/b")
+
+    def test_full_cloud_scan_downloads_concurrently_and_keeps_failed_items_as_placeholders(self):
+        source = CloudSource(
+            provider=CloudProviderType.GOOGLE_DRIVE.value,
+            account_id="acc",
+            source_id="me",
+            name="Muj Disk",
+            source_uri="gdrive://me",
+            kind="drive",
+            is_read_only=True,
+        )
+        threads = set()
+
+        def fake_download(asset):
+            threads.add(threading.get_ident())
+            if asset.asset_id == "gone":
+                raise CloudUnavailableError("soubor zmizel")
+            asset.local_cache_path = f"/cache/{asset.asset_id}.jpg"
+            asset.download_state = CloudDownloadState.CACHED.value
+
+        self.win.cloud_metadata_only = False
+        assets = [drive_asset("a"), drive_asset("gone"), drive_asset("b")]
+        with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+            patch.object(self.win.cloud_manager, "iter_source_pages", return_value=[CloudScanResult(assets=assets)]), \
+            patch.object(self.win.cloud_manager, "ensure_local_asset", side_effect=fake_download), \
+            patch.object(self.win, "toast"):
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        by_asset = {rec.cloud_asset_id: rec for rec in self.win.images}
+        self.assertEqual(sorted(by_asset), ["a", "b", "gone"])
+        self.assertEqual(by_asset["a"].download_state, CloudDownloadState.CACHED.value)
+        self.assertEqual(by_asset["gone"].download_state, CloudDownloadState.NOT_DOWNLOADED.value)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_interrupted_cloud_scan_resumes_from_stored_page_token(self):
+        source = CloudSource(
+            provider=CloudProviderType.GOOGLE_DRIVE.value,
+            account_id="acc",
+            source_id="me",
+            name="Muj Disk",
+            source_uri="gdrive://me",
+            kind="drive",
+            is_read_only=True,
+        )
+        pages = {None: ("a", "p2"), "p2": ("b", "p3"), "p3": ("c", None)}
+        requested = []
+
+        class PagedProvider:
+            def list_assets(self, source, mime_filter=None, page_token=None):
+                requested.append(page_token)
+                asset_id, next_token = pages[page_token]
+                return CloudScanResult(assets=[drive_asset(asset_id)], next_page_token=next_token)
+
+        class CancelAfterFirstRecord(DummyProgress):
+            def wasCanceled(self):
+                return bool(self.updated)
+
+        self.win.cloud_manager.providers[CloudProviderType.GOOGLE_DRIVE.value] = PagedProvider()
+        with patch.object(self.win.cloud_manager, "ensure_thumbnail", return_value=""), \
+            patch.object(self.win, "toast"):
+            with patch("KajovoPhotoSelector.DagmarProgress", CancelAfterFirstRecord):
+                self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+            self.assertEqual([rec.cloud_asset_id for rec in self.win.images], ["a"])
+            self.assertEqual(self.win.cloud_scan_resume, {"google_drive:acc:me:0-0": "p2"})
+
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress):
+                self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        self.assertEqual([rec.cloud_asset_id for rec in self.win.images], ["a", "b", "c"])
+        self.assertEqual(requested, [None, "p2", "p2", "p3"])
+        self.assertEqual(self.win.cloud_scan_resume, {})
+
+    def test_incremental_cloud_scan_updates_and_removes_existing_records(self):
+        source = CloudSource(
+            provider=CloudProviderType.ONEDRIVE.value,
+            account_id="acc",
+            source_id="drive-1",
+            name="Muj OneDrive",
+            source_uri="onedrive://me/drive",
+            kind="personal",
+            is_read_only=True,
+        )
+
+        def onedrive_asset(asset_id, revision, size):
+            return drive_asset(asset_id, provider=CloudProviderType.ONEDRIVE.value, revision_id=revision, size=size)
+
+        pages = {
+            None: CloudScanResult(assets=[onedrive_asset("a", "r1", 10), onedrive_asset("b", "r1", 20)], sync_token="delta-1"),
+            "delta-1": CloudScanResult(assets=[onedrive_asset("a", "r2", 15)], removed_asset_ids=["b", "unknown"], sync_token="delta-2"),
+        }
+        requested = []
+
+        class DeltaProvider:
+            def list_assets(self, source, mime_filter=None, page_token=None):
+                requested.append(page_token)
+                return pages[page_token]
+
+        self.win.cloud_manager.providers[CloudProviderType.ONEDRIVE.value] = DeltaProvider()
+        with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+            patch.object(self.win.cloud_manager, "ensure_thumbnail", return_value=""), \
+            patch.object(self.win, "toast"):
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+            first = {rec.cloud_asset_id: rec for rec in self.win.images}
+            first["a"].bucket = "T1"
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        self.assertEqual(requested, [None, "delta-1"])
+        self.assertEqual([rec.cloud_asset_id for rec in self.win.images], ["a"])
+        updated = self.win.images[0]
+        self.assertIs(updated, first["a"])
+        self.assertEqual((updated.cloud_revision_id, updated.size, updated.bucket), ("r2", 15, "T1"))
+        self.assertNotIn(first["b"].id, self.win.image_by_id)
+        self.assertEqual(self.win.cloud_scan_resume, {"onedrive:acc:drive-1:0-0": "delta-2"})
+
+    def test_full_resync_drops_records_missing_from_new_listing(self):
+        source = CloudSource(
+            provider=CloudProviderType.ONEDRIVE.value,
+            account_id="acc",
+            source_id="drive-1",
+            name="Muj OneDrive",
+            source_uri="onedrive://me/drive",
+            kind="personal",
+            is_read_only=True,
+        )
+        other_drive = CloudSource(
+            provider=CloudProviderType.ONEDRIVE.value,
+            account_id="acc",
+            source_id="drive-2",
+            name="Sdilena knihovna",
+            source_uri="onedrive://drives/drive-2",
+            kind="shared",
+            is_read_only=True,
+        )
+
+        def onedrive_asset(asset_id):
+            return drive_asset(asset_id, provider=CloudProviderType.ONEDRIVE.value)
+
+        pages = {
+            ("drive-1", None): CloudScanResult(assets=[onedrive_asset("a"), onedrive_asset("b")], sync_token="expired"),
+            ("drive-2", None): CloudScanResult(assets=[onedrive_asset("x")], sync_token="delta-x"),
+            # deltaLink expiroval; behem mezery smazane "b" uz jako deleted neprijde
+            ("drive-1", "expired"): CloudScanResult(assets=[onedrive_asset("a")], next_page_token="resync-2", full_resync=True),
+            ("drive-1", "resync-2"): CloudScanResult(assets=[onedrive_asset("c")], sync_token="delta-new"),
+        }
+        requested = []
+
+        class ResyncProvider:
+            def list_assets(self, source, mime_filter=None, page_token=None):
+                requested.append((source.source_id, page_token))
+                return pages[(source.source_id, page_token)]
+
+        class CancelAfterResyncPage(DummyProgress):
+            def wasCanceled(self):
+                return ("drive-1", "resync-2") in requested
+
+        self.win.cloud_manager.providers[CloudProviderType.ONEDRIVE.value] = ResyncProvider()
+        with patch.object(self.win.cloud_manager, "ensure_thumbnail", return_value=""), \
+            patch.object(self.win, "toast"):
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress):
+                self.win._scan_cloud_sources([source, other_drive], min_kb=0, max_kb=0, ignore_system=True)
+            with patch("KajovoPhotoSelector.DagmarProgress", CancelAfterResyncPage):
+                self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+            # prerusena synchronizace nic neodebere a token nechava, aby ji dalsi sken zopakoval
+            self.assertEqual(sorted(rec.cloud_asset_id for rec in self.win.images), ["a", "b", "x"])
+            self.assertEqual(self.win.cloud_scan_resume["onedrive:acc:drive-1:0-0"], "expired")
+            with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress):
+                self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        self.assertEqual(sorted(rec.cloud_asset_id for rec in self.win.images), ["a", "c", "x"])
+        self.assertEqual(self.win.cloud_scan_resume["onedrive:acc:drive-1:0-0"], "delta-new")
+
+    def test_cloud_sync_token_is_kept_per_size_filter(self):
+        source = CloudSource(
+            provider=CloudProviderType.ONEDRIVE.value,
+            account_id="acc",
+            source_id="drive-1",
+            name="Muj OneDrive",
+            source_uri="onedrive://me/drive",
+            kind="personal",
+            is_read_only=True,
+        )
+
+        def onedrive_asset(asset_id, revision, size):
+            return drive_asset(asset_id, provider=CloudProviderType.ONEDRIVE.value, revision_id=revision, size=size)
+
+        pages = {
+            None: CloudScanResult(assets=[onedrive_asset("a", "r1", 100), onedrive_asset("b", "r1", 4096)], sync_token="delta-1"),
+            "delta-1": CloudScanResult(assets=[onedrive_asset("a", "r2", 8192)], sync_token="delta-2"),
+        }
+        requested = []
+
+        class DeltaProvider:
+            def list_assets(self, source, mime_filter=None, page_token=None):
+                requested.append(page_token)
+                return pages[page_token]
+
+        self.win.cloud_manager.providers[CloudProviderType.ONEDRIVE.value] = DeltaProvider()
+        with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+            patch.object(self.win.cloud_manager, "ensure_thumbnail", return_value=""), \
+            patch.object(self.win, "toast"):
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=2, ignore_system=True)
+            self.assertEqual([rec.cloud_asset_id for rec in self.win.images], ["a"])
+            # zmenena polozka prerostla filtr: jeji stary zaznam zmizi
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=2, ignore_system=True)
+            self.assertEqual(self.win.images, [])
+            self.assertEqual(self.win.cloud_scan_resume, {"onedrive:acc:drive-1:0-2048": "delta-2"})
+            # sirsi filtr nesmi navazat na token uzsiho, jinak by odfiltrovane polozky nikdy neprisly
+            self.win._scan_cloud_sources([source], min_kb=0, max_kb=0, ignore_system=True)
+
+        self.assertEqual(requested, [None, "delta-1", None])
+        self.assertEqual(sorted(rec.cloud_asset_id for rec in self.win.images), ["a", "b"])
+        self.assertEqual(self.win.cloud_scan_resume, {"onedrive:acc:drive-1:0-0": "delta-1"})
+
+    def test_thumbnail_only_records_are_compared_visually_and_shown_in_list(self):
+        with tempfile.TemporaryDirectory() as root:
+            thumbs = []
+            for index in range(2):
+                path = os.path.join(root, f"nahled_{index}")
+                write_pattern_image(path, (64, 48))
+                thumbs.append(path)
+            records = [
+                ImageRecord(
+                    id=index + 1,
+                    path=f"gphotos://item/{index}",
+                    size=0,
+                    bucket="MAIN",
+                    width=4000,
+                    height=3000,
+                    is_cloud=True,
+                    cloud_provider=CloudProviderType.GOOGLE_PHOTOS.value,
+                    cloud_account_id="acc",
+                    cloud_asset_id=f"item-{index}",
+                    cloud_revision_id="rev",
+                    download_state=CloudDownloadState.NOT_DOWNLOADED.value,
+                    cloud_thumbnail_path=path,
+                )
+                for index, path in enumerate(thumbs)
+            ]
+            self.win.images = records
+            self.win.image_by_id = {rec.id: rec for rec in records}
+            self.win.hash_cache = HashCache(os.path.join(root, "hash_cache.sqlite3"))
+            shown = []
+
+            class RecordingDialog:
+                def __init__(self, _parent, _idx, _total, group, **_kwargs):
+                    shown.append(sorted(rec.id for rec in group))
+                    self.choice = "skip"
+
+                def exec(self):
+                    return 0
+
+            try:
+                with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+                    patch("KajovoPhotoSelector.DuplicateGroupDialog", RecordingDialog), \
+                    patch("KajovoPhotoSelector.ThumbWorker") as thumb_worker, \
+                    patch.object(self.win.cloud_manager, "ensure_local_asset") as download_mock, \
+                    patch.object(self.win, "_fetch_cloud_records", wraps=self.win._fetch_cloud_records) as fetch_mock, \
+                    patch.object(self.win, "_ask_duplicate_options", return_value=("phash", "dhash")), \
+                    patch.object(self.win, "toast"):
+                    self.win.on_find_duplicates()
+                    self.win._start_thumb_worker(records[0])
+                original_key = cloud_key(records[0].cloud_provider, "acc", "item-0", "rev")
+                preview_key = cloud_key(records[0].cloud_provider, "acc", "item-0", "rev", preview=True)
+                self.assertIsNone(self.win.hash_cache.lookup(original_key, 0, 0))
+                self.assertIn("phash/8", self.win.hash_cache.lookup(preview_key, 0, 0).hashes)
+            finally:
+                self.win.hash_cache.close()
+
+            self.assertEqual(shown, [[1, 2]])
+            download_mock.assert_not_called()
+            # originaly skupiny se stahuji s dialogem prubehu, ktery jde prerusit
+            fetched, fetch_progress = fetch_mock.call_args.args
+            self.assertEqual(sorted(rec.id for rec in fetched), [1, 2])
+            self.assertIsInstance(fetch_progress, DummyProgress)
+            thumb_worker.assert_any_call(1, thumbs[0])
+            self.assertEqual((records[0].width, records[0].height), (4000, 3000))
+
+
+class ThumbnailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive pro testy poolu spojeni
+    body = b""
+    requests_seen = []
+
+    def do_GET(self):
+        type(self).requests_seen.append((self.path, self.headers.get("Authorization")))
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThumbnailTierTests(unittest.TestCase):
+    """Náhledy providerů proti lokálnímu HTTP serveru místo Google a Microsoft endpointů."""
+
+    @classmethod
+    def setUpClass(cls):
+        buffer = io.BytesIO()
+        Image.new("RGB", (32, 24), (10, 200, 30)).save(buffer, format="PNG")
+        ThumbnailHandler.body = buffer.getvalue()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ThumbnailHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        ThumbnailHandler.requests_seen = []
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = CloudCacheManager(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_google_photos_picker_thumbnail_uses_sized_base_url_and_is_cached(self):
+        provider = GooglePhotosProvider(FakeTokenStore())
+        provider._auth_headers = lambda account_id: {"Authorization": "Bearer picker"}
+        asset = drive_asset(
+            "item-1",
+            provider=CloudProviderType.GOOGLE_PHOTOS.value,
+            source_uri=f"{self.base_url}/media/item-1",
+            original_provider_metadata={"mode": "picker"},
+        )
+
+        first = provider.download_thumbnail(asset, self.cache)
+        second = provider.download_thumbnail(asset, self.cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(asset.thumbnail_path, first)
+        self.assertEqual(ThumbnailHandler.requests_seen, [("/media/item-1=w256-h256", "Bearer picker")])
+        with Image.open(first) as image:
+            self.assertEqual(image.size, (32, 24))
+        self.assertFalse(self.cache.is_cached(asset))
+
+    def test_google_drive_thumbnail_link_is_resized_and_authorized(self):
+        provider = GoogleDriveProvider(FakeTokenStore(), service_factory=lambda account_id: None)
+        provider._load_credentials = lambda account_id: type("Creds", (), {"token": "drive-token"})()
+        asset = drive_asset("d1", original_provider_metadata={"thumbnailLink": f"{self.base_url}/thumb/d1=s220"})
+
+        path = provider.download_thumbnail(asset, self.cache)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ThumbnailHandler.requests_seen, [("/thumb/d1=s256", "Bearer drive-token")])
+        self.assertIsNone(provider.download_thumbnail(drive_asset("d2"), self.cache))
+
+    def test_onedrive_thumbnail_requests_sized_graph_thumbnail(self):
+        fake_requests = FakeRequests({
+            "https://graph.microsoft.com/v1.0/me/drive/items/o1/thumbnails/0/c256x256/content": {"json": {}},
+        })
+        provider = OneDriveProvider(FakeTokenStore(), http_session=fake_requests)
+        provider._acquire_token = lambda account_id: "token"
+
+        path = provider.download_thumbnail(drive_asset("o1", provider=CloudProviderType.ONEDRIVE.value), self.cache)
+
+        with open(path, "rb") as handle:
+            self.assertEqual(handle.read(), b"content")
+        self.assertEqual(fake_requests.calls[0]["headers"], {"Authorization": "Bearer token"})
+
+
+    def test_pooled_session_reuses_connections_per_provider_and_account(self):
+        pool = HttpSessionPool({CloudProviderType.GOOGLE_PHOTOS.value: 4})
+        provider = GooglePhotosProvider(FakeTokenStore(), session_pool=pool)
+        provider._auth_headers = lambda account_id: {"Authorization": "Bearer picker"}
+        try:
+            for index in range(5):
+                asset = drive_asset(
+                    f"item-{index}",
+                    provider=CloudProviderType.GOOGLE_PHOTOS.value,
+                    source_uri=f"{self.base_url}/media/item-{index}",
+                    original_provider_metadata={"mode": "picker"},
+                )
+                provider.download_thumbnail(asset, self.cache)
+            stats = pool.stats()["google_photos:acc"]
+            session = pool.session_for(CloudProviderType.GOOGLE_PHOTOS.value, "acc")
+
+            self.assertEqual((stats.requests, stats.new_connections, stats.reused_connections), (5, 1, 4))
+            self.assertIs(session, provider._http("acc"))
+            self.assertIsNot(session, pool.session_for(CloudProviderType.GOOGLE_PHOTOS.value, "other"))
+            self.assertEqual(session.get_adapter("https://photospicker.googleapis.com")._pool_maxsize, 6)
+            self.assertEqual(len(ThumbnailHandler.requests_seen), 5)
+        finally:
+            pool.close()
+
+    def test_injected_http_session_bypasses_pool(self):
+        fake_requests = FakeRequests({})
+        provider = OneDriveProvider(FakeTokenStore(), http_session=fake_requests)
+
+        self.assertIs(provider._http("acc"), fake_requests)
+        self.assertEqual(provider.session_pool.stats(), {})
+
+
 if __name__ == "__main__":
     unittest.main()
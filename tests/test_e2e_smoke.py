@@ -11,7 +11,7 @@ from PyQt6.QtTest import QTest
 from PyQt6.QtWidgets import QApplication
 
 from KajovoPhotoSelector import MainWindow
-from support import APP, DummyProgress, DummyScanDialog, DummySfx, write_test_image
+from support import APP, DummyProgress, DummyScanDialog, DummySfx, wait_until, write_test_image
 
 
 class AutoDuplicateDialog:
@@ -25,15 +25,19 @@ class AutoDuplicateDialog:
 
 class E2ESmokeTests(unittest.TestCase):
     def setUp(self):
-        self.win = MainWindow(sfx=DummySfx())
+        self._state_dir = tempfile.TemporaryDirectory()
+        self.win = MainWindow(sfx=DummySfx(), data_dir=self._state_dir.name)
         self.win.show()
         QApplication.processEvents()
 
     def tearDown(self):
         self.win._exit_in_progress = True
         self.win.hide()
+        self.win.scan_index.close()
+        self.win.hash_cache.close()
         self.win.deleteLater()
         QApplication.processEvents()
+        self._state_dir.cleanup()
 
     def test_e2e_scan_save_load_and_apply_via_toolbar_buttons(self):
         with tempfile.TemporaryDirectory() as source_root, tempfile.TemporaryDirectory() as target_root, tempfile.TemporaryDirectory() as work_root:
@@ -54,6 +58,7 @@ class E2ESmokeTests(unittest.TestCase):
                 patch.object(self.win, "_kajo_box", side_effect=["Kájo, proveď to", None]):
                 QTest.mouseClick(self.win.btn_kajo_stopa, Qt.MouseButton.LeftButton)
                 QApplication.processEvents()
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
 
                 self.assertEqual(len(self.win.images), 1)
                 self.assertEqual(self.win.session_roots, [source_root])
@@ -118,10 +123,12 @@ class E2ESmokeTests(unittest.TestCase):
                 patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
                 patch("KajovoPhotoSelector.DuplicateGroupDialog", AutoDuplicateDialog), \
                 patch.object(self.win, "_ask_scan_options", return_value=(0, 0, False)), \
+                patch.object(self.win, "_ask_duplicate_options", return_value=("phash", "dhash")), \
                 patch.object(self.win, "_coin_per_file"), \
                 patch.object(self.win, "toast"):
                 QTest.mouseClick(self.win.btn_kajo_stopa, Qt.MouseButton.LeftButton)
                 QApplication.processEvents()
+                self.assertTrue(wait_until(lambda: self.win._scan_job is None))
                 QTest.mouseClick(self.win.btn_dupes, Qt.MouseButton.LeftButton)
                 QApplication.processEvents()
 
@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image, ImageDraw
+from PyQt6.QtWidgets import QApplication
+
+import KajovoPhotoSelector
+from KajovoPhotoSelector import ImageRecord, MainWindow
+from kps_hash_cache import HashCache, cloud_key, local_key, pack_hashes, unpack_hashes
+from support import APP, DummyProgress, DummySfx
+
+
+class HashCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = HashCache(os.path.join(self._tmp.name, "hash_cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache.close()
+        self._tmp.cleanup()
+
+    def test_entry_is_returned_only_for_unchanged_size_and_mtime(self):
+        key = local_key("/photos/a.jpg")
+        self.cache.store(key, 100, 5, signature="sample:100:abc", hashes={"phash/8": (1 << 63) | 7}, width=40, height=30)
+
+        entry = self.cache.lookup(key, 100, 5)
+
+        self.assertEqual(entry.signature, "sample:100:abc")
+        self.assertEqual(entry.hashes, {"phash/8": (1 << 63) | 7})
+        self.assertEqual((entry.width, entry.height), (40, 30))
+        self.assertIsNone(self.cache.lookup(key, 100, 6))
+        self.assertIsNone(self.cache.lookup(key, 101, 5))
+        self.assertEqual(self.cache.take_stats(), (1, 2))
+
+    def test_store_merges_new_hashes_into_valid_entry_and_replaces_stale_one(self):
+        key = cloud_key("google_drive", "acc", "asset", "rev1")
+        self.cache.store(key, 10, 0, signature="full:10:x")
+        self.cache.store(key, 10, 0, hashes={"dhash/8": 3})
+        self.cache.store(key, 10, 0, hashes={"phash/8": 4})
+
+        merged = self.cache.lookup(key, 10, 0)
+        self.assertEqual(merged.signature, "full:10:x")
+        self.assertEqual(merged.hashes, {"dhash/8": 3, "phash/8": 4})
+
+        self.cache.store(key, 12, 0, hashes={"dhash/8": 9})
+        replaced = self.cache.lookup(key, 12, 0)
+        self.assertIsNone(replaced.signature)
+        self.assertEqual(replaced.hashes, {"dhash/8": 9})
+
+    def test_evict_removes_old_rows_and_enforces_entry_limit(self):
+        for index in range(5):
+            self.cache.store(local_key(f"/p/{index}.jpg"), 1, 1, signature=str(index))
+        self.cache.commit()
+        with patch("kps_hash_cache.time.time", return_value=time.time() + 3600):
+            self.cache.store(local_key("/p/fresh.jpg"), 1, 1, signature="fresh")
+            removed = self.cache.evict(max_age_seconds=1800, max_entries=10)
+
+        self.assertEqual(removed, 5)
+        self.assertIsNotNone(self.cache.lookup(local_key("/p/fresh.jpg"), 1, 1))
+        for index in range(3):
+            self.cache.store(local_key(f"/q/{index}.jpg"), 1, 1)
+        self.assertEqual(self.cache.evict(max_entries=2), 2)
+
+    def test_older_cache_file_gains_digest_column(self):
+        path = os.path.join(self._tmp.name, "old.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "seen INTEGER NOT NULL, signature TEXT, width INTEGER, height INTEGER, hashes BLOB) WITHOUT ROWID"
+        )
+        conn.execute("INSERT INTO entries VALUES ('k', 5, 1, 0, 'sample:5:a', NULL, NULL, NULL)")
+        conn.commit()
+        conn.close()
+        cache = HashCache(path)
+        try:
+            cache.store("k", 5, 1, digest="full:5:b")
+            entry = cache.lookup("k", 5, 1)
+        finally:
+            cache.close()
+
+        self.assertEqual((entry.signature, entry.digest), ("sample:5:a", "full:5:b"))
+
+    def test_hash_blob_roundtrip(self):
+        hashes = {"ahash/8": 0, "phash/16": (1 << 255) + 1, "dhash/8": 0xFFFF}
+
+        self.assertEqual(unpack_hashes(pack_hashes(hashes)), hashes)
+
+
+class DuplicatePassCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.win = MainWindow(sfx=DummySfx(), data_dir=self._tmp.name)
+
+    def tearDown(self):
+        self.win.hash_cache.close()
+        self.win.scan_index.close()
+        self.win.deleteLater()
+        QApplication.processEvents()
+        self._tmp.cleanup()
+
+    def _scene(self, name: str, seed: int) -> str:
+        image = Image.new("RGB", (200, 150), (seed * 40 % 256, 80, 160))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((10 + seed * 20, 10, 120 + seed * 10, 140), fill=(250, 240 - seed * 30, 20))
+        draw.rectangle((130, 20 + seed * 15, 190, 90), fill=(20, 30, 40 + seed * 50))
+        path = os.path.join(self._tmp.name, name)
+        image.save(path)
+        return path
+
+    def _run_duplicates(self):
+        with patch("KajovoPhotoSelector.DagmarProgress", DummyProgress), \
+            patch.object(self.win, "_ask_duplicate_options", return_value=("phash", "dhash")), \
+            patch.object(self.win, "toast"), \
+            patch("KajovoPhotoSelector.sampled_file_signature", wraps=KajovoPhotoSelector.sampled_file_signature) as sig_mock, \
+            patch("KajovoPhotoSelector.image_hashes", wraps=KajovoPhotoSelector.image_hashes) as hash_mock:
+            self.win.on_find_duplicates()
+        return sorted(call.args[0] for call in sig_mock.call_args_list), sorted(call.args[0] for call in hash_mock.call_args_list)
+
+    def test_second_duplicate_pass_recomputes_only_changed_files(self):
+        paths = [self._scene(f"s{index}.png", index) for index in range(3)]
+        # shodna velikost v zaznamech posle vsechny soubory i do forenzni faze
+        records = [ImageRecord(id=index + 1, path=path, size=4096) for index, path in enumerate(paths)]
+        self.win.images = list(records)
+        self.win.image_by_id = {rec.id: rec for rec in records}
+
+        first = self._run_duplicates()
+        changed = self._scene("s1.png", 4)
+        stamp = time.time() + 10
+        os.utime(changed, (stamp, stamp))
+        second = self._run_duplicates()
+
+        self.assertEqual(first, (sorted(paths), sorted(paths)))
+        self.assertEqual(second, ([changed], [changed]))
+
+    def test_flat_image_is_decoded_only_on_first_pass(self):
+        paths = [self._scene(f"s{index}.png", index) for index in range(2)]
+        flat = os.path.join(self._tmp.name, "flat.png")
+        Image.new("RGB", (200, 150), (40, 90, 200)).save(flat)
+        paths.append(flat)
+        records = [ImageRecord(id=index + 1, path=path, size=index + 1) for index, path in enumerate(paths)]
+        self.win.images = list(records)
+        self.win.image_by_id = {rec.id: rec for rec in records}
+
+        first = self._run_duplicates()
+        second = self._run_duplicates()
+
+        self.assertEqual(first[1], sorted(paths))
+        self.assertEqual(second[1], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image, ImageDraw
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QImage
+
+import kps_hashing
+from KajovoPhotoSelector import image_hashes
+from kps_hashing import (
+    DEFAULT_HASH_KINDS,
+    FLAT_HASH_KIND,
+    HammingIndex,
+    average_hash,
+    average_hashes,
+    cluster_edges,
+    compute_hashes,
+    decode_size,
+    difference_hash,
+    hashes_match,
+)
+from support import APP
+
+
+def _reference_average_hash(image: QImage, hash_size: int) -> int:
+    scaled = image.scaled(
+        hash_size,
+        hash_size,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    ).convertToFormat(QImage.Format.Format_Grayscale8)
+    pixels = [scaled.pixelColor(x, y).value() for y in range(hash_size) for x in range(hash_size)]
+    avg = sum(pixels) / len(pixels)
+    return int("".join("1" if p > avg else "0" for p in pixels), 2)
+
+
+def _noise_image(rng: random.Random, width: int, height: int) -> QImage:
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    for y in range(height):
+        for x in range(width):
+            image.setPixelColor(x, y, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return image
+
+
+class AverageHashTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.images = [_noise_image(rng, rng.randint(6, 48), rng.randint(6, 48)) for _ in range(8)]
+
+    def test_average_hash_matches_per_pixel_reference(self):
+        for hash_size in (5, 8, 16):
+            for image in self.images:
+                with self.subTest(hash_size=hash_size, size=(image.width(), image.height())):
+                    self.assertEqual(average_hash(image, hash_size), _reference_average_hash(image, hash_size))
+
+    def test_pure_python_fallback_matches_reference(self):
+        with patch.object(kps_hashing, "np", None):
+            for image in self.images:
+                self.assertEqual(average_hash(image, 16), _reference_average_hash(image, 16))
+
+    def test_batch_hashing_matches_single_hashes_and_skips_null_images(self):
+        batch = self.images + [QImage()]
+
+        hashes = average_hashes(batch, 8)
+
+        self.assertEqual(hashes[:-1], [average_hash(image, 8) for image in self.images])
+        self.assertIsNone(hashes[-1])
+        self.assertIsNone(average_hash(QImage(), 8))
+
+    def test_larger_hash_size_uses_all_bits(self):
+        image = QImage(32, 32, QImage.Format.Format_Grayscale8)
+        image.fill(0)
+        for y in range(16):
+            for x in range(32):
+                image.setPixelColor(x, y, QColor(255, 255, 255))
+
+        value = average_hash(image, 16)
+
+        self.assertEqual(value, ((1 << 128) - 1) << 128)
+
+
+def _scene(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (320, 240), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x0, y0 = rng.randrange(320), rng.randrange(240)
+        box = (x0, y0, x0 + rng.randint(40, 160), y0 + rng.randint(40, 160))
+        draw.ellipse(box, fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return image
+
+
+class HashFamilyTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _save(self, image: Image.Image, name: str, **kwargs) -> str:
+        path = os.path.join(self._tmp.name, name)
+        image.save(path, **kwargs)
+        return path
+
+    def test_difference_hash_of_horizontal_gradient_sets_every_bit(self):
+        image = QImage(90, 80, QImage.Format.Format_Grayscale8)
+        for x in range(90):
+            for y in range(80):
+                image.setPixelColor(x, y, QColor(x * 2, x * 2, x * 2))
+
+        self.assertEqual(difference_hash(image, 8), (1 << 64) - 1)
+
+    def test_variants_match_and_unrelated_scene_does_not(self):
+        original = _scene(1)
+        base = self._save(original, "base.png")
+        resized = self._save(original.resize((160, 120)), "resized.jpg")
+        recompressed = self._save(original, "recompressed.jpg", quality=30)
+        other = self._save(_scene(2), "other.png")
+        kinds = ("ahash", "dhash", "phash", "whash")
+
+        hashes = {path: image_hashes(path, kinds) for path in (base, resized, recompressed, other)}
+
+        self.assertEqual(set(hashes[base]), set(kinds))
+        self.assertTrue(hashes_match(hashes[base], hashes[resized], DEFAULT_HASH_KINDS))
+        self.assertTrue(hashes_match(hashes[base], hashes[recompressed], DEFAULT_HASH_KINDS))
+        self.assertFalse(hashes_match(hashes[base], hashes[other], DEFAULT_HASH_KINDS))
+
+    @unittest.skipUnless(kps_hashing.HAS_NUMPY, "porovnani s vektorovou cestou potrebuje NumPy")
+    def test_pure_python_hashes_match_vectorized_ones(self):
+        image = QImage(self._save(_scene(3), "scene.png"))
+        kinds = ("ahash", "dhash", "phash", "whash")
+        expected = compute_hashes(image, kinds)
+
+        with patch.object(kps_hashing, "np", None):
+            self.assertEqual(compute_hashes(image, kinds), expected)
+
+    def test_flat_image_has_no_hashes_to_compare(self):
+        flat = self._save(Image.new("RGB", (64, 64), (40, 90, 200)), "flat.png")
+
+        hashes = image_hashes(flat, DEFAULT_HASH_KINDS)
+        self.assertEqual(hashes, {FLAT_HASH_KIND: 0})
+        self.assertFalse(hashes_match(hashes, hashes, DEFAULT_HASH_KINDS))
+
+    def test_decode_size_covers_largest_thumbnail_of_selected_hashes(self):
+        self.assertEqual(decode_size(("ahash",)), 8)
+        self.assertEqual(decode_size(("ahash", "dhash")), 16)
+        self.assertEqual(decode_size(DEFAULT_HASH_KINDS), 32)
+
+
+class HammingIndexTests(unittest.TestCase):
+    def test_query_returns_exactly_the_brute_force_neighbours(self):
+        rng = random.Random(5)
+        for radius, expected_size in ((0, 100_000), (6, 100_000), (6, 10), (12, 1500)):
+            values = []
+            index = HammingIndex(radius, expected_size=expected_size)
+            for key in range(1500):
+                if values and rng.random() < 0.3:
+                    value = rng.choice(values)
+                    for _ in range(rng.randint(0, radius + 2)):
+                        value ^= 1 << rng.randrange(64)
+                else:
+                    value = rng.getrandbits(64)
+                values.append(value)
+                index.add(key, value)
+
+            for key in range(0, 1500, 25):
+                with self.subTest(radius=radius, expected_size=expected_size, key=key):
+                    expected = [other for other, value in enumerate(values) if (value ^ values[key]).bit_count() <= radius]
+                    self.assertEqual(sorted(index.query(values[key])), expected)
+
+    def test_wide_hashes_use_their_own_bit_width(self):
+        index = HammingIndex(6, bits=256)
+        base = (1 << 255) | 12345
+        index.add(1, base)
+        index.add(2, base ^ (0b111111 << 200))
+        index.add(3, base ^ (0b1111111 << 100))
+
+        self.assertEqual(sorted(index.query(base)), [1, 2])
+
+
+class ClusterEdgesTests(unittest.TestCase):
+    def test_transitive_neighbours_form_one_group_regardless_of_edge_order(self):
+        # 0~1 a 1~2, ale 0 a 2 uz si podobne nejsou; hladove prirazeni by 2 odtrhlo
+        edges = [(3, 0, 1), (5, 1, 2), (1, 4, 5)]
+        expected = [[0, 1, 2], [4, 5]]
+        for order in itertools.permutations(edges):
+            with self.subTest(order=order):
+                self.assertEqual(cluster_edges(7, order), expected)
+
+    def test_group_cap_splits_chain_at_weakest_edges(self):
+        edges = [(1, 0, 1), (9, 1, 2), (2, 2, 3), (1, 3, 4), (8, 4, 5)]
+
+        self.assertEqual(cluster_edges(6, edges), [[0, 1, 2, 3, 4, 5]])
+        self.assertEqual(cluster_edges(6, edges, max_group_size=3), [[0, 1], [2, 3, 4]])
+        self.assertEqual(cluster_edges(6, edges, max_group_size=2), [[0, 1], [3, 4]])
+
+    def test_groups_are_ordered_by_first_member(self):
+        rng = random.Random(3)
+        edges = [(rng.randrange(10), rng.randrange(40), rng.randrange(40)) for _ in range(30)]
+        groups = cluster_edges(40, edges)
+
+        self.assertEqual([group[0] for group in groups], sorted(group[0] for group in groups))
+        for group in groups:
+            self.assertEqual(group, sorted(group))
+        self.assertEqual(sum(len(group) for group in groups), len({item for group in groups for item in group}))
+
+
+if __name__ == "__main__":
+    unittest.main()
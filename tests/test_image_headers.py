@@ -0,0 +1,107 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image
+
+import KajovoPhotoSelector
+from KajovoPhotoSelector import read_image_dimensions
+from kps_imagesize import read_header_dimensions
+from support import APP
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _heif_bytes(sizes, rotation: int = 0) -> bytes:
+    props = b"".join(_box(b"ispe", b"\x00\x00\x00\x00" + struct.pack(">II", w, h)) for w, h in sizes)
+    if rotation:
+        props += _box(b"irot", bytes([rotation]))
+    meta = _box(b"meta", b"\x00\x00\x00\x00" + _box(b"hdlr", b"\x00" * 24) + _box(b"iprp", _box(b"ipco", props)))
+    ftyp = _box(b"ftyp", b"heic" + b"\x00\x00\x00\x00" + b"mif1heic")
+    return ftyp + meta + _box(b"mdat", b"\x00" * 16)
+
+
+class ImageHeaderTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.image = Image.new("RGB", (37, 21), (10, 200, 30))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _save(self, name: str, **kwargs) -> str:
+        path = os.path.join(self._tmp.name, name)
+        self.image.save(path, **kwargs)
+        return path
+
+    def test_common_formats_are_read_from_header(self):
+        paths = [
+            self._save("plain.jpg"),
+            self._save("progressive.jpg", progressive=True),
+            self._save("image.png"),
+            self._save("image.gif"),
+            self._save("lossy.webp"),
+            self._save("lossless.webp", lossless=True),
+            self._save("image.tif"),
+            self._save("image.bmp"),
+        ]
+        rgba = os.path.join(self._tmp.name, "alpha.webp")
+        self.image.convert("RGBA").save(rgba)
+        paths.append(rgba)
+
+        for path in paths:
+            with self.subTest(path=os.path.basename(path)):
+                self.assertEqual(read_header_dimensions(path), (37, 21))
+
+    def test_exif_orientation_swaps_jpeg_and_tiff_dimensions(self):
+        exif = Image.Exif()
+        exif[274] = 6
+        for name in ("rotated.jpg", "rotated.tif"):
+            with self.subTest(name=name):
+                path = self._save(name, exif=exif.tobytes())
+                self.assertEqual(read_header_dimensions(path), (21, 37))
+
+    def test_heif_uses_largest_ispe_and_irot(self):
+        path = os.path.join(self._tmp.name, "photo.heic")
+        with open(path, "wb") as f:
+            f.write(_heif_bytes([(512, 512), (4032, 3024)]))
+        rotated = os.path.join(self._tmp.name, "rotated.heic")
+        with open(rotated, "wb") as f:
+            f.write(_heif_bytes([(4032, 3024)], rotation=1))
+
+        self.assertEqual(read_header_dimensions(path), (4032, 3024))
+        self.assertEqual(read_header_dimensions(rotated), (3024, 4032))
+
+    def test_unknown_or_truncated_files_return_none(self):
+        text = os.path.join(self._tmp.name, "notes.jpg")
+        with open(text, "wb") as f:
+            f.write(b"not an image at all")
+        full = self._save("full.jpg")
+        truncated = os.path.join(self._tmp.name, "truncated.jpg")
+        with open(full, "rb") as src, open(truncated, "wb") as dst:
+            dst.write(src.read(40))
+
+        self.assertIsNone(read_header_dimensions(text))
+        self.assertIsNone(read_header_dimensions(truncated))
+        self.assertIsNone(read_header_dimensions(os.path.join(self._tmp.name, "missing.png")))
+
+    def test_read_image_dimensions_skips_qimage_reader_for_parsed_headers(self):
+        path = self._save("image.png")
+        with patch.object(KajovoPhotoSelector, "QImageReader") as reader_mock:
+            self.assertEqual(read_image_dimensions(path), (37, 21))
+        reader_mock.assert_not_called()
+
+    def test_read_image_dimensions_falls_back_to_qimage_reader(self):
+        path = self._save("image.png")
+        with patch.object(KajovoPhotoSelector, "read_header_dimensions", return_value=None):
+            self.assertEqual(read_image_dimensions(path), (37, 21))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+
+from kps_parallel import PipelineStats, iter_parallel
+
+
+class IterParallelTests(unittest.TestCase):
+    def test_results_keep_input_order(self):
+        def slow_square(value: int) -> int:
+            # pozdejsi polozky dobehnou driv, poradi vystupu se menit nesmi
+            time.sleep(0.001 * (10 - value % 10))
+            return value * value
+
+        items = list(range(100))
+        stats = PipelineStats()
+        results = list(iter_parallel(slow_square, items, max_workers=4, chunk_size=3, stats=stats))
+
+        self.assertEqual([item for item, _ in results], items)
+        self.assertEqual([result for _, result in results], [value * value for value in items])
+        self.assertEqual(stats.done, 100)
+        self.assertGreater(stats.rate(), 0)
+
+    def test_work_runs_outside_calling_thread(self):
+        caller = threading.get_ident()
+        results = list(iter_parallel(lambda _: threading.get_ident(), range(8), max_workers=2, chunk_size=2))
+        self.assertTrue(all(ident != caller for _, ident in results))
+
+    def test_failed_item_yields_none(self):
+        def picky(value: int) -> int:
+            if value == 3:
+                raise OSError("nelze cist")
+            return value
+
+        results = dict(iter_parallel(picky, list(range(6)), max_workers=2, chunk_size=2))
+        self.assertIsNone(results[3])
+        self.assertEqual(results[5], 5)
+
+    def test_cancel_stops_submitting_work(self):
+        calls = []
+        lock = threading.Lock()
+
+        def record(value: int) -> int:
+            with lock:
+                calls.append(value)
+            return value
+
+        seen = []
+        for item, _ in iter_parallel(
+            record, list(range(1000)), max_workers=2, chunk_size=4, should_cancel=lambda: len(seen) >= 5
+        ):
+            seen.append(item)
+
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+        # rozpracovane jsou nejvys 2 * vlakna davek, zbytek fronty se nikdy neodesle
+        time.sleep(0.05)
+        self.assertLessEqual(len(calls), 2 * 2 * 4 + 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import kps_scan
+from KajovoPhotoSelector import ScanWorker
+from kps_scan import ScanEntry, ScanStats, iter_image_paths, iter_scan_entries
+from kps_scan_index import ScanIndex
+from kps_watch import FolderWatcher
+from support import APP, wait_until, write_test_image
+
+
+def _write(path: str, payload: bytes = b"img") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def _age_dirs(root: str, seconds: float = 3600) -> None:
+    stamp = time.time() - seconds
+    for dirpath, _dirnames, _filenames in os.walk(root):
+        os.utime(dirpath, (stamp, stamp))
+
+
+class ParallelWalkerTests(unittest.TestCase):
+    def test_walker_returns_nested_images_with_stat_data_and_skips_recycle_bin(self):
+        with tempfile.TemporaryDirectory() as root:
+            top = os.path.join(root, "top.jpg")
+            nested = os.path.join(root, "a", "b", "nested.PNG")
+            _write(top, b"x" * 10)
+            _write(nested, b"y" * 25)
+            _write(os.path.join(root, "a", "notes.txt"))
+            _write(os.path.join(root, "$RECYCLE.BIN", "deleted.jpg"))
+            _write(os.path.join(root, "System Volume Information", "index.jpg"))
+
+            entries = list(iter_scan_entries([root], ignore_system=False, max_workers=3))
+
+            by_path = {entry.path: entry for entry in entries}
+            self.assertEqual(set(by_path), {top, nested})
+            self.assertEqual(by_path[top].size, 10)
+            self.assertEqual(by_path[nested].size, 25)
+            self.assertEqual(by_path[nested].mtime, os.stat(nested).st_mtime)
+            self.assertEqual(sorted(iter_image_paths([root], ignore_system=False)), sorted(by_path))
+
+    def test_walker_stops_when_progress_callback_returns_false(self):
+        with tempfile.TemporaryDirectory() as root:
+            for index in range(6):
+                _write(os.path.join(root, f"d{index}", f"img{index}.jpg"))
+            calls = []
+
+            def on_progress(found, dirs):
+                calls.append((found, dirs))
+                return False
+
+            with patch.object(kps_scan, "PROGRESS_INTERVAL", -1):
+                entries = list(iter_scan_entries([root], ignore_system=False, on_progress=on_progress))
+
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(calls[0][1], 1)
+            self.assertEqual(entries, [])
+
+    def test_walker_applies_size_limits_while_streaming(self):
+        with tempfile.TemporaryDirectory() as root:
+            _write(os.path.join(root, "small.jpg"), b"s" * 100)
+            medium = os.path.join(root, "sub", "medium.jpg")
+            _write(medium, b"m" * 2048)
+            _write(os.path.join(root, "large.jpg"), b"l" * 8192)
+            stats = ScanStats()
+
+            entries = list(iter_scan_entries([root], ignore_system=False, min_bytes=1024, max_bytes=4096, stats=stats))
+
+            self.assertEqual([entry.path for entry in entries], [medium])
+            self.assertEqual((stats.found, stats.filtered_out, stats.dirs), (1, 2, 2))
+
+    def test_walker_descends_only_into_accepted_subdirectories(self):
+        with tempfile.TemporaryDirectory() as root:
+            top = os.path.join(root, "top.jpg")
+            fresh = os.path.join(root, "new", "fresh.jpg")
+            _write(top)
+            _write(fresh)
+            _write(os.path.join(root, "watched", "old.jpg"))
+            watched = {os.path.join(root, "watched")}
+            listed = []
+
+            entries = list(iter_scan_entries([root], ignore_system=False, descend=lambda d: d not in watched, listed_dirs=listed))
+
+            self.assertEqual(sorted(entry.path for entry in entries), sorted([top, fresh]))
+            self.assertEqual(sorted(listed), sorted([root, os.path.join(root, "new")]))
+
+    def test_walker_skips_system_like_subtrees_when_requested(self):
+        with tempfile.TemporaryDirectory() as root:
+            kept = os.path.join(root, "photos", "keep.jpg")
+            _write(kept)
+            _write(os.path.join(root, "venv", "lib", "icon.png"))
+
+            with patch.object(kps_scan, "is_system_like_path", side_effect=lambda p: os.path.basename(p) == "venv"):
+                paths = [entry.path for entry in iter_scan_entries([root], ignore_system=True)]
+
+            self.assertEqual(paths, [kept])
+
+
+class ScanIndexTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.index = ScanIndex(os.path.join(self._tmp.name, "scan_index.sqlite3"))
+
+    def tearDown(self):
+        self.index.close()
+        self._tmp.cleanup()
+
+    def test_rescan_lists_only_changed_directories(self):
+        with tempfile.TemporaryDirectory() as root:
+            old_a = os.path.join(root, "2023", "a.jpg")
+            old_b = os.path.join(root, "2024", "b.jpg")
+            _write(old_a)
+            _write(old_b)
+            _age_dirs(root)
+            first = list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            new_c = os.path.join(root, "2024", "c.jpg")
+            _write(new_c, b"new")
+            stats = ScanStats()
+            with patch.object(kps_scan, "scan_directory", wraps=kps_scan.scan_directory) as scan_mock:
+                second = list(iter_scan_entries([root], ignore_system=False, index=self.index, stats=stats))
+
+            self.assertEqual(sorted(e.path for e in first), sorted([old_a, old_b]))
+            self.assertEqual(sorted(e.path for e in second), sorted([old_a, old_b, new_c]))
+            self.assertEqual([call.args[0] for call in scan_mock.call_args_list], [os.path.join(root, "2024")])
+            self.assertEqual(stats.reused_dirs, 2)
+
+    def test_reused_listing_reports_in_place_edits(self):
+        with tempfile.TemporaryDirectory() as root:
+            edited = os.path.join(root, "edited.jpg")
+            _write(edited, b"0123456789")
+            _age_dirs(root)
+            list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            with open(edited, "ab") as f:
+                f.write(b"x" * 50)
+            stats = ScanStats()
+            with patch.object(kps_scan, "scan_directory", wraps=kps_scan.scan_directory) as scan_mock:
+                second = list(iter_scan_entries([root], ignore_system=False, index=self.index, stats=stats))
+
+            scan_mock.assert_not_called()
+            self.assertEqual(stats.reused_dirs, 1)
+            self.assertEqual([(e.path, e.size) for e in second], [(edited, 60)])
+            self.assertEqual([e.size for e in self.index.cached_listing(root)[0]], [60])
+
+    def test_full_rescan_prunes_removed_directories(self):
+        with tempfile.TemporaryDirectory() as root:
+            _write(os.path.join(root, "keep", "a.jpg"))
+            _write(os.path.join(root, "gone", "b.jpg"))
+            _age_dirs(root)
+            list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            shutil.rmtree(os.path.join(root, "gone"))
+            list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            self.assertEqual(
+                sorted(self.index.snapshot_dirs(root)),
+                sorted([root, os.path.join(root, "keep")]),
+            )
+            self.assertIsNone(self.index.cached_listing(os.path.join(root, "gone")))
+
+    def test_directory_changed_within_racy_window_is_rescanned(self):
+        with tempfile.TemporaryDirectory() as root:
+            _write(os.path.join(root, "a.jpg"))
+            list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            with patch.object(kps_scan, "scan_directory", wraps=kps_scan.scan_directory) as scan_mock:
+                list(iter_scan_entries([root], ignore_system=False, index=self.index))
+
+            self.assertEqual(scan_mock.call_count, 1)
+
+
+class FolderWatcherTests(unittest.TestCase):
+    def test_polling_fallback_reports_debounced_directory_changes(self):
+        with tempfile.TemporaryDirectory() as root:
+            sub = os.path.join(root, "dump")
+            os.makedirs(sub)
+            _age_dirs(root)
+            watcher = FolderWatcher(debounce_ms=20, poll_interval_ms=50, max_native_watches=0)
+            events = []
+            watcher.dirs_changed.connect(events.append)
+            watcher.add_dirs([root, sub])
+
+            for index in range(5):
+                _write(os.path.join(sub, f"img{index}.jpg"))
+
+            self.assertTrue(wait_until(lambda: events, timeout=3.0))
+            watcher.stop()
+            self.assertEqual(events, [[sub]])
+            self.assertEqual(watcher.native_dir_count(), 0)
+            self.assertFalse(watcher.is_active())
+
+    def test_native_watches_are_capped_and_rest_is_polled(self):
+        with tempfile.TemporaryDirectory() as root:
+            dirs = [os.path.join(root, f"d{index}") for index in range(3)]
+            for path in dirs:
+                os.makedirs(path)
+            watcher = FolderWatcher(max_native_watches=2)
+
+            watcher.add_dirs(dirs)
+
+            self.assertLessEqual(watcher.native_dir_count(), 2)
+            self.assertEqual(watcher.watched_dirs(), set(dirs))
+            watcher.stop()
+
+    def test_remove_dirs_accepts_generator_for_native_and_polled_dirs(self):
+        with tempfile.TemporaryDirectory() as root:
+            dirs = [os.path.join(root, f"d{index}") for index in range(4)]
+            for path in dirs:
+                os.makedirs(path)
+            watcher = FolderWatcher(max_native_watches=2)
+            watcher.add_dirs(dirs)
+
+            watcher.remove_dirs(path for path in dirs if not path.endswith("d3"))
+
+            self.assertEqual(watcher.watched_dirs(), {dirs[3]})
+            watcher.stop()
+
+
+class ScanWorkerTests(unittest.TestCase):
+    def test_scan_worker_emits_entry_batches_and_finishes(self):
+        with tempfile.TemporaryDirectory() as root:
+            for index in range(5):
+                write_test_image(os.path.join(root, f"img{index}.png"))
+            worker = ScanWorker(7, [root], ignore_system=False, min_bytes=0, max_bytes=0, batch_size=2)
+            batches = []
+            finished = []
+            worker.signals.batch.connect(lambda job_id, batch: batches.append((job_id, batch)))
+            worker.signals.finished.connect(lambda job_id, canceled, stats: finished.append((job_id, canceled, stats)))
+
+            worker.run()
+
+            self.assertEqual([len(batch) for _job, batch in batches], [2, 2, 1])
+            self.assertTrue(all(job_id == 7 for job_id, _batch in batches))
+            entry = batches[0][1][0]
+            self.assertIsInstance(entry, ScanEntry)
+            self.assertEqual(entry.size, os.path.getsize(entry.path))
+            self.assertEqual(len(finished), 1)
+            self.assertFalse(finished[0][1])
+            self.assertEqual(finished[0][2].found, 5)
+
+    def test_canceled_scan_worker_stops_without_further_batches(self):
+        with tempfile.TemporaryDirectory() as root:
+            for index in range(3):
+                write_test_image(os.path.join(root, f"img{index}.png"))
+            worker = ScanWorker(1, [root], ignore_system=False, min_bytes=0, max_bytes=0, batch_size=1)
+            batches = []
+            finished = []
+            worker.signals.batch.connect(lambda job_id, batch: (batches.append(batch), worker.cancel()))
+            worker.signals.finished.connect(lambda job_id, canceled, stats: finished.append(canceled))
+
+            worker.run()
+
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(finished, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()